@@ -1,5 +1,16 @@
 from agent.engine import execute_sandboxed_code
-from agent.model import get_model_response, create_openai_client, create_vllm_client
+from agent.model import (
+    get_model_response,
+    stream_model_response,
+    create_openai_client,
+    create_vllm_client,
+)
+from agent.ledger import sync_usage
+from agent.memo import ReadOnlyMemo
+from agent.messages import MessageStore
+from agent.memory_meta import bump_generation, init_generation
+from agent.sandbox.kernel import SessionKernel
+from agent.streaming import TurnMetrics
 from agent.utils import (
     load_system_prompt,
     create_memory_if_not_exists,
@@ -15,14 +26,17 @@ from agent.settings import (
     VLLM_HOST,
     VLLM_PORT,
     OPENROUTER_STRONG_MODEL,
+    SESSION_KERNEL,
+    STREAM_RESPONSES,
 )
 from agent.schemas import ChatMessage, Role, AgentResponse
 
-from typing import Union, Tuple
+from typing import Iterable, Union, Tuple
 
 import json
 import os
 import uuid
+import weakref
 
 
 class Agent:
@@ -33,24 +47,28 @@ class Agent:
         use_vllm: bool = False,
         model: str = None,
         predetermined_memory_path: bool = False,
+        session_kernel: bool = SESSION_KERNEL,
+        stream: bool = STREAM_RESPONSES,
     ):
         # Load the system prompt and add it to the conversation history
         self.system_prompt = load_system_prompt()
-        self.messages: list[ChatMessage] = [
-            ChatMessage(role=Role.SYSTEM, content=self.system_prompt)
-        ]
+        self.messages = [ChatMessage(role=Role.SYSTEM, content=self.system_prompt)]
 
         # Set the maximum number of tool turns and use_vllm flag
         self.max_tool_turns = max_tool_turns
         self.use_vllm = use_vllm
 
+        # Streamed turns end as soon as a python block or the reply is complete
+        self.stream = stream
+        self.turn_metrics: list[TurnMetrics] = []
+
         # Set model: use provided model, or fallback to OPENROUTER_STRONG_MODEL
         if model:
             self.model = model
         else:
             self.model = OPENROUTER_STRONG_MODEL
 
-        # Each Agent instance gets its own clients to avoid bottlenecks
+        # Agents talking to the same endpoint share one pooled client
         if use_vllm:
             self._client = create_vllm_client(host=VLLM_HOST, port=VLLM_PORT)
         else:
@@ -70,14 +88,98 @@ class Agent:
         # Ensure memory_path is absolute for consistency
         self.memory_path = os.path.abspath(self.memory_path)
 
+        # Results of read-only python blocks, reused while the memory is unchanged
+        self._memo = ReadOnlyMemo()
+        # The usage ledger is synced with the files on disk before the first block
+        self._usage_synced = False
+
+        # With a session kernel, variables persist across python blocks
+        self._kernel = SessionKernel() if session_kernel else None
+        if self._kernel is not None:
+            weakref.finalize(self, self._kernel.shutdown)
+
+    @property
+    def messages(self) -> MessageStore:
+        """The conversation history; assigning a list of messages replaces it."""
+        return self._messages
+
+    @messages.setter
+    def messages(self, messages: Iterable[Union[ChatMessage, dict]]):
+        self._messages = MessageStore(messages)
+
     def _add_message(self, message: Union[ChatMessage, dict]):
         """Add a message to the conversation history."""
-        if isinstance(message, dict):
-            self.messages.append(ChatMessage(**message))
-        elif isinstance(message, ChatMessage):
-            self.messages.append(message)
+        self._messages.append(message)
+
+    def _get_response(self) -> str:
+        """
+        Get the model's next turn for the conversation so far, streamed if
+        the agent streams, and record the turn's timings in turn_metrics.
+        """
+        if self.stream:
+            response, metrics = stream_model_response(
+                messages=self.messages,
+                model=self.model,
+                client=self._client,
+                use_vllm=self.use_vllm,
+            )
         else:
-            raise ValueError("Invalid message type")
+            metrics = TurnMetrics()
+            response = get_model_response(
+                messages=self.messages,
+                model=self.model,  # Pass the model if specified
+                client=self._client,
+                use_vllm=self.use_vllm,
+            )
+            metrics.dispatch = metrics.elapsed()
+            metrics.chars = len(response or "")
+        self.turn_metrics.append(metrics)
+        return response
+
+    def _run_python(self, python_code: str) -> tuple:
+        """
+        Run a python block in the sandbox. Read-only blocks are answered from
+        the memo while the memory's generation is unchanged. With a session
+        kernel every block runs in the kernel, since later blocks may use
+        variables an earlier one defined. The usage ledger is synced with the
+        memory before the first block, and blocks that are not read-only bump
+        the memory's generation and resync the ledger, since they may write
+        without a write tool.
+
+        Args:
+            python_code: The python block from the agent's response.
+
+        Returns:
+            The (locals, error) result of the block.
+        """
+        create_memory_if_not_exists(self.memory_path)
+        init_generation(self.memory_path)
+        if not self._usage_synced:
+            # Count files changed since the ledger was last synced
+            sync_usage(self.memory_path)
+            self._usage_synced = True
+        read_only = self._memo.is_read_only(python_code)
+        if self._kernel is not None:
+            result = self._kernel.execute(
+                python_code,
+                allowed_path=self.memory_path,
+                import_module="agent.tools",
+            )
+        else:
+            key = self._memo.key(python_code, self.memory_path)
+            result = self._memo.get(key)
+            if result is None:
+                result = execute_sandboxed_code(
+                    code=python_code,
+                    allowed_path=self.memory_path,
+                    import_module="agent.tools",
+                )
+                self._memo.put(key, result)
+        if not read_only:
+            # The block may have written files without a write tool (e.g. open())
+            bump_generation(self.memory_path)
+            sync_usage(self.memory_path)
+        return result
 
     def extract_response_parts(self, response: str) -> Tuple[str, str, str]:
         """
@@ -109,12 +211,7 @@ class Agent:
         self._add_message(ChatMessage(role=Role.USER, content=message))
 
         # Get the response from the agent using this instance's clients
-        response = get_model_response(
-            messages=self.messages,
-            model=self.model,  # Pass the model if specified
-            client=self._client,
-            use_vllm=self.use_vllm,
-        )
+        response = self._get_response()
 
         # Extract the thoughts, reply and python code from the response
         thoughts, reply, python_code = self.extract_response_parts(response)
@@ -122,12 +219,7 @@ class Agent:
 
         # Execute the code from the agent's response
         if python_code:
-            create_memory_if_not_exists(self.memory_path)
-            result = execute_sandboxed_code(
-                code=python_code,
-                allowed_path=self.memory_path,
-                import_module="agent.tools",
-            )
+            result = self._run_python(python_code)
 
         # Add the agent's response to the conversation history
         self._add_message(ChatMessage(role=Role.ASSISTANT, content=response))
@@ -142,33 +234,30 @@ class Agent:
             self._add_message(
                 ChatMessage(role=Role.USER, content=format_results(result))
             )
-            response = get_model_response(
-                messages=self.messages,
-                model=self.model,  # Pass the model if specified
-                client=self._client,
-                use_vllm=self.use_vllm,
-            )
+            response = self._get_response()
 
             # Extract the thoughts, reply and python code from the response
             thoughts, reply, python_code = self.extract_response_parts(response)
 
             self._add_message(ChatMessage(role=Role.ASSISTANT, content=response))
             if python_code:
-                create_memory_if_not_exists(self.memory_path)
-                result = execute_sandboxed_code(
-                    code=python_code,
-                    allowed_path=self.memory_path,
-                    import_module="agent.tools",
-                )
+                result = self._run_python(python_code)
             remaining_tool_turns -= 1
 
         return AgentResponse(thoughts=thoughts, reply=reply, python_block=python_code)
 
+    def close(self):
+        """Stop the agent's session kernel, if it has one."""
+        if self._kernel is not None:
+            self._kernel.shutdown()
+
     def save_conversation(self, log: bool = False, save_folder: str = None):
         """
         Save the conversation messages to a JSON file in
-        the output/conversations directory.
+        the output/conversations directory. The conversation is over,
+        so the session kernel (if any) is stopped.
         """
+        self.close()
         if not os.path.exists(SAVE_CONVERSATION_PATH):
             os.makedirs(SAVE_CONVERSATION_PATH, exist_ok=True)
 
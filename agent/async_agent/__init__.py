@@ -1,10 +1,11 @@
 from .async_agent import AsyncAgent, run_agents_concurrently
 from .async_model import get_model_response
-from .async_engine import execute_sandboxed_code
+from .async_engine import execute_sandboxed_code, get_sandbox_stats
 
 __all__ = [
     "AsyncAgent",
     "run_agents_concurrently",
     "get_model_response",
     "execute_sandboxed_code",
+    "get_sandbox_stats",
 ]
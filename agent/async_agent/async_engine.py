@@ -1,8 +1,182 @@
 import asyncio
+import contextlib
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple, Dict
 
-from agent.engine import execute_sandboxed_code as sync_execute_sandboxed_code
-from agent.settings import SANDBOX_TIMEOUT
+from agent.engine import build_sandbox_params, unpack_sandbox_result
+from agent.sandbox.fast_path import plan_fast_path, record_run, run_fast_path_async
+from agent.sandbox.protocol import FrameTooLarge, read_frame_async, write_frame_async
+from agent.settings import (
+    SANDBOX_TIMEOUT,
+    SANDBOX_BACKEND,
+    SANDBOX_MAX_CONCURRENCY,
+    SANDBOX_MAX_RESULT_BYTES,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SandboxLimiter:
+    """
+    Caps the number of sandbox jobs running at once on an event loop and
+    keeps counters for queue-depth reporting.
+    """
+
+    def __init__(self, limit: int = SANDBOX_MAX_CONCURRENCY):
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self.running = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.completed = 0
+        self.cancelled = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Wait for a free slot and hold it for the duration of the block."""
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            yield
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "running": self.running,
+            "waiting": self.waiting,
+            "peak_waiting": self.peak_waiting,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+        }
+
+
+# asyncio primitives are bound to one event loop, so each loop gets its own limiter
+_LIMITERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, SandboxLimiter]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# Threads that drive the (blocking) worker pool on behalf of async callers
+_POOL_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def get_sandbox_limiter() -> SandboxLimiter:
+    """Return the sandbox limiter of the running event loop."""
+    loop = asyncio.get_running_loop()
+    if loop not in _LIMITERS:
+        _LIMITERS[loop] = SandboxLimiter()
+    return _LIMITERS[loop]
+
+
+def get_sandbox_stats() -> dict:
+    """Return running/queued job counts for the running event loop's sandbox limiter."""
+    return get_sandbox_limiter().stats()
+
+
+async def _run_in_subprocess(params: dict, timeout: int) -> tuple[dict, str, str, str]:
+    """
+    Asyncio version of agent.engine._run_in_subprocess. The child is killed if
+    the job times out or the awaiting task is cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    response_r, response_w = os.pipe()
+    with tempfile.TemporaryFile() as stderr_file:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                sys.executable,
+                "-m",
+                "agent.engine",
+                "--response-fd",
+                str(response_w),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=stderr_file,
+                pass_fds=(response_w,),
+            )
+        except BaseException:
+            os.close(response_r)
+            raise
+        finally:
+            os.close(response_w)
+
+        reader = asyncio.StreamReader()
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader),
+            os.fdopen(response_r, "rb", buffering=0),
+        )
+
+        async def exchange():
+            try:
+                await write_frame_async(process.stdin, pickle.dumps(params))
+                process.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            return await read_frame_async(reader, SANDBOX_MAX_RESULT_BYTES)
+
+        finished = False
+        try:
+            payload = await asyncio.wait_for(exchange(), timeout)
+            finished = True
+        except asyncio.TimeoutError:
+            logger.error(
+                "Sandboxed code exceeded time limit of %d seconds; terminating.",
+                timeout,
+            )
+            return None, f"TimeoutError: Code execution exceeded {timeout} seconds.", "", ""
+        except FrameTooLarge as e:
+            return None, str(e), "", ""
+        finally:
+            transport.close()
+            if not finished and process.returncode is None:
+                process.kill()
+            # Shielded so a cancelled caller still reaps the child
+            await asyncio.shield(process.wait())
+
+        if payload is None:
+            stderr_file.seek(0)
+            return None, stderr_file.read().decode(errors="replace").strip(), "", ""
+
+    try:
+        return pickle.loads(payload)
+    except Exception as e:
+        return None, f"Failed to decode sandbox output: {e}", "", ""
+
+
+async def _run_on_pool(params: dict, timeout: int) -> tuple[dict, str, str, str]:
+    """Run a job on the worker pool from a helper thread, killing its worker on cancellation."""
+    global _POOL_EXECUTOR
+    from agent.sandbox.pool import SandboxJob, get_sandbox_pool
+
+    if _POOL_EXECUTOR is None:
+        _POOL_EXECUTOR = ThreadPoolExecutor(
+            max_workers=SANDBOX_MAX_CONCURRENCY, thread_name_prefix="sandbox-pool"
+        )
+    job = SandboxJob()
+    future = asyncio.get_running_loop().run_in_executor(
+        _POOL_EXECUTOR, get_sandbox_pool().run, params, timeout, job
+    )
+    try:
+        return await future
+    except asyncio.CancelledError:
+        job.cancel()
+        raise
 
 
 async def execute_sandboxed_code(
@@ -15,13 +189,20 @@ async def execute_sandboxed_code(
     available_functions: dict = None,
     import_module: str = None,
     log: bool = False,
+    backend: str = None,
+    return_output: bool = False,
+    assigned_only: bool = False,
+    fast_path: bool = None,
 ) -> Tuple[Optional[Dict], str]:
     """
-    Async wrapper for executing Python code in a sandboxed subprocess.
+    Execute Python code in a sandbox without blocking the event loop.
 
-    This wraps the synchronous execute_sandboxed_code function to work with async/await.
-    Since the underlying implementation uses multiprocessing (which is already non-blocking),
-    we run it in a thread executor to avoid blocking the event loop.
+    Tool-only code takes the in-process fast path (see agent.engine). Spawned
+    sandboxes are driven with asyncio subprocesses and zygote jobs over
+    asyncio sockets; pool jobs run on a dedicated thread pool. At most
+    SANDBOX_MAX_CONCURRENCY jobs run at once per event loop, the rest wait
+    (see get_sandbox_stats). Cancelling the awaiting task kills the sandbox
+    process that was running the job.
 
     Parameters:
         code (str): The Python code to execute.
@@ -33,17 +214,33 @@ async def execute_sandboxed_code(
         available_functions (dict): Dictionary of functions to make available in the sandbox.
         import_module (str): Name of a Python module to import and make available.
         log (bool): Whether to enable logging.
+        backend (str): Sandbox backend ("spawn", "pool" or "zygote"). Defaults to SANDBOX_BACKEND.
+        return_output (bool): If True, also return the captured stdout and stderr.
+        assigned_only (bool): If True, only return variables the code assigned.
+        fast_path (bool): If True, run tool-only code in-process. Defaults to SANDBOX_FAST_PATH.
 
     Returns:
         (dict, str): A tuple containing the dictionary of local variables and error message.
     """
-    # Run the synchronous function in a thread executor to avoid blocking
-    loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(
-        None,  # Use default executor
-        sync_execute_sandboxed_code,
+    steps = plan_fast_path(
+        code,
+        allow_installs,
+        requirements_path,
+        allowed_path,
+        blacklist,
+        available_functions,
+        import_module,
+        fast_path,
+    )
+    if steps is not None:
+        result = await run_fast_path_async(
+            steps, os.path.abspath(allowed_path), import_module, timeout
+        )
+        return unpack_sandbox_result(result, return_output)
+    record_run(fast_path=False)
+
+    sandbox_args = (
         code,
-        timeout,
         allow_installs,
         requirements_path,
         allowed_path,
@@ -51,5 +248,29 @@ async def execute_sandboxed_code(
         available_functions,
         import_module,
         log,
+        assigned_only,
     )
-    return result
+    if requirements_path:
+        # Installing requirements blocks on pip, keep it off the event loop
+        params, error_msg = await asyncio.get_running_loop().run_in_executor(
+            None, build_sandbox_params, *sandbox_args
+        )
+    else:
+        params, error_msg = build_sandbox_params(*sandbox_args)
+    if params is None:
+        return unpack_sandbox_result((None, error_msg, "", ""), return_output)
+
+    backend = backend or SANDBOX_BACKEND
+    async with get_sandbox_limiter().slot():
+        if backend == "pool":
+            result = await _run_on_pool(params, timeout)
+        elif backend == "zygote":
+            from agent.sandbox.zygote import run_in_zygote_async
+
+            result = await run_in_zygote_async(params, timeout)
+        elif backend == "spawn":
+            result = await _run_in_subprocess(params, timeout)
+        else:
+            result = (None, f"Unknown sandbox backend: {backend}", "", "")
+
+    return unpack_sandbox_result(result, return_output)
@@ -10,25 +10,36 @@ from agent.settings import (
     VLLM_HOST,
     VLLM_PORT,
 )
+from agent.clients import get_async_openai_client
+from agent.llm_cache import acached_response
+from agent.messages import MessageStore
+from agent.scheduler import estimate_tokens, scheduler_for
 from agent.schemas import ChatMessage, Role
+from agent.streaming import STREAM_STOP_SEQUENCES, TurnMetrics, TurnStreamParser
 
 
 def create_async_openai_client() -> AsyncOpenAI:
-    """Create a new AsyncOpenAI client instance."""
-    return AsyncOpenAI(
-        api_key=OPENROUTER_API_KEY,
-        base_url=OPENROUTER_BASE_URL,
+    """Return the shared async OpenRouter client (see agent.clients)."""
+    return get_async_openai_client(
+        base_url=OPENROUTER_BASE_URL, api_key=OPENROUTER_API_KEY
     )
 
 
 def create_async_vllm_client(host: str = "0.0.0.0", port: int = 8000) -> AsyncOpenAI:
-    """Create a new async vLLM client instance (OpenAI-compatible)."""
-    return AsyncOpenAI(
+    """Return the shared async vLLM client (OpenAI-compatible) for a server."""
+    return get_async_openai_client(
         base_url=f"http://{host}:{port}/v1",
         api_key="EMPTY",  # vLLM doesn't require a real API key
     )
 
 
+def _payload(messages: Union[list[ChatMessage], MessageStore]) -> list[dict]:
+    """Return the request body of a message history."""
+    if isinstance(messages, MessageStore):
+        return messages.payload()
+    return [_as_dict(m) for m in messages]
+
+
 def _as_dict(msg: Union[ChatMessage, dict]) -> dict:
     """
     Accept either ChatMessage or raw dict and return the raw dict.
@@ -43,7 +54,7 @@ def _as_dict(msg: Union[ChatMessage, dict]) -> dict:
 
 
 async def get_model_response(
-    messages: Optional[list[ChatMessage]] = None,
+    messages: Optional[Union[list[ChatMessage], MessageStore]] = None,
     message: Optional[str] = None,
     system_prompt: Optional[str] = None,
     model: str = OPENROUTER_STRONG_MODEL,
@@ -83,16 +94,81 @@ async def get_model_response(
             )
         messages.append(_as_dict(ChatMessage(role=Role.USER, content=message)))
     else:
-        messages = [_as_dict(m) for m in messages]
+        messages = _payload(messages)
 
-    if use_vllm:
-        completion = await client.chat.completions.create(
-            model=model, messages=messages
+    async def complete() -> Optional[str]:
+        completion = await scheduler_for(client).run(
+            lambda: client.chat.completions.create(model=model, messages=messages),
+            tokens=estimate_tokens(messages),
         )
-
         return completion.choices[0].message.content
-    else:
-        completion = await client.chat.completions.create(
-            model=model, messages=messages
+
+    return await acached_response(
+        complete, "chat", model, messages, endpoint=str(client.base_url)
+    )
+
+
+async def stream_model_response(
+    messages: Union[list[ChatMessage], MessageStore],
+    model: str = OPENROUTER_STRONG_MODEL,
+    client: Optional[AsyncOpenAI] = None,
+    use_vllm: bool = False,
+) -> tuple[str, TurnMetrics]:
+    """
+    Stream a response, stopping as soon as the turn can be acted on: the
+    server stops at "</reply>", and the stream is closed once a non-empty
+    python block is complete, so the rest of the generation is never paid for.
+
+    Args:
+        messages: A list of ChatMessage objects.
+        model: The model to use.
+        client: Optional AsyncOpenAI client to use. If None, a new one is created.
+        use_vllm: Whether to use vLLM backend instead of OpenRouter.
+
+    Returns:
+        The response, ending with the closing tag that ended it, and the
+        turn's timings.
+    """
+    if client is None:
+        if use_vllm:
+            client = create_async_vllm_client(host=VLLM_HOST, port=VLLM_PORT)
+        else:
+            client = create_async_openai_client()
+    metrics = TurnMetrics()
+    payload = _payload(messages)
+
+    async def stream_turn() -> str:
+        parser = TurnStreamParser()
+        # Only opening the stream is scheduled and retried, not the tokens after it
+        stream = await scheduler_for(client).run(
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=payload,
+                stop=STREAM_STOP_SEQUENCES,
+                stream=True,
+            ),
+            tokens=estimate_tokens(payload),
         )
-        return completion.choices[0].message.content
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if not content:
+                    continue
+                if metrics.ttft is None:
+                    metrics.ttft = metrics.elapsed()
+                metrics.chars += len(content)
+                if parser.feed(content):
+                    metrics.early_stop = True
+                    break
+        finally:
+            await stream.close()
+        return parser.result()
+
+    # A cached turn replays the text only, its metrics have no TTFT
+    response = await acached_response(
+        stream_turn, "chat.stream", model, payload, endpoint=str(client.base_url)
+    )
+    metrics.dispatch = metrics.elapsed()
+    return response, metrics
@@ -0,0 +1,96 @@
+import posixpath
+import sqlite3
+from typing import Optional
+
+from agent.links import resolve_note_link
+from agent.markdown import normalize_name, note_title, parse_attributes
+from agent.memory_index import open_index
+from agent.notes import NoteIndexer, ensure_fresh
+
+# The (note, key) -> value table of every "- **Key**: value" bullet and
+# frontmatter key in the memory. Entities are named by the note's title (its
+# first "# " heading), falling back to the file name. Keys and entity names
+# are matched case-insensitively, ignoring punctuation.
+
+
+def _drop(conn: sqlite3.Connection, note: str) -> None:
+    conn.execute("DELETE FROM attributes WHERE file = ?", (note,))
+
+
+def _index(conn: sqlite3.Connection, note: str, text: str) -> None:
+    _drop(conn, note)
+    entity = note_title(text) or posixpath.splitext(posixpath.basename(note))[0]
+    conn.executemany(
+        "INSERT INTO attributes "
+        "(file, entity, entity_name, section, key, key_name, value, line) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                note,
+                entity,
+                normalize_name(entity),
+                attribute.section,
+                attribute.key,
+                normalize_name(attribute.key),
+                attribute.value,
+                attribute.line,
+            )
+            for attribute in parse_attributes(text)
+        ],
+    )
+
+
+def _clear(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM attributes")
+
+
+ATTRIBUTE_INDEXER = NoteIndexer("attributes_built", _index, _drop, _clear)
+
+
+def query(
+    memory_path: str, entity: Optional[str] = None, key: Optional[str] = None
+) -> list[dict]:
+    """
+    Look up attributes by entity and/or key.
+
+    An entity is matched by its note (a path or link, see
+    agent.links.resolve_note_link) or by its title. A key matches keys with
+    the same name; if there are none, keys containing it ("phone" matches
+    "Phone Number").
+
+    Returns:
+        A list of {"file", "entity", "section", "key", "value"} dicts in note
+        and line order.
+    """
+    where, params = [], []
+    if entity:
+        note = resolve_note_link(memory_path, entity)
+        entity_name = normalize_name(posixpath.splitext(entity)[0].strip("[]"))
+        where.append("(file = ? OR entity_name = ?)")
+        params += [note, entity_name]
+    columns = "SELECT file, entity, section, key, value FROM attributes"
+    order = " ORDER BY file, line"
+    with open_index(memory_path) as conn:
+        ensure_fresh(conn, memory_path, ATTRIBUTE_INDEXER)
+        if key:
+            key_name = normalize_name(key)
+            exact = " AND ".join(where + ["key_name = ?"])
+            rows = conn.execute(
+                f"{columns} WHERE {exact}{order}", params + [key_name]
+            ).fetchall()
+            if not rows:
+                # Normalized names hold no LIKE wildcards
+                partial = " AND ".join(where + ["key_name LIKE ?"])
+                rows = conn.execute(
+                    f"{columns} WHERE {partial}{order}", params + [f"%{key_name}%"]
+                ).fetchall()
+        elif where:
+            rows = conn.execute(
+                f"{columns} WHERE {' AND '.join(where)}{order}", params
+            ).fetchall()
+        else:
+            rows = conn.execute(columns + order).fetchall()
+    return [
+        {"file": file, "entity": name, "section": section, "key": k, "value": value}
+        for file, name, section, k, value in rows
+    ]
@@ -0,0 +1,209 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Callable, Optional
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+from openai._constants import DEFAULT_CONNECTION_LIMITS
+
+from agent.settings import (
+    CLIENT_KEEPALIVE_EXPIRY,
+    CLIENT_MAX_CONNECTIONS,
+    CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def client_limits(defaults: Any = DEFAULT_CONNECTION_LIMITS) -> Any:
+    """
+    Return the connection limits every pooled client is created with. They
+    are built with the class of `defaults`, an SDK's own default limits, so
+    they match the HTTP library that SDK was installed with.
+    """
+    return type(defaults)(
+        max_connections=CLIENT_MAX_CONNECTIONS,
+        max_keepalive_connections=CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=CLIENT_KEEPALIVE_EXPIRY,
+    )
+
+
+class ClientRegistry:
+    """
+    Process-wide LLM clients, one per (kind, base_url, api_key), each with its
+    own keep-alive connection pool, so every agent and model wrapper talking
+    to the same endpoint reuses the same connections.
+
+    Async clients are also keyed by event loop, since an httpx async
+    connection pool cannot be shared between loops. Sync clients live until
+    close() (registered with atexit); async clients until aclose() is awaited
+    on their loop, or until the loop is garbage collected.
+
+    Clients are created with max_retries=0: retries and backoff belong to
+    agent.scheduler, which sees every request to a provider.
+    """
+
+    def __init__(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._clients: dict[tuple, Any] = {}
+        self._async_clients: (
+            "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple, Any]]"
+        ) = weakref.WeakKeyDictionary()
+        self._detached: dict[tuple, Any] = {}  # Async clients made outside a loop
+
+    def _get(self, clients: dict, key: tuple, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            client = clients.get(key)
+            if client is None:
+                client = clients[key] = factory()
+                logger.debug("Created pooled %s client for %s", key[0], key[1])
+            return client
+
+    def openai(
+        self, base_url: Optional[str] = None, api_key: Optional[str] = None
+    ) -> OpenAI:
+        """Return the shared OpenAI client for an endpoint."""
+        return self._get(
+            self._clients,
+            ("openai", base_url, api_key),
+            lambda: OpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                max_retries=0,
+                http_client=DefaultHttpxClient(limits=client_limits()),
+            ),
+        )
+
+    def async_openai(
+        self, base_url: Optional[str] = None, api_key: Optional[str] = None
+    ) -> AsyncOpenAI:
+        """Return the shared AsyncOpenAI client for an endpoint on the running loop."""
+        return self._get(
+            self._loop_clients(),
+            ("async_openai", base_url, api_key),
+            lambda: AsyncOpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(limits=client_limits()),
+            ),
+        )
+
+    def anthropic(
+        self, base_url: Optional[str] = None, api_key: Optional[str] = None
+    ) -> Any:
+        """Return the shared Anthropic client for an endpoint."""
+        # Only the knowledge graph tooling needs anthropic, import it on demand
+        from anthropic import Anthropic, DefaultHttpxClient as AnthropicHttpxClient
+        from anthropic._constants import (
+            DEFAULT_CONNECTION_LIMITS as ANTHROPIC_CONNECTION_LIMITS,
+        )
+
+        return self._get(
+            self._clients,
+            ("anthropic", base_url, api_key),
+            lambda: Anthropic(
+                base_url=base_url,
+                api_key=api_key,
+                max_retries=0,
+                http_client=AnthropicHttpxClient(
+                    limits=client_limits(ANTHROPIC_CONNECTION_LIMITS)
+                ),
+            ),
+        )
+
+    def _loop_clients(self) -> dict:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self._detached
+        with self._lock:
+            if loop not in self._async_clients:
+                self._async_clients[loop] = {}
+            return self._async_clients[loop]
+
+    def stats(self) -> dict:
+        """Return how many clients of each kind are open."""
+        with self._lock:
+            counts: dict[str, int] = {}
+            async_maps = [*self._async_clients.values(), self._detached]
+            for key in [*self._clients, *(k for m in async_maps for k in m)]:
+                counts[key[0]] = counts.get(key[0], 0) + 1
+            return counts
+
+    def close(self) -> None:
+        """Close the sync clients and their connections."""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for client in clients.values():
+            try:
+                client.close()
+            except Exception as e:
+                logger.warning("Could not close LLM client: %s", e)
+
+    async def aclose(self) -> None:
+        """Close the async clients of the running event loop."""
+        with self._lock:
+            loop = asyncio.get_running_loop()
+            clients = {**self._async_clients.pop(loop, {}), **self._detached}
+            self._detached = {}
+        for client in clients.values():
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning("Could not close LLM client: %s", e)
+
+
+_REGISTRY: Optional[ClientRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_client_registry() -> ClientRegistry:
+    """
+    Return the process-wide client registry. Clients inherited through fork()
+    are never reused, since their connections are shared with the parent.
+    """
+    global _REGISTRY
+    with _REGISTRY_LOCK:
+        if _REGISTRY is None or _REGISTRY._pid != os.getpid():
+            _REGISTRY = ClientRegistry()
+            atexit.register(_REGISTRY.close)
+        return _REGISTRY
+
+
+def get_openai_client(
+    base_url: Optional[str] = None, api_key: Optional[str] = None
+) -> OpenAI:
+    """Return the shared OpenAI client for `base_url` (see ClientRegistry)."""
+    return get_client_registry().openai(base_url, api_key)
+
+
+def get_async_openai_client(
+    base_url: Optional[str] = None, api_key: Optional[str] = None
+) -> AsyncOpenAI:
+    """Return the shared AsyncOpenAI client for `base_url` (see ClientRegistry)."""
+    return get_client_registry().async_openai(base_url, api_key)
+
+
+def get_anthropic_client(
+    base_url: Optional[str] = None, api_key: Optional[str] = None
+) -> Any:
+    """Return the shared Anthropic client for `base_url` (see ClientRegistry)."""
+    return get_client_registry().anthropic(base_url, api_key)
+
+
+def close_all() -> None:
+    """
+    Close every sync client. Later lookups create new clients, but clients
+    already handed out (e.g. an agent's) must not be used after this.
+    """
+    get_client_registry().close()
+
+
+async def aclose_all() -> None:
+    """Close every async client of the running event loop."""
+    await get_client_registry().aclose()
@@ -1,15 +1,32 @@
 import builtins
+import contextlib
 import importlib
+import io
 import logging
+import operator
 import os
 import sys
+import tempfile
+import time
 import traceback
 import types
 import pickle
 import subprocess
-import base64
 
-from agent.settings import SANDBOX_TIMEOUT
+from agent.registry import get_tool_registry
+from agent.sandbox.analysis import assigned_names
+from agent.sandbox.code_cache import get_code_cache
+from agent.sandbox.fast_path import plan_fast_path, record_run, run_fast_path
+from agent.sandbox.protocol import FrameTooLarge, read_frame, write_frame
+from agent.sandbox.serializer import decode_locals, encode_locals
+from agent.settings import (
+    SANDBOX_TIMEOUT,
+    SANDBOX_BACKEND,
+    SANDBOX_MAX_OUTPUT_CHARS,
+    SANDBOX_MAX_RESULT_BYTES,
+    SANDBOX_MAX_VALUE_BYTES,
+    SANDBOX_MAX_LOCALS_BYTES,
+)
 
 # Configure a logger for the sandbox (in real use, configure handlers/level as needed)
 logger = logging.getLogger(__name__)
@@ -23,11 +40,22 @@ def _run_user_code(
     blacklist: list,
     available_functions: dict,
     log: bool = False,
+    namespace: dict = None,
 ) -> tuple[dict, str]:
     """
     Execute code under sandboxed conditions (limited file access, optional installs,
-    and blacklisting) and return the resulting locals and an error message.
+    and blacklisting) and return the resulting raw locals and an error message.
+    If `namespace` is given the code runs with it as its locals, so variables
+    carry over between calls (see agent.sandbox.kernel).
+
+    Every patch applied to process-global state (builtins, os functions, the
+    working directory) is undone before returning, so long-lived workers can
+    run many jobs without one job's restrictions leaking into the next.
     """
+    saved_builtins = dict(builtins.__dict__)
+    saved_os = {"remove": os.remove, "rename": os.rename}
+    saved_attrs = []
+    saved_cwd = os.getcwd()
     try:
         # Optional: apply working directory and file access restriction
         if allowed_path:
@@ -96,6 +124,9 @@ def _run_user_code(
                         mod_obj = None
                     # If module is imported in sandbox, remove the attribute
                     if mod_obj and hasattr(mod_obj, attr_name):
+                        saved_attrs.append(
+                            (mod_obj, attr_name, getattr(mod_obj, attr_name))
+                        )
                         try:
                             setattr(
                                 mod_obj, attr_name, None
@@ -149,11 +180,13 @@ def _run_user_code(
         if available_functions:
             exec_globals.update(available_functions)
 
-        exec_locals = {}  # local variables will be collected here
+        # local variables will be collected here
+        exec_locals = namespace if namespace is not None else {}
 
         error_msg = None
         try:
-            exec(code, exec_globals, exec_locals)  # Execute the user's code
+            # Execute the user's code, reusing the compiled snippet if it ran before
+            exec(get_code_cache().compile(code), exec_globals, exec_locals)
         except Exception as e:
             # Catch any exception and format it
             tb = traceback.format_exc()
@@ -174,19 +207,11 @@ def _run_user_code(
         # Clean up any blacklisted or internal entries in locals
         exec_locals.pop("__builtins__", None)
 
-        # Collect only picklable locals for returning
-        safe_locals = {}
-        for var, val in exec_locals.items():
-            try:
-                pickle.dumps(val)  # test picklability
-                safe_locals[var] = val
-            except Exception:
-                safe_locals[var] = repr(val)  # fallback: use string representation
-
         if log:
             logger.info("Sandbox execution finished")
 
-        return safe_locals, error_msg
+        # Locals are pickled (or replaced by their repr) once, by encode_locals in _run_job
+        return exec_locals, error_msg
 
     except Exception as e:
         # Catch any unhandled exceptions in the worker process
@@ -195,6 +220,31 @@ def _run_user_code(
                 "Unhandled exception in sandbox worker: %s", traceback.format_exc()
             )
         return None, f"Sandbox worker error: {str(e)}"
+    finally:
+        _restore_process_state(saved_builtins, saved_os, saved_attrs, saved_cwd)
+
+
+def _restore_process_state(
+    saved_builtins: dict, saved_os: dict, saved_attrs: list, saved_cwd: str
+) -> None:
+    """Undo the global patches applied by _run_user_code."""
+    for name in list(builtins.__dict__):
+        if name not in saved_builtins:
+            del builtins.__dict__[name]
+    for name, value in saved_builtins.items():
+        if builtins.__dict__.get(name) is not value:
+            builtins.__dict__[name] = value
+    for name, value in saved_os.items():
+        setattr(os, name, value)
+    for mod_obj, attr_name, value in reversed(saved_attrs):
+        try:
+            setattr(mod_obj, attr_name, value)
+        except Exception:
+            pass
+    try:
+        os.chdir(saved_cwd)
+    except OSError:
+        pass
 
 
 def execute_sandboxed_code(
@@ -207,6 +257,10 @@ def execute_sandboxed_code(
     available_functions: dict = None,
     import_module: str = None,
     log: bool = False,
+    backend: str = None,
+    return_output: bool = False,
+    assigned_only: bool = False,
+    fast_path: bool = None,
 ) -> tuple[dict, str]:
     """
     Execute the given Python code string in a sandboxed subprocess with specified restrictions.
@@ -222,11 +276,90 @@ def execute_sandboxed_code(
                           If the code uses any of these, it will be prevented or result in an error.
         available_functions (dict): Dictionary of functions to make available in the sandboxed environment.
                                    The keys are the function names, and the values are the function objects.
-        import_module (str): Name of a Python module to import and make all its functions available in the sandbox.
+        import_module (str): Name of a Python module whose tools (see agent.registry) are made available in the sandbox.
+        backend (str): "spawn" starts a fresh interpreter for this call, "pool" runs it on a
+                       pre-warmed worker from agent.sandbox.pool and "zygote" forks it from a
+                       process that already imported agent.tools (agent.sandbox.zygote).
+                       Defaults to SANDBOX_BACKEND.
+        return_output (bool): If True, also return what the code wrote to stdout and stderr.
+        assigned_only (bool): If True, only return variables the code assigned, leaving out
+                              imported modules and function or class definitions.
+        fast_path (bool): If True, code that only assigns variables and calls tools of import_module
+                          with literal in-memory paths runs in-process (agent.sandbox.fast_path)
+                          instead of in a sandbox. Defaults to SANDBOX_FAST_PATH.
 
     Returns:
         (dict, str): A tuple containing the dictionary of local variables from the executed code (or None on failure),
                      and an error message (str) if an error/exception occurred, or None if execution was successful.
+                     With return_output=True the tuple is (locals, error, stdout, stderr); each stream is capped at
+                     SANDBOX_MAX_OUTPUT_CHARS characters. Values larger than SANDBOX_MAX_VALUE_BYTES, or
+                     past a total of SANDBOX_MAX_LOCALS_BYTES, come back truncated with an explicit marker.
+    """
+    steps = plan_fast_path(
+        code,
+        allow_installs,
+        requirements_path,
+        allowed_path,
+        blacklist,
+        available_functions,
+        import_module,
+        fast_path,
+    )
+    if steps is not None:
+        result = run_fast_path(
+            steps, os.path.abspath(allowed_path), import_module, timeout
+        )
+        return unpack_sandbox_result(result, return_output)
+    record_run(fast_path=False)
+
+    params, error_msg = build_sandbox_params(
+        code,
+        allow_installs,
+        requirements_path,
+        allowed_path,
+        blacklist,
+        available_functions,
+        import_module,
+        log,
+        assigned_only,
+    )
+    if params is None:
+        return unpack_sandbox_result((None, error_msg, "", ""), return_output)
+
+    backend = backend or SANDBOX_BACKEND
+    if backend == "pool":
+        from agent.sandbox.pool import get_sandbox_pool
+
+        result = get_sandbox_pool().run(params, timeout)
+    elif backend == "zygote":
+        from agent.sandbox.zygote import run_in_zygote
+
+        result = run_in_zygote(params, timeout)
+    elif backend == "spawn":
+        result = _run_in_subprocess(params, timeout)
+    else:
+        result = (None, f"Unknown sandbox backend: {backend}", "", "")
+
+    return unpack_sandbox_result(result, return_output)
+
+
+def build_sandbox_params(
+    code: str,
+    allow_installs: bool = False,
+    requirements_path: str = None,
+    allowed_path: str = None,
+    blacklist: list = None,
+    available_functions: dict = None,
+    import_module: str = None,
+    log: bool = False,
+    assigned_only: bool = False,
+) -> tuple[dict, str]:
+    """
+    Install requirements, validate the tool module and build the job sent to a
+    sandbox process. Arguments are as for execute_sandboxed_code.
+
+    Returns:
+        (dict, str): The job parameters and None, or None and an error message.
     """
     # Step 1: If package installs are allowed, handle requirements and prepare environment
     if requirements_path:
@@ -256,77 +389,320 @@ def execute_sandboxed_code(
         import_module = available_functions
         available_functions = None
 
+    # Tools from import_module are resolved by the sandbox process from its own
+    # cached registry, so only the module name crosses the process boundary
     if import_module:
         try:
-            module = importlib.import_module(import_module)
-            if available_functions is None:
-                available_functions = {}
-            for name in dir(module):
-                if not name.startswith("_"):
-                    attr = getattr(module, name)
-                    if callable(attr):
-                        available_functions[name] = attr
+            get_tool_registry(import_module)
         except ImportError as e:
             logger.error(f"Failed to import module {import_module}: {e}")
             return None, f"Failed to import module {import_module}: {e}"
 
-    # Step 2: Execute the code in a separate Python subprocess
+    # Step 2: Build the job for the sandbox process
     params = {
         "code": code,
         "allow_installs": allow_installs,
         "allowed_path": allowed_path,
         "blacklist": blacklist or [],
         "available_functions": available_functions or {},
+        "tool_module": import_module,
         "log": log,
+        "assigned_only": assigned_only,
+        "max_value_bytes": SANDBOX_MAX_VALUE_BYTES,
+        "max_locals_bytes": SANDBOX_MAX_LOCALS_BYTES,
     }
+    return params, None
 
-    env = os.environ.copy()
-    env["SANDBOX_PARAMS"] = base64.b64encode(pickle.dumps(params)).decode()
 
-    try:
-        result = subprocess.run(
-            [sys.executable, "-m", "agent.engine"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=timeout,
-            env=env,
-        )
-    except subprocess.TimeoutExpired:
-        logger.error(
-            "Sandboxed code exceeded time limit of %d seconds; terminating.", timeout
-        )
-        return None, f"TimeoutError: Code execution exceeded {timeout} seconds."
+def unpack_sandbox_result(result: tuple, return_output: bool = False) -> tuple:
+    """
+    Turn the raw (locals, error, stdout, stderr[, stats]) tuple from a sandbox
+    backend into the value returned by execute_sandboxed_code.
+    """
+    local_vars, error_msg, stdout, stderr = result[:4]
+    if local_vars is not None:
+        try:
+            local_vars = decode_locals(local_vars)
+        except Exception as e:
+            local_vars, error_msg = None, f"Failed to decode sandbox output: {e}"
+    if error_msg is None:
+        error_msg = ""
+
+    if return_output:
+        return local_vars, error_msg, stdout, stderr
+    return local_vars, error_msg
 
-    if result.returncode != 0:
-        return None, result.stderr.decode().strip()
+
+def _run_in_subprocess(params: dict, timeout: int) -> tuple[dict, str, str, str]:
+    """
+    Run one job in a freshly spawned interpreter. The job is sent over the
+    child's stdin and the result comes back over a dedicated response pipe.
+    """
+    deadline = time.monotonic() + timeout
+    response_r, response_w = os.pipe()
+    with tempfile.TemporaryFile() as stderr_file:
+        try:
+            process = subprocess.Popen(
+                [sys.executable, "-m", "agent.engine", "--response-fd", str(response_w)],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=stderr_file,
+                pass_fds=(response_w,),
+            )
+        finally:
+            os.close(response_w)
+
+        finished = False
+        try:
+            try:
+                write_frame(process.stdin.fileno(), pickle.dumps(params))
+            except BrokenPipeError:
+                pass
+            process.stdin.close()
+            payload = read_frame(response_r, deadline, SANDBOX_MAX_RESULT_BYTES)
+            finished = True
+        except TimeoutError:
+            logger.error(
+                "Sandboxed code exceeded time limit of %d seconds; terminating.",
+                timeout,
+            )
+            return None, f"TimeoutError: Code execution exceeded {timeout} seconds.", "", ""
+        except FrameTooLarge as e:
+            return None, str(e), "", ""
+        finally:
+            os.close(response_r)
+            if not finished:
+                process.kill()
+            process.wait()
+
+        if payload is None:
+            stderr_file.seek(0)
+            return None, stderr_file.read().decode(errors="replace").strip(), "", ""
 
     try:
-        local_vars, error_msg = pickle.loads(result.stdout)
+        return pickle.loads(payload)
     except Exception as e:
-        return None, f"Failed to decode sandbox output: {e}"
+        return None, f"Failed to decode sandbox output: {e}", "", ""
 
-    if error_msg is None:
-        error_msg = ""
 
-    return local_vars, error_msg
+class _BoundedOutput(io.TextIOBase):
+    """A text stream that keeps the first `limit` characters written to it."""
 
+    def __init__(self, limit: int = SANDBOX_MAX_OUTPUT_CHARS):
+        self.limit = limit
+        self.size = 0
+        self.dropped = 0
+        self._parts = []
 
-def _subprocess_entry() -> None:
-    """Entry point for sandbox subprocess."""
-    params_b64 = os.environ.get("SANDBOX_PARAMS")
-    if not params_b64:
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        room = self.limit - self.size
+        if room > 0:
+            self._parts.append(text[:room])
+            self.size += min(len(text), room)
+        self.dropped += max(0, len(text) - max(room, 0))
+        return len(text)
+
+    def getvalue(self) -> str:
+        text = "".join(self._parts)
+        if self.dropped:
+            text += f"\n... [{self.dropped} characters truncated]"
+        return text
+
+
+def _run_job(params: dict, namespace: dict = None) -> bytes:
+    """
+    Run one job inside a sandbox process and return the pickled
+    (locals, error, stdout, stderr, stats) result, with each local pickled
+    separately by encode_locals. A session kernel passes its persistent
+    `namespace`.
+    """
+    available_functions = dict(params.get("available_functions", {}))
+    if params.get("tool_module"):
+        available_functions.update(
+            get_tool_registry(params["tool_module"]).functions()
+        )
+
+    stdout, stderr = _BoundedOutput(), _BoundedOutput()
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        locals_dict, error = _run_user_code(
+            params["code"],
+            params.get("allow_installs", False),
+            params.get("allowed_path"),
+            params.get("blacklist", []),
+            available_functions,
+            params.get("log", False),
+            namespace,
+        )
+    try:
+        if locals_dict is not None:
+            locals_dict = encode_locals(
+                locals_dict,
+                assigned_names(params["code"]) if params.get("assigned_only") else None,
+                params.get("max_value_bytes", SANDBOX_MAX_VALUE_BYTES),
+                params.get("max_locals_bytes", SANDBOX_MAX_LOCALS_BYTES),
+            )
+        payload = pickle.dumps(
+            (
+                locals_dict,
+                error,
+                stdout.getvalue(),
+                stderr.getvalue(),
+                {"code_cache": get_code_cache().stats()},
+            )
+        )
+    except Exception as e:
+        payload = pickle.dumps(
+            (None, f"Failed to encode sandbox output: {e}", "", "")
+        )
+    if len(payload) > SANDBOX_MAX_RESULT_BYTES:
+        payload = pickle.dumps(
+            (
+                None,
+                f"Sandbox result of {len(payload)} bytes exceeds {SANDBOX_MAX_RESULT_BYTES} bytes",
+                stdout.getvalue(),
+                stderr.getvalue(),
+            )
+        )
+    return payload
+
+
+def _subprocess_entry(response_fd: int) -> None:
+    """Entry point for a sandbox subprocess spawned for a single job."""
+    request_fd = os.dup(0)
+    _silence_std_streams()
+    payload = read_frame(request_fd)
+    if payload is None:
         sys.exit(1)
-    params = pickle.loads(base64.b64decode(params_b64))
-    locals_dict, error = _run_user_code(
-        params["code"],
-        params.get("allow_installs", False),
-        params.get("allowed_path"),
-        params.get("blacklist", []),
-        params.get("available_functions", {}),
-        params.get("log", False),
+    write_frame(response_fd, _run_job(pickle.loads(payload)))
+
+
+def _silence_std_streams() -> None:
+    """Point fds 0 and 1 at /dev/null so user code cannot print into or read from protocol pipes."""
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+
+def _worker_entry() -> None:
+    """Entry point for a long-lived sandbox worker (see agent.sandbox.pool)."""
+    in_fd, out_fd = os.dup(0), os.dup(1)
+    _silence_std_streams()
+
+    state = None
+    while True:
+        payload = read_frame(in_fd)
+        if payload is None:
+            break
+        params = pickle.loads(payload)
+        tool_module = params.get("tool_module")
+        if state is None or (tool_module and tool_module not in state[1]):
+            # Load the tools and the code cache first so the snapshot keeps them
+            if tool_module:
+                get_tool_registry(tool_module)
+            get_code_cache()
+            state = _snapshot_worker_state()
+        try:
+            write_frame(out_fd, _run_job(params))
+        finally:
+            # After replying, so the restore overlaps with the caller's work
+            _restore_worker_state(state)
+
+
+# Interpreter-wide lists a job could extend to change how later imports resolve
+_SYS_LISTS = ("path", "meta_path", "path_hooks")
+
+
+def _snapshot_worker_state() -> tuple:
+    """
+    Capture the interpreter state a pooled job could change and that a fresh
+    sandbox process would not carry over: os.environ, sys.modules, the
+    import lists of sys and the attributes of every loaded module.
+    """
+    modules = dict(sys.modules)
+    module_vars = {
+        name: dict(vars(module))
+        for name, module in modules.items()
+        if isinstance(getattr(module, "__dict__", None), dict)
+    }
+    sys_lists = {name: list(getattr(sys, name)) for name in _SYS_LISTS}
+    return dict(os.environ), modules, module_vars, sys_lists
+
+
+def _same_items(current: dict, saved: dict) -> bool:
+    """True if `current` maps the same keys to the same objects as `saved`."""
+    return (
+        len(current) == len(saved)
+        and current.keys() == saved.keys()
+        and all(map(operator.is_, map(current.get, saved), saved.values()))
     )
-    sys.stdout.buffer.write(pickle.dumps((locals_dict, error)))
+
+
+def _restore_worker_state(state: tuple) -> None:
+    """Undo changes made since _snapshot_worker_state, so the next job starts clean."""
+    saved_environ, saved_modules, saved_vars, sys_lists = state
+    if not _same_items(sys.modules, saved_modules):
+        for name in list(sys.modules):
+            if name not in saved_modules:
+                del sys.modules[name]
+        sys.modules.update(saved_modules)
+    for name, attrs in saved_vars.items():
+        module_vars = vars(saved_modules[name])
+        if not _same_items(module_vars, attrs):
+            for attr in list(module_vars):
+                if attr not in attrs:
+                    del module_vars[attr]
+            module_vars.update(attrs)
+    for name, items in sys_lists.items():
+        current = getattr(sys, name)
+        if len(current) != len(items) or not all(map(operator.is_, current, items)):
+            current[:] = items
+            sys.path_importer_cache.clear()
+    if dict(os.environ) != saved_environ:
+        os.environ.clear()
+        os.environ.update(saved_environ)
+
+
+def _kernel_entry(idle_timeout: float) -> None:
+    """
+    Entry point for a session kernel (see agent.sandbox.kernel): a worker
+    that keeps one namespace for all its jobs and exits after `idle_timeout`
+    seconds without a job.
+    """
+    in_fd, out_fd = os.dup(0), os.dup(1)
+    _silence_std_streams()
+
+    namespace = {}
+    while True:
+        try:
+            payload = read_frame(in_fd, time.monotonic() + idle_timeout)
+        except TimeoutError:
+            break
+        if payload is None:
+            break
+        write_frame(out_fd, _run_job(pickle.loads(payload), namespace))
+
+
+def _zygote_entry(socket_path: str) -> None:
+    """Entry point for the fork-server sandbox (see agent.sandbox.zygote)."""
+    from agent.sandbox.zygote import serve_zygote
+
+    control_fd = os.dup(0)
+    _silence_std_streams()
+    serve_zygote(socket_path, control_fd)
 
 
 if __name__ == "__main__":
-    _subprocess_entry()
+    if "--worker" in sys.argv[1:]:
+        _worker_entry()
+    elif "--kernel" in sys.argv[1:]:
+        _kernel_entry(float(sys.argv[sys.argv.index("--kernel") + 1]))
+    elif "--zygote" in sys.argv[1:]:
+        _zygote_entry(sys.argv[sys.argv.index("--zygote") + 1])
+    elif "--response-fd" in sys.argv[1:]:
+        _subprocess_entry(int(sys.argv[sys.argv.index("--response-fd") + 1]))
+    else:
+        sys.exit(1)
@@ -0,0 +1,181 @@
+import os
+import posixpath
+import sqlite3
+
+from agent.listing import stat_files
+from agent.memory_index import (
+    clear_stats,
+    file_stat,
+    forget_stats,
+    get_state,
+    open_index,
+    record_stats,
+    set_state,
+    stale_files,
+    transaction,
+)
+from agent.memory_meta import relative_path
+from agent.settings import MEMORY_META_DIR
+
+# The usage table holds the total size in bytes of every directory's subtree,
+# keyed by its path relative to the memory root ("" is the root itself). A
+# file write adds its size change to each ancestor directory, so a limit check
+# is a lookup instead of summing the tree. The ledger also records the
+# (mtime_ns, size) of every file it counted, so sync_usage can apply the size
+# changes of files written without a write tool (python blocks, editors,
+# other sessions). Limit checks never walk the memory; agents sync at the
+# start of a session and after every block that may have written files.
+_BUILT_KEY = "usage_built"
+_VERSION = "2"  # Ledgers built before file stats were recorded are rebuilt
+
+
+def _ancestors(rel_dir: str) -> list[str]:
+    """Return a directory and all its ancestors up to the root ("")."""
+    dirs = [""]
+    parts = rel_dir.split("/") if rel_dir else []
+    for i in range(1, len(parts) + 1):
+        dirs.append("/".join(parts[:i]))
+    return dirs
+
+
+def _add_to_ancestors(conn: sqlite3.Connection, deltas: dict[str, int]) -> None:
+    """Add each file's size change (keyed by file path) to its directories."""
+    totals: dict[str, int] = {}
+    for rel_path, delta in deltas.items():
+        if not delta:
+            continue
+        for d in _ancestors(posixpath.dirname(rel_path)):
+            totals[d] = totals.get(d, 0) + delta
+    conn.executemany(
+        "INSERT INTO usage (dir, bytes) VALUES (?, ?) "
+        "ON CONFLICT(dir) DO UPDATE SET bytes = bytes + excluded.bytes",
+        totals.items(),
+    )
+
+
+def _recorded_size(conn: sqlite3.Connection, rel_path: str) -> int:
+    row = conn.execute(
+        "SELECT size FROM file_stats WHERE owner = ? AND path = ?",
+        (_BUILT_KEY, rel_path),
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def _rebuild(conn: sqlite3.Connection, memory_path: str) -> None:
+    stats = stat_files(os.path.abspath(memory_path))
+    conn.execute("DELETE FROM usage")
+    clear_stats(conn, _BUILT_KEY)
+    conn.execute("INSERT INTO usage (dir, bytes) VALUES ('', 0)")
+    _add_to_ancestors(conn, {path: size for path, (_, size) in stats.items()})
+    record_stats(conn, _BUILT_KEY, stats)
+    set_state(conn, _BUILT_KEY, _VERSION)
+
+
+def rebuild_usage(memory_path: str) -> None:
+    """Recompute the usage of every directory of a memory with a single scan."""
+    with open_index(memory_path) as conn, transaction(conn):
+        _rebuild(conn, memory_path)
+
+
+def record_size_change(memory_path: str, file_path: str) -> None:
+    """
+    Update the usage of a file's directory and all ancestors after the file
+    was written or deleted, from the size the ledger recorded for it. If the
+    ledger was never built it is built instead, from the files as they are
+    now, which already include the change.
+
+    Args:
+        memory_path: The memory root.
+        file_path: The file that was written or deleted.
+    """
+    rel_path = relative_path(memory_path, file_path)
+    if not rel_path or rel_path.split("/")[0] == MEMORY_META_DIR:
+        return
+    stat = file_stat(file_path)
+    with open_index(memory_path) as conn, transaction(conn):
+        if get_state(conn, _BUILT_KEY) != _VERSION:
+            _rebuild(conn, memory_path)
+            return
+        new_size = stat[1] if stat is not None else 0
+        _add_to_ancestors(conn, {rel_path: new_size - _recorded_size(conn, rel_path)})
+        if stat is None:
+            forget_stats(conn, _BUILT_KEY, [rel_path])
+        else:
+            record_stats(conn, _BUILT_KEY, {rel_path: stat})
+
+
+def sync_usage(memory_path: str) -> None:
+    """
+    Bring the ledger up to date with the files on disk: build it if needed,
+    otherwise apply the size changes of files whose mtime or size differ
+    from what it recorded. Files are only stat'ed, never read.
+    """
+    with open_index(memory_path) as conn:
+        _ensure_fresh(conn, memory_path)
+
+
+def _ensure_built(conn: sqlite3.Connection, memory_path: str) -> bool:
+    """Build the ledger if it is missing or outdated; True if it was built."""
+    if get_state(conn, _BUILT_KEY) == _VERSION:
+        return False
+    with transaction(conn):
+        if get_state(conn, _BUILT_KEY) != _VERSION:
+            _rebuild(conn, memory_path)
+    return True
+
+
+def _ensure_fresh(conn: sqlite3.Connection, memory_path: str) -> None:
+    if _ensure_built(conn, memory_path):
+        return
+    stats = stat_files(os.path.abspath(memory_path))
+    changed, removed = stale_files(conn, _BUILT_KEY, stats)
+    if not changed and not removed:
+        return
+    with transaction(conn):
+        deltas = {}
+        for rel_path in changed:
+            deltas[rel_path] = stats[rel_path][1] - _recorded_size(conn, rel_path)
+        for rel_path in removed:
+            deltas[rel_path] = -_recorded_size(conn, rel_path)
+        _add_to_ancestors(conn, deltas)
+        record_stats(conn, _BUILT_KEY, {path: stats[path] for path in changed})
+        forget_stats(conn, _BUILT_KEY, removed)
+
+
+def ancestor_usage(memory_path: str, file_path: str) -> list[tuple[str, int]]:
+    """
+    Return (directory, bytes) for the directory containing `file_path` and
+    each of its ancestors, innermost first and ending with the root ("").
+
+    Raises:
+        ValueError: If `file_path` is outside of the memory.
+    """
+    rel_dir = relative_path(memory_path, os.path.dirname(os.path.abspath(file_path)))
+    if rel_dir is None:
+        raise ValueError(f"{file_path} is outside of the memory")
+    dirs = _ancestors(rel_dir)
+    placeholders = ",".join("?" * len(dirs))
+    with open_index(memory_path) as conn:
+        _ensure_built(conn, memory_path)
+        rows = dict(
+            conn.execute(
+                f"SELECT dir, bytes FROM usage WHERE dir IN ({placeholders})", dirs
+            ).fetchall()
+        )
+    return [(d, rows.get(d, 0)) for d in reversed(dirs)]
+
+
+def dir_usage(memory_path: str, dir_path: str) -> int:
+    """
+    Return the total size in bytes of the files below a directory of the
+    memory (the memory root itself for `dir_path` == memory_path).
+    """
+    rel_dir = relative_path(memory_path, dir_path)
+    if rel_dir is None:
+        raise ValueError(f"{dir_path} is outside of the memory")
+    with open_index(memory_path) as conn:
+        _ensure_built(conn, memory_path)
+        row = conn.execute(
+            "SELECT bytes FROM usage WHERE dir = ?", (rel_dir,)
+        ).fetchone()
+    return row[0] if row else 0
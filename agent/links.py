@@ -0,0 +1,235 @@
+import os
+import posixpath
+import re
+import sqlite3
+import threading
+from collections import deque
+from typing import Optional
+
+from agent.listing import memory_snapshot
+from agent.memory_index import open_index
+from agent.notes import NoteIndexer, ensure_fresh, read_note
+
+# Every [[...]] link of every note, with the bullet key it appears under
+# ("- **Wife**: [[entities/maria]]" has the relation "Wife"). Targets are kept
+# as written, since notes often link by bare name ([[maria.md]]) or relative to
+# themselves; they are resolved against the memory's current file listing.
+_LINK = re.compile(r"\[\[([^\[\]\n]+?)\]\]")
+_RELATION = re.compile(r"^\s*[-*+]\s+\*\*(.+?)\*\*\s*:")
+_FENCE = re.compile(r"^[ \t]*(```|~~~)")
+
+
+def normalize_link(link: str) -> str:
+    """
+    Turn a link as written ("[[path/to/note|alias]]", "path/to/note#Heading")
+    into the note path it names, with a ".md" suffix.
+    """
+    link = link.strip()
+    if link.startswith("[[") and link.endswith("]]"):
+        link = link[2:-2]
+    link = link.split("|", 1)[0].split("#", 1)[0].strip()
+    while link.startswith(("./", "/")):
+        link = link[1:] if link.startswith("/") else link[2:]
+    if link and not link.endswith(".md"):
+        link += ".md"
+    return link
+
+
+def parse_links(text: str) -> list[tuple[str, str, int]]:
+    """Return (target, relation, line) for every [[...]] link outside code blocks."""
+    links = []
+    in_fence = False
+    for number, line in enumerate(text.splitlines(), start=1):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        if in_fence or "[[" not in line:
+            continue
+        relation = _RELATION.match(line)
+        for match in _LINK.finditer(line):
+            target = normalize_link(match.group(1))
+            if target:
+                links.append((target, relation.group(1) if relation else "", number))
+    return links
+
+
+def _drop(conn: sqlite3.Connection, note: str) -> None:
+    conn.execute("DELETE FROM links WHERE source = ?", (note,))
+
+
+def _index(conn: sqlite3.Connection, note: str, text: str) -> None:
+    _drop(conn, note)
+    conn.executemany(
+        "INSERT INTO links (source, target, name, relation, line) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [
+            (note, target, posixpath.basename(target).lower(), relation, line)
+            for target, relation, line in parse_links(text)
+        ],
+    )
+
+
+def _clear(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM links")
+
+
+LINK_INDEXER = NoteIndexer("links_built", _index, _drop, _clear)
+
+
+class _NoteNames:
+    """The notes of one file listing, by path and by lowercased file name."""
+
+    def __init__(self, files: list[str]):
+        self.files = files
+        self.paths = set(files)
+        self.by_name: dict[str, list[str]] = {}
+        for path in files:
+            name = posixpath.basename(path).lower()
+            self.by_name.setdefault(name, []).append(path)
+
+
+# Memory root -> names of its current listing, rebuilt when the listing changes
+_NAMES: dict[str, _NoteNames] = {}
+_NAMES_LOCK = threading.Lock()
+
+
+def _note_names(memory_path: str) -> _NoteNames:
+    root = os.path.abspath(memory_path)
+    files = memory_snapshot(root)
+    with _NAMES_LOCK:
+        names = _NAMES.get(root)
+        if names is None or names.files is not files:
+            names = _NAMES[root] = _NoteNames(files)
+        return names
+
+
+def _resolve(names: _NoteNames, link: str, source: Optional[str]) -> Optional[str]:
+    target = normalize_link(link)
+    if not target:
+        return None
+    if target in names.paths:
+        return target
+    if source:
+        relative = posixpath.normpath(posixpath.join(posixpath.dirname(source), target))
+        if relative in names.paths:
+            return relative
+    candidates = names.by_name.get(posixpath.basename(target).lower())
+    if not candidates:
+        return None
+    # Prefer the note closest to the linking note, then the shallowest one
+    source_dir = posixpath.dirname(source) if source else ""
+    return min(
+        candidates,
+        key=lambda path: (
+            posixpath.dirname(path) != source_dir,
+            path.count("/"),
+            path,
+        ),
+    )
+
+
+def resolve_note_link(
+    memory_path: str, link: str, source: Optional[str] = None
+) -> Optional[str]:
+    """
+    Resolve a link to the note it points to.
+
+    A link names a path from the memory root, a path relative to the linking
+    note or, failing both, just a file name that is looked up anywhere in the
+    memory.
+
+    Args:
+        memory_path: The memory root.
+        link: The link, with or without the surrounding brackets.
+        source: The note containing the link, relative to the memory root.
+
+    Returns:
+        The note's path relative to the memory root, or None if no note matches.
+    """
+    return _resolve(_note_names(memory_path), link, source)
+
+
+def _incoming(
+    conn: sqlite3.Connection, names: _NoteNames, note: str
+) -> list[tuple[str, str]]:
+    rows = conn.execute(
+        "SELECT source, target, relation FROM links WHERE name = ? "
+        "ORDER BY source, line",
+        (posixpath.basename(note).lower(),),
+    ).fetchall()
+    return [
+        (source, relation)
+        for source, target, relation in rows
+        if _resolve(names, target, source) == note
+    ]
+
+
+def _outgoing(
+    conn: sqlite3.Connection, names: _NoteNames, note: str
+) -> list[tuple[Optional[str], str]]:
+    rows = conn.execute(
+        "SELECT target, relation FROM links WHERE source = ? ORDER BY line", (note,)
+    ).fetchall()
+    return [(_resolve(names, target, note), relation) for target, relation in rows]
+
+
+def backlinks(memory_path: str, note: str) -> list[dict]:
+    """
+    Return the links pointing to a note, as {"file", "relation"} dicts in
+    file order. `note` is a path relative to the memory root.
+    """
+    names = _note_names(memory_path)
+    with open_index(memory_path) as conn:
+        ensure_fresh(conn, memory_path, LINK_INDEXER)
+        incoming = _incoming(conn, names, note)
+    results = []
+    for source, relation in incoming:
+        entry = {"file": source, "relation": relation}
+        if entry not in results:
+            results.append(entry)
+    return results
+
+
+def neighbourhood(
+    memory_path: str,
+    note: str,
+    depth: int,
+    include_backlinks: bool,
+    max_notes: int,
+) -> list[dict]:
+    """
+    Collect the notes within `depth` links of `note`, breadth first.
+
+    Returns:
+        Up to `max_notes` {"file", "depth", "from", "relation", "content"}
+        dicts, starting with `note` itself at depth 0. "from" and "relation"
+        describe the link through which a note was first reached.
+    """
+    root = os.path.abspath(memory_path)
+    names = _note_names(root)
+    results = []
+    seen = {note}
+    queue = deque([(note, 0, None, "")])
+    with open_index(root) as conn:
+        ensure_fresh(conn, root, LINK_INDEXER)
+        while queue and len(results) < max_notes:
+            current, level, parent, relation = queue.popleft()
+            content = read_note(os.path.join(root, current))
+            results.append(
+                {
+                    "file": current,
+                    "depth": level,
+                    "from": parent,
+                    "relation": relation,
+                    "content": content,
+                }
+            )
+            if level >= depth:
+                continue
+            neighbours = _outgoing(conn, names, current)
+            if include_backlinks:
+                neighbours += _incoming(conn, names, current)
+            for neighbour, label in neighbours:
+                if neighbour is not None and neighbour not in seen:
+                    seen.add(neighbour)
+                    queue.append((neighbour, level + 1, current, label))
+    return results
@@ -0,0 +1,155 @@
+import fnmatch
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterator, Optional
+
+from agent.memory_meta import read_generation
+from agent.settings import LISTING_CACHE_SIZE, MEMORY_META_DIR
+
+# Full listings of recently used memories, keyed by memory root. A listing is
+# valid for one generation (bumped by every write tool and by the agents after
+# any block that is not read-only) and while the mtime of every directory it
+# walked is unchanged, since creating, deleting or renaming a file updates
+# its directory's mtime. That catches writes from editors and other processes.
+_SNAPSHOTS: "OrderedDict[str, tuple[str, dict[str, int], list[str]]]" = OrderedDict()
+_SNAPSHOTS_LOCK = threading.Lock()
+
+
+def _walk(
+    dir_path: str, dir_mtimes: Optional[dict[str, int]] = None
+) -> Iterator[tuple[str, os.DirEntry]]:
+    """Yield (relative path, entry) of every file, noting each directory's mtime."""
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        path = os.path.join(dir_path, rel_dir)
+        try:
+            if dir_mtimes is not None:
+                # Taken before listing: a change during the walk shows up next time
+                dir_mtimes[rel_dir] = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name != MEMORY_META_DIR:
+                    subdirs.append(rel_path)
+            else:
+                yield rel_path, entry
+        stack.extend(reversed(subdirs))
+
+
+def walk_files(dir_path: str) -> list[str]:
+    """
+    Return every file below `dir_path` as a "/"-separated relative path.
+    Each directory lists its own files first, then its subdirectories, both
+    sorted by name, so the order is stable for pagination. The memory's
+    bookkeeping directory is skipped.
+    """
+    return [rel_path for rel_path, _ in _walk(dir_path)]
+
+
+def stat_files(dir_path: str) -> dict[str, tuple[int, int]]:
+    """
+    Return the (mtime_ns, size) of every file below `dir_path`, keyed by the
+    paths walk_files returns. Symlinks are not followed.
+    """
+    stats = {}
+    for rel_path, entry in _walk(dir_path):
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        stats[rel_path] = (stat.st_mtime_ns, stat.st_size)
+    return stats
+
+
+def _dir_mtimes_unchanged(root: str, dir_mtimes: dict[str, int]) -> bool:
+    for rel_dir, mtime_ns in dir_mtimes.items():
+        try:
+            if os.stat(os.path.join(root, rel_dir)).st_mtime_ns != mtime_ns:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def memory_snapshot(memory_path: str) -> list[str]:
+    """
+    Return the listing of a whole memory, reusing the cached one while the
+    memory's generation and directory mtimes are unchanged. Untracked
+    memories are walked every time.
+    """
+    root = os.path.abspath(memory_path)
+    generation = read_generation(root)
+    if generation is None:
+        return walk_files(root)
+    with _SNAPSHOTS_LOCK:
+        cached = _SNAPSHOTS.get(root)
+    if (
+        cached is not None
+        and cached[0] == generation
+        and _dir_mtimes_unchanged(root, cached[1])
+    ):
+        with _SNAPSHOTS_LOCK:
+            if root in _SNAPSHOTS:
+                _SNAPSHOTS.move_to_end(root)
+        return cached[2]
+    dir_mtimes: dict[str, int] = {}
+    files = [rel_path for rel_path, _ in _walk(root, dir_mtimes)]
+    with _SNAPSHOTS_LOCK:
+        _SNAPSHOTS[root] = (generation, dir_mtimes, files)
+        _SNAPSHOTS.move_to_end(root)
+        while len(_SNAPSHOTS) > LISTING_CACHE_SIZE:
+            _SNAPSHOTS.popitem(last=False)
+    return files
+
+
+def list_dir(
+    memory_path: str,
+    dir_path: str,
+    pattern: Optional[str] = None,
+    max_depth: Optional[int] = None,
+) -> list[str]:
+    """
+    List the files below `dir_path`, relative to it, from the memory's snapshot.
+
+    Args:
+        memory_path: The memory root.
+        dir_path: The directory to list, inside or outside the memory.
+        pattern: Optional glob; matched against the file name, or against the
+            relative path if it contains a "/".
+        max_depth: Optional number of subdirectory levels to descend (0 lists
+            only the files directly in `dir_path`).
+    """
+    root = os.path.abspath(memory_path)
+    dir_path = os.path.abspath(dir_path)
+    rel_dir = os.path.relpath(dir_path, root).replace(os.sep, "/")
+    if rel_dir == ".":
+        files = memory_snapshot(root)
+    elif rel_dir == ".." or rel_dir.startswith("../"):
+        files = walk_files(dir_path)
+    else:
+        prefix = rel_dir + "/"
+        files = [
+            path[len(prefix) :]
+            for path in memory_snapshot(root)
+            if path.startswith(prefix)
+        ]
+
+    if max_depth is not None:
+        files = [path for path in files if path.count("/") <= max_depth]
+    if pattern:
+        if "/" in pattern:
+            files = [path for path in files if fnmatch.fnmatch(path, pattern)]
+        else:
+            files = [
+                path
+                for path in files
+                if fnmatch.fnmatch(path.rsplit("/", 1)[-1], pattern)
+            ]
+    return files
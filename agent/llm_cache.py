@@ -0,0 +1,316 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from agent.settings import LLM_CACHE_MAX_BYTES, LLM_CACHE_MODE, LLM_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_MODES = ("off", "readwrite", "record", "replay")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    model TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+# Eviction trims the cache to this fraction of its budget, so it does not
+# run again on the next insert
+_EVICT_TO = 0.9
+
+# Responses deleted per statement while evicting
+_EVICT_BATCH = 256
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+def request_key(kind: str, model: str, messages: Any, **params: Any) -> str:
+    """
+    Hash a request. Anything that changes the response (the call kind, e.g.
+    "chat" or "responses.parse", the model, the messages and every other
+    parameter) must be part of the key.
+    """
+    request = {"kind": kind, "model": model, "messages": messages, "params": params}
+    encoded = json.dumps(request, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class LLMCache:
+    """
+    Model responses stored in SQLite, keyed by request_key and by how many
+    times the same request was already made in this run. Repeated identical
+    requests (e.g. sampled ones, or retries of a failed generation) each
+    get their own entry, so a recorded run replays in the same order.
+
+    Modes:
+        off: Every request goes to the model.
+        readwrite: Hits are served from the cache and misses are stored.
+        record: Every request goes to the model and its response is stored,
+            replacing any older one, so a whole run can be captured.
+        replay: Only the cache is used; a miss raises CacheMiss.
+
+    Beyond `max_bytes` of responses, the least recently used are evicted,
+    except in record mode, which keeps everything it captures.
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        mode: str = LLM_CACHE_MODE,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+    ):
+        if mode not in LLM_CACHE_MODES:
+            raise ValueError(
+                f"Unknown LLM cache mode {mode!r}, use one of {LLM_CACHE_MODES}"
+            )
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # Times each request_key was looked up in this run
+        self._occurrences: dict[str, int] = {}
+        # Bytes stored, counted from the table on connect and kept up to date
+        # by our own puts; only an exact recount can trigger an eviction
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._bytes = self._stored_bytes(conn)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _stored_bytes(conn: sqlite3.Connection) -> int:
+        (total,) = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        return total
+
+    def occurrence_key(self, key: str) -> str:
+        """Return the entry key of the next occurrence of a request in this run."""
+        with self._lock:
+            n = self._occurrences.get(key, 0)
+            self._occurrences[key] = n + 1
+        return f"{key}:{n}"
+
+    def last_occurrence_key(self, key: str) -> Optional[str]:
+        """Return the entry key of the latest occurrence of a request, if any."""
+        with self._lock:
+            n = self._occurrences.get(key)
+        return None if n is None else f"{key}:{n - 1}"
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a stored response and mark it as recently used."""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str, kind: str = "", model: str = "") -> None:
+        """Store a response, evicting the least recently used beyond max_bytes."""
+        now = time.time()
+        size = len(value.encode())
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, model, value, size, now, now),
+            )
+            # A replaced response is still counted, which only makes the
+            # recount below happen a little early
+            self._bytes += size
+            if self.mode != "record" and self._bytes > self.max_bytes:
+                self._evict(conn)
+
+    def forget(self, key: str) -> None:
+        """Drop a response, e.g. one that turned out to be unusable."""
+        with self._lock:
+            self._connect().execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        # Other processes may have evicted (or added) responses too
+        self._bytes = self._stored_bytes(conn)
+        if self._bytes <= self.max_bytes:
+            return
+        excess = self._bytes - int(self.max_bytes * _EVICT_TO)
+        evicted = 0
+        while excess > 0:
+            rows = conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_used LIMIT ?",
+                (_EVICT_BATCH,),
+            ).fetchall()
+            if not rows:
+                break
+            doomed = []
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                doomed.append((key,))
+                excess -= size
+                self._bytes -= size
+            conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            evicted += len(doomed)
+        self.evicted += evicted
+        logger.info("Evicted %d responses from the LLM cache", evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            return {
+                "mode": self.mode,
+                "entries": entries,
+                "bytes": size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted": self.evicted,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _lookup(self, key: str, kind: str, model: str) -> Optional[str]:
+        if self.mode == "record":
+            return None
+        value = self.get(key)
+        if value is None and self.mode == "replay":
+            raise CacheMiss(
+                f"No recorded {kind} response of {model} in {self.path} ({key[:12]})"
+            )
+        return value
+
+
+_CACHE: Optional[LLMCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Return the process-wide LLM cache, configured from the settings on first use."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None or _CACHE._pid != os.getpid():
+            _CACHE = LLMCache()
+        return _CACHE
+
+
+def configure_llm_cache(
+    mode: str, path: str = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES
+) -> LLMCache:
+    """Replace the process-wide LLM cache, e.g. from a script's command line."""
+    global _CACHE
+    cache = LLMCache(path, mode, max_bytes)
+    with _CACHE_LOCK:
+        previous, _CACHE = _CACHE, cache
+    if previous is not None:
+        previous.close()
+    return cache
+
+
+def cached_response(
+    call: Callable[[], str], kind: str, model: str, messages: Any, **params: Any
+) -> str:
+    """
+    Return the cached response of a request, or make it with `call` and
+    cache the result (see LLMCache for the modes).
+
+    Args:
+        call: Makes the request and returns its response as a string; a
+            None response is returned but not cached.
+        kind: The kind of call, so different APIs never share an entry.
+        model: The model of the request.
+        messages: The messages (or prompt) of the request.
+        **params: Every other parameter that affects the response.
+
+    Returns:
+        The response.
+
+    Raises:
+        CacheMiss: In replay mode, if the request was never recorded.
+    """
+    cache = get_llm_cache()
+    if cache.mode == "off":
+        return call()
+    key = cache.occurrence_key(request_key(kind, model, messages, **params))
+    value = cache._lookup(key, kind, model)
+    if value is None:
+        value = call()
+        if value is not None:
+            cache.put(key, value, kind, model)
+    return value
+
+
+async def acached_response(
+    call: Callable[[], Awaitable[str]],
+    kind: str,
+    model: str,
+    messages: Any,
+    **params: Any,
+) -> str:
+    """Async version of cached_response; the cache is read and written off the event loop."""
+    cache = get_llm_cache()
+    if cache.mode == "off":
+        return await call()
+    key = cache.occurrence_key(request_key(kind, model, messages, **params))
+    value = await asyncio.to_thread(cache._lookup, key, kind, model)
+    if value is None:
+        value = await call()
+        if value is not None:
+            await asyncio.to_thread(cache.put, key, value, kind, model)
+    return value
+
+
+def forget_response(kind: str, model: str, messages: Any, **params: Any) -> None:
+    """
+    Drop the latest cached response of a request, e.g. one that turned out
+    to be unusable, so the next run makes it again. Only in readwrite mode:
+    a recorded run keeps every response, so replaying it takes the same
+    retries.
+    """
+    cache = get_llm_cache()
+    if cache.mode != "readwrite":
+        return
+    key = cache.last_occurrence_key(request_key(kind, model, messages, **params))
+    if key is not None:
+        cache.forget(key)
@@ -0,0 +1,214 @@
+import re
+from typing import NamedTuple, Optional
+
+_HEADING = re.compile(r"^(#{1,6})[ \t]+(.*?)[ \t#]*$")
+_FENCE = re.compile(r"^[ \t]*(```|~~~)")
+# "- **Key**: value", also written "- **Key:** value"
+_ATTRIBUTE = re.compile(
+    r"^([ \t]*)[-*+][ \t]+\*\*([^*\n]+?)(?::\*\*|\*\*[ \t]*:)[ \t]*(.*)$"
+)
+_LIST_ITEM = re.compile(r"^[ \t]*(?:[-*+]|\d+[.)])[ \t]+")
+_FRONTMATTER_KEY = re.compile(r"^([A-Za-z_][\w -]*):[ \t]*(.*)$")
+_NON_WORD = re.compile(r"[\W_]+")
+FRONTMATTER = "frontmatter"  # Section name of attributes from YAML frontmatter
+
+
+class Section(NamedTuple):
+    """A heading and the text below it, up to the next heading of any level."""
+
+    heading: str  # The heading text without "#"s, "" before the first heading
+    level: int  # 1-6, 0 for text before the first heading
+    line: int  # 1-based line of the heading (of the first line for level 0)
+    start: int  # Offset in the text where the section starts
+    end: int  # Offset in the text where the next section starts
+
+
+def split_sections(text: str) -> list[Section]:
+    """
+    Split markdown into sections at ATX headings ("## Title"). Lines inside
+    fenced code blocks are never headings. Text before the first heading is
+    a level 0 section, omitted if it is blank.
+    """
+    sections = []
+    heading, level, line, start = "", 0, 1, 0
+    offset = 0
+    in_fence = False
+    for number, raw in enumerate(text.splitlines(keepends=True), start=1):
+        if _FENCE.match(raw):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING.match(raw.rstrip("\r\n"))
+        if match:
+            if level or text[start:offset].strip():
+                sections.append(Section(heading, level, line, start, offset))
+            heading, level, line, start = (
+                match.group(2),
+                len(match.group(1)),
+                number,
+                offset,
+            )
+        offset += len(raw)
+    if level or text[start:offset].strip():
+        sections.append(Section(heading, level, line, start, offset))
+    return sections
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase a key or entity name and reduce punctuation to single spaces."""
+    return _NON_WORD.sub(" ", name.lower()).strip()
+
+
+class Attribute(NamedTuple):
+    """A "- **Key**: value" bullet, or a "key: value" line of the frontmatter."""
+
+    section: str  # Heading of the section holding it, FRONTMATTER for frontmatter
+    key: str
+    value: str  # Nested list items below an attribute are joined with "; "
+    line: int  # 1-based line of the bullet
+    end_line: int  # Last line of the bullet, including its nested lines
+
+
+def _frontmatter(lines: list[str]) -> tuple[list[Attribute], int]:
+    """Parse flat YAML frontmatter; returns its attributes and its line count."""
+    if not lines or lines[0].strip() != "---":
+        return [], 0
+    for end in range(1, len(lines)):
+        if lines[end].strip() in ("---", "..."):
+            break
+    else:
+        return [], 0
+    attributes: list[Attribute] = []
+    for number in range(1, end):
+        line = lines[number].rstrip()
+        match = _FRONTMATTER_KEY.match(line)
+        if match:
+            value = match.group(2).strip().strip("\"'")
+            attributes.append(
+                Attribute(FRONTMATTER, match.group(1), value, number + 1, number + 1)
+            )
+        elif line.lstrip().startswith("- ") and attributes:
+            # A YAML list under the previous key
+            last = attributes[-1]
+            item = line.lstrip()[2:].strip().strip("\"'")
+            value = f"{last.value}; {item}" if last.value else item
+            attributes[-1] = last._replace(value=value, end_line=number + 1)
+    return attributes, end + 1
+
+
+def parse_attributes(text: str) -> list[Attribute]:
+    """
+    Return the attributes of a note: its "- **Key**: value" bullets, in any
+    section and outside code blocks, and the keys of its YAML frontmatter.
+    Lines indented below a bullet belong to it.
+    """
+    lines = text.splitlines()
+    attributes, skip = _frontmatter(lines)
+    headings = {section.line: section.heading for section in split_sections(text)}
+    section = ""
+    current: Optional[Attribute] = None
+    indent = 0
+    in_fence = False
+    for number in range(skip + 1, len(lines) + 1):
+        line = lines[number - 1]
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        if in_fence:
+            current = None
+            continue
+        if number in headings:
+            section, current = headings[number], None
+            continue
+        stripped = line.strip()
+        line_indent = len(line) - len(line.lstrip())
+        if current is not None and stripped and line_indent > indent:
+            item = _LIST_ITEM.sub("", stripped, count=1)
+            value = f"{current.value}; {item}" if current.value else item
+            current = current._replace(value=value, end_line=number)
+            attributes[-1] = current
+            continue
+        match = _ATTRIBUTE.match(line)
+        if match:
+            indent = len(match.group(1))
+            current = Attribute(
+                section, match.group(2).strip(), match.group(3).strip(), number, number
+            )
+            attributes.append(current)
+        elif stripped:
+            current = None
+    return attributes
+
+
+def note_title(text: str) -> Optional[str]:
+    """Return the first level 1 heading of a note, if any."""
+    for section in split_sections(text):
+        if section.level == 1:
+            return section.heading
+    return None
+
+
+def _find_attribute(attributes: list[Attribute], key: str) -> Optional[Attribute]:
+    wanted = normalize_name(key)
+    return next((a for a in attributes if normalize_name(a.key) == wanted), None)
+
+
+def with_attribute(text: str, key: str, value: str, section: str = None) -> str:
+    """
+    Return `text` with the attribute `key` set to `value`.
+
+    An existing attribute (matched like normalize_name) is rewritten in place,
+    keeping its indentation, bullet and key spelling; its nested lines are
+    replaced by the new value. A new attribute goes after the last attribute
+    of `section`, or of "Basic Information" if no section is given; a missing
+    section is appended to the note.
+    """
+    value = " ".join(str(value).split())
+    lines = text.splitlines(keepends=True)
+    attributes = parse_attributes(text)
+    existing = _find_attribute(attributes, key)
+    if existing is not None:
+        first = lines[existing.line - 1]
+        ending = first[len(first.rstrip("\r\n")) :] or "\n"
+        if existing.section == FRONTMATTER:
+            new_line = f"{existing.key}: {value}{ending}"
+        else:
+            match = _ATTRIBUTE.match(first.rstrip("\r\n"))
+            marker = first.lstrip()[0]
+            key_style = f"**{existing.key}**:"
+            if ":**" in first:
+                key_style = f"**{existing.key}:**"
+            new_line = f"{match.group(1)}{marker} {key_style} {value}{ending}"
+        lines[existing.line - 1 : existing.end_line] = [new_line]
+        return "".join(lines)
+
+    bullet = f"- **{key}**: {value}\n"
+    wanted = normalize_name(section or "Basic Information")
+    sections = [s for s in split_sections(text) if s.level]
+    target = next((s for s in sections if normalize_name(s.heading) == wanted), None)
+    if target is None and section is None and attributes:
+        # No "Basic Information": extend the note's last list of attributes
+        last = attributes[-1]
+        if last.section != FRONTMATTER:
+            lines.insert(last.end_line, bullet)
+            return "".join(lines)
+    if target is None:
+        heading = f"## {section or 'Basic Information'}\n"
+        prefix = text if not text or text.endswith("\n") else text + "\n"
+        separator = "\n" if prefix.strip() else ""
+        return f"{prefix}{separator}{heading}{bullet}"
+
+    last_line = target.line + text[target.start : target.end].count("\n")
+    in_section = [a for a in attributes if target.line < a.line < last_line]
+    position = in_section[-1].end_line if in_section else target.line
+    if position == len(lines) and lines and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    lines.insert(position, bullet)
+    return "".join(lines)
+
+
+def without_attribute(text: str, key: str) -> Optional[str]:
+    """Return `text` without the attribute `key` and its nested lines, or None."""
+    existing = _find_attribute(parse_attributes(text), key)
+    if existing is None:
+        return None
+    lines = text.splitlines(keepends=True)
+    del lines[existing.line - 1 : existing.end_line]
+    return "".join(lines)
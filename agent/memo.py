@@ -0,0 +1,92 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from agent.memory_meta import read_generation
+from agent.registry import get_tool_registry
+from agent.sandbox.analysis import is_read_only
+from agent.settings import READ_ONLY_CACHE_SIZE
+
+# Errors raised by the block itself; anything else (timeouts, crashed workers) may be transient
+DETERMINISTIC_ERROR_PREFIX = "Exception in sandboxed code"
+
+
+class ReadOnlyMemo:
+    """
+    An LRU cache of sandbox results for read-only python blocks.
+
+    A block is cached under its source, the memory path and the memory's
+    generation token (see agent.memory_meta), so any write tool invalidates
+    every entry for that memory. Blocks that may write are never cached and
+    clear the memo when they run, since they can change the memory without
+    going through a write tool.
+    """
+
+    def __init__(
+        self, max_entries: int = READ_ONLY_CACHE_SIZE, tool_module: str = "agent.tools"
+    ):
+        self.max_entries = max_entries
+        self.tool_module = tool_module
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+
+    def is_read_only(self, code: str) -> bool:
+        """Whether a block only calls read-only tools (see agent.sandbox.analysis)."""
+        return is_read_only(code, get_tool_registry(self.tool_module).read_only)
+
+    def key(self, code: str, memory_path: str) -> Optional[tuple]:
+        """
+        Return the cache key of a python block, or None if its result may not be cached.
+        """
+        if not self.is_read_only(code):
+            return None
+        generation = read_generation(memory_path)
+        if generation is None:
+            return None
+        return code, memory_path, generation
+
+    def get(self, key: Optional[tuple]) -> Optional[tuple]:
+        """Return the cached result for `key`, counting the lookup."""
+        if key is None:
+            self.uncacheable += 1
+            return None
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: Optional[tuple], result: tuple) -> None:
+        """
+        Record the (locals, error) result of a block that just ran. A None key
+        means the block may have written to the memory, so the whole memo is
+        dropped. Sandbox failures such as timeouts are not cached.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                return
+            error_msg = result[1]
+            if error_msg and not error_msg.startswith(DETERMINISTIC_ERROR_PREFIX):
+                return
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncacheable": self.uncacheable,
+        }
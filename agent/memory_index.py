@@ -0,0 +1,181 @@
+import contextlib
+import os
+import sqlite3
+import threading
+from typing import Iterator, Optional
+
+from agent.memory_meta import meta_path
+
+# Derived data about a memory (usage, search, links, ...) lives in one SQLite
+# file inside its metadata directory. Everything in it can be rebuilt from
+# the memory's files, so deleting the file is always safe.
+INDEX_FILE = "index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS usage (dir TEXT PRIMARY KEY, bytes INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS file_stats (
+    owner TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (owner, path)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5(
+    path UNINDEXED, heading, body, tokenize = 'porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS links (
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    name TEXT NOT NULL,
+    relation TEXT NOT NULL,
+    line INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS links_source ON links (source);
+CREATE INDEX IF NOT EXISTS links_name ON links (name);
+CREATE TABLE IF NOT EXISTS attributes (
+    file TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    entity_name TEXT NOT NULL,
+    section TEXT NOT NULL,
+    key TEXT NOT NULL,
+    key_name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    line INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attributes_file ON attributes (file);
+CREATE INDEX IF NOT EXISTS attributes_entity ON attributes (entity_name);
+CREATE INDEX IF NOT EXISTS attributes_key ON attributes (key_name);
+"""
+
+# (pid, index path) -> (connection, inode of the index file, lock)
+_CONNECTIONS: dict[tuple, tuple[sqlite3.Connection, int, threading.Lock]] = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+
+def _open(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(
+        path, timeout=30, isolation_level=None, check_same_thread=False
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+@contextlib.contextmanager
+def open_index(memory_path: str) -> Iterator[sqlite3.Connection]:
+    """
+    Yield the index connection of a memory, opening it on first use.
+
+    Connections are cached per process and checked against the index file's
+    inode, so an index that was deleted or replaced is reopened. The
+    connection is held exclusively for the duration of the block.
+
+    Args:
+        memory_path: The memory root.
+    """
+    path = os.path.abspath(meta_path(memory_path, INDEX_FILE))
+    key = (os.getpid(), path)
+    with _CONNECTIONS_LOCK:
+        cached = _CONNECTIONS.get(key)
+        try:
+            inode = os.stat(path).st_ino
+        except FileNotFoundError:
+            inode = None
+        if cached is None or cached[1] != inode:
+            if cached is not None:
+                cached[0].close()
+            conn = _open(path)
+            cached = (conn, os.stat(path).st_ino, threading.Lock())
+            _CONNECTIONS[key] = cached
+    conn, _, lock = cached
+    with lock:
+        yield conn
+
+
+def get_state(conn: sqlite3.Connection, key: str) -> str:
+    row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_state(conn: sqlite3.Connection, key: str, value: str) -> None:
+    conn.execute(
+        "INSERT INTO state (key, value) VALUES (?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (key, value),
+    )
+
+
+# Each index records the (mtime_ns, size) of the files it was built from under
+# its own owner name, so it can tell which files changed behind its back: in
+# a python block, in an editor or between sessions.
+
+
+def stale_files(
+    conn: sqlite3.Connection, owner: str, current: dict[str, tuple[int, int]]
+) -> tuple[list[str], list[str]]:
+    """
+    Compare the file stats an index recorded with the files on disk.
+
+    Args:
+        conn: The index connection.
+        owner: The index the stats belong to.
+        current: (mtime_ns, size) by path, as returned by agent.listing.stat_files.
+
+    Returns:
+        The paths that are new or changed, and the paths that are gone.
+    """
+    recorded = {
+        path: (mtime_ns, size)
+        for path, mtime_ns, size in conn.execute(
+            "SELECT path, mtime_ns, size FROM file_stats WHERE owner = ?", (owner,)
+        )
+    }
+    changed = [path for path, stat in current.items() if recorded.get(path) != stat]
+    removed = [path for path in recorded if path not in current]
+    return changed, removed
+
+
+def record_stats(
+    conn: sqlite3.Connection, owner: str, stats: dict[str, tuple[int, int]]
+) -> None:
+    conn.executemany(
+        "INSERT INTO file_stats (owner, path, mtime_ns, size) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(owner, path) DO UPDATE "
+        "SET mtime_ns = excluded.mtime_ns, size = excluded.size",
+        [(owner, path, mtime_ns, size) for path, (mtime_ns, size) in stats.items()],
+    )
+
+
+def forget_stats(conn: sqlite3.Connection, owner: str, paths: list[str]) -> None:
+    conn.executemany(
+        "DELETE FROM file_stats WHERE owner = ? AND path = ?",
+        [(owner, path) for path in paths],
+    )
+
+
+def clear_stats(conn: sqlite3.Connection, owner: str) -> None:
+    conn.execute("DELETE FROM file_stats WHERE owner = ?", (owner,))
+
+
+def file_stat(path: str) -> Optional[tuple[int, int]]:
+    """Return the (mtime_ns, size) of a file, None if it does not exist."""
+    try:
+        stat = os.lstat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+@contextlib.contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Run the block in a write transaction, rolled back if it raises."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
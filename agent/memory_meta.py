@@ -0,0 +1,112 @@
+import contextvars
+import fcntl
+import os
+import uuid
+from typing import Optional
+
+from agent.settings import MEMORY_META_DIR
+
+# Bookkeeping files live in a hidden directory inside the memory root. The
+# generation file holds "<epoch>:<counter>": the epoch is random per file, so a
+# memory directory that is deleted and recreated never repeats a token, and the
+# counter is bumped by every write tool.
+GENERATION_FILE = "generation"
+
+
+# The memory root the tools resolve relative paths against. Sandboxes chdir into
+# the memory, so it is unset there and paths stay relative to the working
+# directory; in-process callers (see agent.sandbox.fast_path) set it instead,
+# since threads share one working directory.
+MEMORY_ROOT: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "memory_root", default=None
+)
+
+
+def memory_root() -> str:
+    """Return the memory root of the current context."""
+    return MEMORY_ROOT.get() or os.getcwd()
+
+
+def resolve_path(path: str) -> str:
+    """Resolve a tool path argument against the memory root of the current context."""
+    root = MEMORY_ROOT.get()
+    if root is None or path is None:
+        return path
+    return os.path.join(root, path)
+
+
+def relative_path(memory_path: str, path: str) -> Optional[str]:
+    """Return `path` relative to the memory root ("/"-separated), None if outside it."""
+    rel = os.path.relpath(os.path.abspath(path), os.path.abspath(memory_path))
+    if rel == ".":
+        return ""
+    if rel == ".." or rel.startswith(".." + os.sep):
+        return None
+    return rel.replace(os.sep, "/")
+
+
+def meta_path(memory_path: str, name: str) -> str:
+    """Return the path of a bookkeeping file inside the memory's metadata directory."""
+    return os.path.join(memory_path, MEMORY_META_DIR, name)
+
+
+def init_generation(memory_path: str) -> str:
+    """
+    Start tracking the generation of a memory directory, if it is not tracked yet.
+
+    Args:
+        memory_path: The memory root.
+
+    Returns:
+        The current generation token.
+    """
+    token = read_generation(memory_path)
+    if token is not None:
+        return token
+    path = meta_path(memory_path, GENERATION_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        token = f.read().strip()
+        if not token:
+            token = f"{uuid.uuid4().hex}:0"
+            f.write(token)
+    return token
+
+
+def read_generation(memory_path: str) -> Optional[str]:
+    """
+    Return the generation token of a memory directory.
+
+    Returns:
+        The token, or None if the directory's generation is not tracked, in
+        which case nothing read from it may be cached.
+    """
+    try:
+        with open(meta_path(memory_path, GENERATION_FILE), "r") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def bump_generation(memory_path: str) -> Optional[str]:
+    """
+    Advance the generation of a memory directory after a write. Untracked
+    directories are left alone.
+
+    Returns:
+        The new token, or None if the directory's generation is not tracked.
+    """
+    try:
+        f = open(meta_path(memory_path, GENERATION_FILE), "r+")
+    except OSError:
+        return None
+    with f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        epoch, _, counter = f.read().strip().partition(":")
+        token = f"{epoch}:{int(counter or 0) + 1}"
+        f.seek(0)
+        f.write(token)
+        f.truncate()
+    return token
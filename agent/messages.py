@@ -0,0 +1,58 @@
+from typing import Iterable, Iterator, Union, overload
+
+from agent.schemas import ChatMessage
+
+
+class MessageStore:
+    """
+    An append-only conversation history that serializes each message once.
+
+    The model request body is the list of already serialized messages, so a
+    turn costs one model_dump() for its new message instead of one per
+    message of the whole history. Stored messages must not be modified in
+    place; replace the history instead (e.g. agent.messages = agent.messages[:1]).
+    Indexing, slicing, iteration and len() behave like a list of ChatMessage.
+    """
+
+    __slots__ = ("_messages", "_payload")
+
+    def __init__(self, messages: Iterable[Union[ChatMessage, dict]] = ()):
+        self._messages: list[ChatMessage] = []
+        self._payload: list[dict] = []
+        for message in messages:
+            self.append(message)
+
+    def append(self, message: Union[ChatMessage, dict]) -> None:
+        if isinstance(message, dict):
+            message = ChatMessage(**message)
+        elif not isinstance(message, ChatMessage):
+            raise ValueError("Invalid message type")
+        self._messages.append(message)
+        self._payload.append(message.model_dump())
+
+    def payload(self) -> list[dict]:
+        """Return the serialized messages, ready for a chat completion request."""
+        return self._payload
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[ChatMessage]:
+        return iter(self._messages)
+
+    @overload
+    def __getitem__(self, index: int) -> ChatMessage: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[ChatMessage]: ...
+
+    def __getitem__(self, index):
+        return self._messages[index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, MessageStore):
+            other = other._messages
+        return self._messages == other
+
+    def __repr__(self) -> str:
+        return f"MessageStore({self._messages!r})"
@@ -8,25 +8,34 @@ from agent.settings import (
     OPENROUTER_BASE_URL,
     OPENROUTER_STRONG_MODEL,
 )
+from agent.clients import get_openai_client
+from agent.llm_cache import cached_response
+from agent.messages import MessageStore
+from agent.scheduler import estimate_tokens, scheduler_for
 from agent.schemas import ChatMessage, Role
+from agent.streaming import STREAM_STOP_SEQUENCES, TurnMetrics, TurnStreamParser
 
 
 def create_openai_client() -> OpenAI:
-    """Create a new OpenAI client instance."""
-    return OpenAI(
-        api_key=OPENROUTER_API_KEY,
-        base_url=OPENROUTER_BASE_URL,
-    )
+    """Return the shared OpenRouter client (see agent.clients)."""
+    return get_openai_client(base_url=OPENROUTER_BASE_URL, api_key=OPENROUTER_API_KEY)
 
 
 def create_vllm_client(host: str = "0.0.0.0", port: int = 8000) -> OpenAI:
-    """Create a new vLLM client instance (OpenAI-compatible)."""
-    return OpenAI(
+    """Return the shared vLLM client (OpenAI-compatible) for a server."""
+    return get_openai_client(
         base_url=f"http://{host}:{port}/v1",
         api_key="EMPTY",  # vLLM doesn't require a real API key
     )
 
 
+def _payload(messages: Union[list[ChatMessage], MessageStore]) -> list[dict]:
+    """Return the request body of a message history."""
+    if isinstance(messages, MessageStore):
+        return messages.payload()
+    return [_as_dict(m) for m in messages]
+
+
 def _as_dict(msg: Union[ChatMessage, dict]) -> dict:
     """
     Accept either ChatMessage or raw dict and return the raw dict.
@@ -41,7 +50,7 @@ def _as_dict(msg: Union[ChatMessage, dict]) -> dict:
 
 
 def get_model_response(
-    messages: Optional[list[ChatMessage]] = None,
+    messages: Optional[Union[list[ChatMessage], MessageStore]] = None,
     message: Optional[str] = None,
     system_prompt: Optional[str] = None,
     model: str = OPENROUTER_STRONG_MODEL,
@@ -82,18 +91,81 @@ def get_model_response(
             )
         messages.append(_as_dict(ChatMessage(role=Role.USER, content=message)))
     else:
-        messages = [_as_dict(m) for m in messages]
+        messages = _payload(messages)
 
-    if use_vllm:
-        completion = client.chat.completions.create(
-            model=model,
-            messages=messages
+    def complete() -> Optional[str]:
+        completion = scheduler_for(client).run_sync(
+            lambda: client.chat.completions.create(model=model, messages=messages),
+            tokens=estimate_tokens(messages),
         )
-            
         return completion.choices[0].message.content
-    else:
-        completion = client.chat.completions.create(
-            model=model,
-            messages=messages
+
+    return cached_response(
+        complete, "chat", model, messages, endpoint=str(client.base_url)
+    )
+
+
+def stream_model_response(
+    messages: Union[list[ChatMessage], MessageStore],
+    model: str = OPENROUTER_STRONG_MODEL,
+    client: Optional[OpenAI] = None,
+    use_vllm: bool = False,
+) -> tuple[str, TurnMetrics]:
+    """
+    Stream a response, stopping as soon as the turn can be acted on: the
+    server stops at "</reply>", and the stream is closed once a non-empty
+    python block is complete, so the rest of the generation is never paid for.
+
+    Args:
+        messages: A list of ChatMessage objects.
+        model: The model to use.
+        client: Optional OpenAI client to use. If None, a new one is created.
+        use_vllm: Whether to use vLLM backend instead of OpenRouter.
+
+    Returns:
+        The response, ending with the closing tag that ended it, and the
+        turn's timings.
+    """
+    if client is None:
+        if use_vllm:
+            client = create_vllm_client()
+        else:
+            client = create_openai_client()
+    metrics = TurnMetrics()
+    payload = _payload(messages)
+
+    def stream_turn() -> str:
+        parser = TurnStreamParser()
+        # Only opening the stream is scheduled and retried, not the tokens after it
+        stream = scheduler_for(client).run_sync(
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=payload,
+                stop=STREAM_STOP_SEQUENCES,
+                stream=True,
+            ),
+            tokens=estimate_tokens(payload),
         )
-        return completion.choices[0].message.content
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if not content:
+                    continue
+                if metrics.ttft is None:
+                    metrics.ttft = metrics.elapsed()
+                metrics.chars += len(content)
+                if parser.feed(content):
+                    metrics.early_stop = True
+                    break
+        finally:
+            stream.close()
+        return parser.result()
+
+    # A cached turn replays the text only, its metrics have no TTFT
+    response = cached_response(
+        stream_turn, "chat.stream", model, payload, endpoint=str(client.base_url)
+    )
+    metrics.dispatch = metrics.elapsed()
+    return response, metrics
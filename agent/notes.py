@@ -0,0 +1,165 @@
+import os
+import sqlite3
+from typing import Callable, NamedTuple, Optional, Sequence
+
+from agent.listing import stat_files
+from agent.memory_index import (
+    clear_stats,
+    file_stat,
+    forget_stats,
+    get_state,
+    open_index,
+    record_stats,
+    set_state,
+    stale_files,
+    transaction,
+)
+from agent.memory_meta import relative_path
+from agent.settings import MEMORY_META_DIR
+
+# Indexes derived from the content of the memory's markdown notes (search,
+# links, ...) share one pass over the files: a write tool reads the note it
+# wrote once and hands the text to every indexer, all in one transaction of
+# the memory's index. Each indexer is built from the files on first use and
+# records the (mtime_ns, size) of every note it indexed, so before answering
+# a query it reindexes the notes that changed without a write tool (see
+# ensure_fresh).
+
+
+class NoteIndexer(NamedTuple):
+    """How one index stores the derived data of a note."""
+
+    built_key: str  # State key set once the index holds every note
+    index: Callable[[sqlite3.Connection, str, str], None]  # (conn, note, text)
+    drop: Callable[[sqlite3.Connection, str], None]  # (conn, note)
+    clear: Callable[[sqlite3.Connection], None]
+
+
+def is_note(rel_path: Optional[str]) -> bool:
+    """Whether a path relative to the memory root is an indexed markdown note."""
+    return (
+        rel_path is not None
+        and rel_path.endswith(".md")
+        and rel_path.split("/")[0] != MEMORY_META_DIR
+    )
+
+
+def read_note(path: str) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def note_stats(memory_path: str) -> dict[str, tuple[int, int]]:
+    """Return the (mtime_ns, size) of every markdown note of a memory."""
+    stats = stat_files(os.path.abspath(memory_path))
+    return {path: stat for path, stat in stats.items() if is_note(path)}
+
+
+def _reindex(
+    conn: sqlite3.Connection,
+    root: str,
+    indexer: NoteIndexer,
+    changed: list[str],
+    removed: list[str],
+    stats: dict[str, tuple[int, int]],
+) -> None:
+    removed = list(removed)
+    for rel_path in changed:
+        text = read_note(os.path.join(root, rel_path))
+        if text is None:
+            removed.append(rel_path)
+            continue
+        indexer.index(conn, rel_path, text)
+        record_stats(conn, indexer.built_key, {rel_path: stats[rel_path]})
+    for rel_path in removed:
+        indexer.drop(conn, rel_path)
+    forget_stats(conn, indexer.built_key, removed)
+
+
+def _rebuild(
+    conn: sqlite3.Connection, memory_path: str, indexers: Sequence[NoteIndexer]
+) -> None:
+    root = os.path.abspath(memory_path)
+    stats = note_stats(root)
+    for indexer in indexers:
+        indexer.clear(conn)
+        clear_stats(conn, indexer.built_key)
+    for rel_path, stat in stats.items():
+        text = read_note(os.path.join(root, rel_path))
+        if text is None:
+            continue
+        for indexer in indexers:
+            indexer.index(conn, rel_path, text)
+            record_stats(conn, indexer.built_key, {rel_path: stat})
+    for indexer in indexers:
+        set_state(conn, indexer.built_key, "1")
+
+
+def rebuild_note_indexes(memory_path: str, indexers: Sequence[NoteIndexer]) -> None:
+    """Reindex every markdown note of a memory."""
+    with open_index(memory_path) as conn, transaction(conn):
+        _rebuild(conn, memory_path, indexers)
+
+
+def ensure_built(
+    conn: sqlite3.Connection, memory_path: str, indexer: NoteIndexer
+) -> None:
+    """Build an index from the memory's notes if it was never built."""
+    if get_state(conn, indexer.built_key) is None:
+        with transaction(conn):
+            if get_state(conn, indexer.built_key) is None:
+                _rebuild(conn, memory_path, [indexer])
+
+
+def ensure_fresh(
+    conn: sqlite3.Connection, memory_path: str, indexer: NoteIndexer
+) -> None:
+    """
+    Bring an index up to date with the notes on disk before it is queried:
+    build it if it was never built, otherwise reindex the notes whose mtime
+    or size differ from what the index recorded, index new notes and drop
+    deleted ones. Only changed notes are read.
+    """
+    ensure_built(conn, memory_path, indexer)
+    stats = note_stats(memory_path)
+    changed, removed = stale_files(conn, indexer.built_key, stats)
+    if changed or removed:
+        with transaction(conn):
+            root = os.path.abspath(memory_path)
+            _reindex(conn, root, indexer, changed, removed, stats)
+
+
+def record_note_change(
+    memory_path: str, file_path: str, indexers: Sequence[NoteIndexer]
+) -> None:
+    """
+    Reindex a note after it was written, or drop it from the indexes if it was
+    deleted. Files other than markdown notes are ignored. Indexes that were
+    never built are built instead, from the files as they are now.
+
+    Args:
+        memory_path: The memory root.
+        file_path: The file that was written or deleted.
+        indexers: The indexes to update.
+    """
+    rel_path = relative_path(memory_path, file_path)
+    if not is_note(rel_path):
+        return
+    stat = file_stat(file_path)
+    text = read_note(file_path) if stat is not None else None
+    with open_index(memory_path) as conn, transaction(conn):
+        unbuilt = [i for i in indexers if get_state(conn, i.built_key) is None]
+        if unbuilt:
+            _rebuild(conn, memory_path, unbuilt)
+        for indexer in indexers:
+            if indexer in unbuilt:
+                continue
+            if text is None:
+                indexer.drop(conn, rel_path)
+                forget_stats(conn, indexer.built_key, [rel_path])
+            else:
+                indexer.index(conn, rel_path, text)
+                record_stats(conn, indexer.built_key, {rel_path: stat})
@@ -0,0 +1,313 @@
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Union
+
+from agent.settings import PATCH_FUZZ
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+# Lines of a git diff that carry no hunk content
+_DIFF_METADATA = (
+    "diff ",
+    "index ",
+    "new file mode",
+    "deleted file mode",
+    "old mode",
+    "new mode",
+    "similarity index",
+    "rename from",
+    "rename to",
+)
+
+
+class PatchError(ValueError):
+    """Raised when a diff cannot be parsed."""
+
+
+@dataclass
+class Hunk:
+    """One `@@` block of a unified diff. Lines keep their line endings."""
+
+    header: str
+    old_start: Optional[int]  # 1-based; None if the header has no line numbers
+    # (tag, text) pairs; the tag is " " for context, "-" or "+"
+    lines: list[tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def old_lines(self) -> list[str]:
+        return [text for tag, text in self.lines if tag != "+"]
+
+    @property
+    def new_lines(self) -> list[str]:
+        return [text for tag, text in self.lines if tag != "-"]
+
+
+@dataclass
+class PatchFailure:
+    """
+    Why a diff did not apply. It prints as a report the model can use to fix
+    its diff.
+    """
+
+    reason: str
+    hunk: int = 0  # 1-based index of the failing hunk, 0 if the whole diff is at fault
+    header: str = ""
+    expected: list[str] = field(default_factory=list)
+    nearest_line: Optional[int] = None  # 1-based line of the closest match in the file
+    nearest: list[str] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        if not self.hunk:
+            return f"Patch failed: {self.reason}"
+        parts = [f"Patch failed at hunk {self.hunk} ({self.header}): {self.reason}"]
+        if self.expected:
+            parts.append("Expected lines:")
+            parts.extend(f"  {line}" for line in self.expected)
+        if self.nearest_line is not None:
+            parts.append(f"Closest lines in the file, from line {self.nearest_line}:")
+            parts.extend(f"  {line}" for line in self.nearest)
+        return "\n".join(parts)
+
+    __repr__ = __str__
+
+
+@dataclass
+class ParsedDiff:
+    hunks: list[Hunk]
+    creates_file: bool = False
+    deletes_file: bool = False
+
+
+def parse_unified_diff(diff: str) -> ParsedDiff:
+    """
+    Parse a unified diff for a single file. Hunk line counts are not
+    trusted, since hand-written diffs often get them wrong: a hunk runs until
+    the next hunk header.
+
+    Args:
+        diff: The diff text.
+
+    Returns:
+        The parsed hunks and whether the diff creates or deletes the file.
+
+    Raises:
+        PatchError: If the diff has no hunks or a line outside any hunk.
+            File headers ("---"/"+++") are only recognized before the first
+            hunk.
+    """
+    parsed = ParsedDiff(hunks=[])
+    hunk: Optional[Hunk] = None
+    raw_lines = diff.splitlines()
+    # A trailing newline after the last hunk is not a blank context line
+    while raw_lines and raw_lines[-1] == "":
+        raw_lines.pop()
+
+    for index, raw in enumerate(raw_lines):
+        next_line = raw_lines[index + 1] if index + 1 < len(raw_lines) else ""
+        # File headers only come before the first hunk; inside a hunk, a
+        # "--- x" / "+++ y" pair is a removed "-- x" and an added "++ y"
+        if not parsed.hunks:
+            if raw.startswith("--- ") and next_line.startswith("+++ "):
+                parsed.creates_file = raw[4:].strip() == "/dev/null"
+                continue
+            if raw.startswith("+++ "):
+                parsed.deletes_file = raw[4:].strip() == "/dev/null"
+                continue
+        if raw.startswith("@@"):
+            match = _HUNK_HEADER.match(raw)
+            header = re.match(r"^@@.*?@@", raw)
+            hunk = Hunk(
+                header=header.group(0) if header else raw,
+                old_start=int(match.group(1)) if match else None,
+            )
+            parsed.hunks.append(hunk)
+            continue
+        if hunk is None:
+            if raw.startswith(_DIFF_METADATA) or not raw.strip():
+                continue
+            raise PatchError(f"line outside of a hunk: {raw!r}")
+        if raw.startswith("\\"):
+            # "\ No newline at end of file" applies to the previous line
+            if hunk.lines:
+                tag, text = hunk.lines[-1]
+                hunk.lines[-1] = (tag, text.rstrip("\n"))
+            continue
+        # Editors often strip the leading space of blank context lines
+        tag, text = (raw[0], raw[1:]) if raw[:1] in (" ", "-", "+") else (" ", raw)
+        hunk.lines.append((tag, text + "\n"))
+
+    if not parsed.hunks:
+        raise PatchError(
+            "no hunks found (hunks start with '@@ -start,count +start,count @@')"
+        )
+    return parsed
+
+
+def _exact(line: str) -> str:
+    return line.rstrip("\r\n")
+
+
+def _loose(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _find(
+    haystack: list[str], needle: list[str], hint: int, start: int
+) -> Optional[int]:
+    """Find `needle` in `haystack[start:]`, trying positions nearest to `hint` first."""
+    size = len(needle)
+    last = len(haystack) - size
+    if last < start:
+        return None
+    hint = min(max(hint, start), last)
+    for distance in range(0, max(hint - start, last - hint) + 1):
+        positions = (hint,) if distance == 0 else (hint - distance, hint + distance)
+        for position in positions:
+            if not start <= position <= last:
+                continue
+            if haystack[position : position + size] == needle:
+                return position
+    return None
+
+
+def _nearest(
+    haystack: list[str], needle: list[str], start: int
+) -> tuple[Optional[int], int]:
+    """Return the window of `haystack` sharing most lines with `needle`, and that count."""
+    best, best_score = None, 0
+    size = max(1, len(needle))
+    for position in range(start, max(start, len(haystack) - size) + 1):
+        window = haystack[position : position + size]
+        score = sum(1 for a, b in zip(window, needle) if a == b)
+        if score > best_score:
+            best, best_score = position, score
+    return best, best_score
+
+
+def _locate(
+    lines: list[str],
+    normalized: dict[Callable, list[str]],
+    hunk: Hunk,
+    hint: int,
+    start: int,
+    fuzz: int,
+) -> Optional[tuple[int, int, int]]:
+    """
+    Find where a hunk applies: first with exact lines, then ignoring
+    whitespace differences, then dropping up to `fuzz` context lines from
+    each end of the hunk.
+
+    Returns:
+        (position, leading context dropped, trailing context dropped), or None.
+    """
+    tags = [tag for tag, _ in hunk.lines if tag != "+"]
+    old = hunk.old_lines
+    lead_context = next((i for i, tag in enumerate(tags) if tag != " "), len(tags))
+    trail_context = next(
+        (i for i, tag in enumerate(reversed(tags)) if tag != " "), len(tags)
+    )
+    for drop in range(0, fuzz + 1):
+        lead, trail = min(drop, lead_context), min(drop, trail_context)
+        if drop and not (lead or trail):
+            break
+        core = old[lead : len(old) - trail]
+        if not core and old:
+            break
+        for normalize in (_exact, _loose):
+            if normalize not in normalized:
+                normalized[normalize] = [normalize(line) for line in lines]
+            needle = [normalize(line) for line in core]
+            position = _find(normalized[normalize], needle, hint + lead, start)
+            if position is not None:
+                return position, lead, trail
+    return None
+
+
+def _failure(lines: list[str], hunk: Hunk, number: int, start: int) -> PatchFailure:
+    """Describe a hunk that did not apply, pointing at the closest lines in the file."""
+    expected = [_exact(line) for line in hunk.old_lines]
+    file_lines = [_exact(line) for line in lines]
+    reason = "context and removed lines not found in the file"
+    applied = [_exact(line) for line in hunk.new_lines]
+    if applied and _find(file_lines, applied, start, start) is not None:
+        reason += "; the new lines are already there, was the diff applied before?"
+    nearest, score = _nearest(file_lines, expected, start)
+    failure = PatchFailure(
+        reason=reason,
+        hunk=number,
+        header=hunk.header,
+        expected=expected,
+    )
+    if nearest is not None and score:
+        failure.nearest_line = nearest + 1
+        window = lines[nearest : nearest + len(expected)]
+        failure.nearest = [_exact(line) for line in window]
+    return failure
+
+
+def _replacement(
+    lines: list[str], hunk: Hunk, position: int, lead: int, old_count: int
+) -> list[str]:
+    """
+    The lines a located hunk puts in place of lines[position:position + old_count]:
+    its added lines, and its context lines as they are in the file, which may
+    differ in whitespace from the diff. Context dropped by fuzz is left out.
+    """
+    new = []
+    old_index = 0
+    for tag, text in hunk.lines:
+        if tag == "+":
+            new.append(text)
+            continue
+        if tag == " " and lead <= old_index < lead + old_count:
+            new.append(lines[position + old_index - lead])
+        old_index += 1
+    return new
+
+
+def apply_patch(
+    text: str, diff: Union[str, ParsedDiff], fuzz: int = PATCH_FUZZ
+) -> Union[str, PatchFailure]:
+    """
+    Apply a unified diff to `text` in one pass, hunk by hunk.
+
+    Args:
+        text: The current file content.
+        diff: The diff text, or an already parsed diff.
+        fuzz: How many context lines at either end of a hunk may be ignored
+            when the hunk does not apply as is (0 disables fuzzy matching).
+
+    Returns:
+        The patched text, or a PatchFailure describing the first hunk that
+        did not apply.
+    """
+    try:
+        parsed = diff if isinstance(diff, ParsedDiff) else parse_unified_diff(diff)
+    except PatchError as e:
+        return PatchFailure(reason=f"malformed diff: {e}")
+
+    lines = text.splitlines(keepends=True)
+    normalized: dict[Callable, list[str]] = {}
+    output: list[str] = []
+    cursor = 0  # Lines before this index are already copied to output
+    offset = 0  # How far earlier hunks were found from their stated position
+    for number, hunk in enumerate(parsed.hunks, start=1):
+        if not hunk.old_lines:
+            # A pure insertion (e.g. into a new file) goes after line old_start
+            target = hunk.old_start + offset if hunk.old_start is not None else cursor
+            position, lead, trail = min(max(target, cursor), len(lines)), 0, 0
+        else:
+            hint = (hunk.old_start - 1 if hunk.old_start else cursor) + offset
+            located = _locate(lines, normalized, hunk, hint, cursor, fuzz)
+            if located is None:
+                return _failure(lines, hunk, number, cursor)
+            position, lead, trail = located
+
+        old_count = len(hunk.old_lines) - lead - trail
+        output.extend(lines[cursor:position])
+        output.extend(_replacement(lines, hunk, position, lead, old_count))
+        cursor = position + old_count
+        if hunk.old_start and hunk.old_lines:
+            offset = position - lead - (hunk.old_start - 1)
+    output.extend(lines[cursor:])
+    return "".join(output)
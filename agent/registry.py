@@ -0,0 +1,94 @@
+import functools
+import importlib
+import inspect
+from dataclasses import dataclass
+from typing import Callable
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """A single tool exposed to sandboxed code."""
+
+    name: str
+    module: str
+    signature: str
+    description: str
+
+    @property
+    def function(self) -> Callable:
+        return getattr(importlib.import_module(self.module), self.name)
+
+    def __str__(self):
+        return f"{self.name}{self.signature}"
+
+
+class ToolRegistry:
+    """
+    The set of tools a module exposes, resolved once per process.
+
+    A module declares its tools explicitly through `__all__`; without it,
+    only public callables defined in the module itself are picked up, so
+    imported helpers such as `Path` or `uuid` are never exported. Tools listed
+    in the module's `READ_ONLY_TOOLS` are known not to modify the memory, and
+    `TOOL_PATH_PARAMETERS` names the parameters of each tool that take paths.
+    """
+
+    def __init__(self, module_name: str):
+        module = importlib.import_module(module_name)
+        names = getattr(module, "__all__", None)
+        if names is None:
+            names = [
+                name
+                for name, attr in vars(module).items()
+                if not name.startswith("_")
+                and callable(attr)
+                and getattr(attr, "__module__", None) == module_name
+            ]
+
+        self.module = module_name
+        self.read_only = frozenset(getattr(module, "READ_ONLY_TOOLS", ()))
+        self.path_parameters: dict[str, frozenset] = {
+            name: frozenset(parameters)
+            for name, parameters in getattr(module, "TOOL_PATH_PARAMETERS", {}).items()
+        }
+        self._functions: dict[str, Callable] = {}
+        self.signatures: dict[str, inspect.Signature] = {}
+        self.tools: dict[str, ToolSpec] = {}
+        for name in names:
+            function = getattr(module, name)
+            doc = inspect.getdoc(function) or ""
+            self._functions[name] = function
+            self.signatures[name] = inspect.signature(function)
+            self.tools[name] = ToolSpec(
+                name=name,
+                module=module_name,
+                signature=str(self.signatures[name]),
+                description=doc.split("\n\n")[0].replace("\n", " "),
+            )
+
+    def functions(self) -> dict[str, Callable]:
+        """Return a new name -> function dict, ready to be merged into exec globals."""
+        return dict(self._functions)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.tools
+
+    def __iter__(self):
+        return iter(self.tools.values())
+
+
+@functools.lru_cache(maxsize=None)
+def get_tool_registry(module_name: str = "agent.tools") -> ToolRegistry:
+    """
+    Return the tool registry for a module, building it on first use.
+
+    Args:
+        module_name: The module that defines the tools.
+
+    Returns:
+        The cached ToolRegistry.
+
+    Raises:
+        ImportError: If the module cannot be imported.
+    """
+    return ToolRegistry(module_name)
@@ -0,0 +1,14 @@
+from .fast_path import get_fast_path_stats
+from .kernel import SessionKernel
+from .pool import SandboxJob, SandboxWorkerPool, get_sandbox_pool
+from .zygote import run_in_zygote, run_in_zygote_async
+
+__all__ = [
+    "SandboxJob",
+    "SandboxWorkerPool",
+    "SessionKernel",
+    "get_fast_path_stats",
+    "get_sandbox_pool",
+    "run_in_zygote",
+    "run_in_zygote_async",
+]
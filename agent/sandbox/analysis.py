@@ -0,0 +1,227 @@
+import ast
+import os
+from typing import Any, NamedTuple, Optional
+
+
+def _target_names(target: ast.AST) -> set[str]:
+    """Collect the variable names bound by an assignment target."""
+    if isinstance(target, ast.Name):
+        return {target.id}
+    if isinstance(target, (ast.Tuple, ast.List)):
+        names = set()
+        for element in target.elts:
+            names |= _target_names(element)
+        return names
+    if isinstance(target, ast.Starred):
+        return _target_names(target.value)
+    return set()
+
+
+def assigned_names(code: str) -> set[str]:
+    """
+    Return the names a snippet binds through assignments, loops, `with ... as`
+    and walrus expressions. Imports, function and class definitions are not
+    counted, so helpers the code sets up are not mistaken for results.
+
+    Args:
+        code: The Python source of the snippet.
+
+    Returns:
+        The assigned variable names (empty if the code does not parse).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return set()
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                names |= _target_names(target)
+        elif isinstance(node, (ast.AugAssign, ast.AnnAssign)):
+            names |= _target_names(node.target)
+        elif isinstance(node, (ast.For, ast.AsyncFor)):
+            names |= _target_names(node.target)
+        elif isinstance(node, ast.withitem) and node.optional_vars is not None:
+            names |= _target_names(node.optional_vars)
+        elif isinstance(node, ast.NamedExpr):
+            names |= _target_names(node.target)
+    return names
+
+
+# Builtins that neither touch the file system nor depend on anything but their arguments
+PURE_BUILTINS = frozenset(
+    {
+        "abs", "all", "any", "bool", "dict", "enumerate", "float", "int", "len",
+        "list", "max", "min", "print", "range", "repr", "reversed", "round",
+        "set", "sorted", "str", "sum", "tuple", "zip",
+    }
+)
+
+# Node types a read-only snippet may consist of. Anything else (imports,
+# function definitions, while loops, lambdas, ...) makes it non-cacheable.
+_READ_ONLY_NODES = (
+    ast.Module, ast.Expr, ast.Assign, ast.AugAssign, ast.AnnAssign, ast.For,
+    ast.If, ast.Pass, ast.Call, ast.keyword, ast.Name, ast.Load, ast.Store,
+    ast.Constant, ast.Attribute, ast.Subscript, ast.Slice, ast.JoinedStr,
+    ast.FormattedValue, ast.List, ast.Tuple, ast.Dict, ast.Set, ast.BinOp,
+    ast.BoolOp, ast.UnaryOp, ast.Compare, ast.IfExp, ast.ListComp,
+    ast.SetComp, ast.DictComp, ast.GeneratorExp, ast.comprehension,
+    ast.Starred, ast.operator, ast.boolop, ast.unaryop, ast.cmpop,
+)
+
+
+def is_local_path(value: object) -> bool:
+    """Whether a literal tool argument stays inside the memory root."""
+    if not isinstance(value, str):
+        return True
+    return not os.path.isabs(value) and ".." not in value.replace("\\", "/").split("/")
+
+
+def is_read_only(code: str, read_only_tools: frozenset) -> bool:
+    """
+    Decide whether a snippet is a deterministic function of the memory
+    contents: it may only call the given read-only tools and PURE_BUILTINS,
+    read variables it assigned itself, call non-underscore methods on them and
+    pass literal paths that stay inside the memory root.
+
+    Args:
+        code: The Python source of the snippet.
+        read_only_tools: Names of the tools that never modify the memory.
+
+    Returns:
+        True if running the snippet twice on an unchanged memory gives the same result.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+
+    bound = assigned_names(code)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.comprehension):
+            bound |= _target_names(node.target)
+    callables = read_only_tools | PURE_BUILTINS
+    if bound & callables:
+        # Rebinding a tool or builtin name could hide what is actually called
+        return False
+
+    for node in ast.walk(tree):
+        if not isinstance(node, _READ_ONLY_NODES):
+            return False
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            if node.id not in bound and node.id not in callables:
+                return False
+        elif isinstance(node, ast.Attribute) and node.attr.startswith("_"):
+            return False
+        elif isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name):
+                if node.func.id not in callables:
+                    return False
+                if node.func.id in read_only_tools:
+                    arguments = node.args + [kw.value for kw in node.keywords]
+                    for argument in arguments:
+                        if isinstance(argument, ast.Constant) and not is_local_path(
+                            argument.value
+                        ):
+                            return False
+            elif isinstance(node.func, ast.Attribute):
+                # Methods may only be called on values the snippet produced
+                receiver = node.func.value
+                if not isinstance(
+                    receiver, (ast.Name, ast.Constant, ast.Call, ast.Subscript)
+                ):
+                    return False
+            else:
+                return False
+    return True
+
+
+class ToolStep(NamedTuple):
+    """One statement of a tool-only block: `targets = tool(*args, **kwargs)`."""
+
+    targets: list[str]
+    tool: Optional[str]  # None for a plain literal assignment, whose value is args[0]
+    args: tuple
+    kwargs: dict[str, Any]
+
+
+def _literal(node: ast.AST) -> tuple[bool, Any]:
+    try:
+        return True, ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return False, None
+
+
+def _tool_call(node: ast.AST, tools: frozenset) -> Optional[ToolStep]:
+    """Parse `tool(<literals>)`, returning None for anything else."""
+    if not (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in tools
+    ):
+        return None
+    args = []
+    for argument in node.args:
+        ok, value = _literal(argument)
+        if not ok:
+            return None
+        args.append(value)
+    kwargs = {}
+    for keyword in node.keywords:
+        if keyword.arg is None:
+            return None
+        ok, value = _literal(keyword.value)
+        if not ok:
+            return None
+        kwargs[keyword.arg] = value
+    return ToolStep([], node.func.id, tuple(args), kwargs)
+
+
+def tool_only_steps(code: str, tools: frozenset) -> Optional[list[ToolStep]]:
+    """
+    Verify that a snippet is straight-line code that only assigns variables
+    and calls the given tools with literal arguments, such as:
+
+        content = read_file("user.md")
+        create_file("notes/a.md", "# A")
+
+    Args:
+        code: The Python source of the snippet.
+        tools: Names of the registered tools.
+
+    Returns:
+        The statements as ToolSteps, in order, or None if the snippet does
+        anything else.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    steps = []
+    for statement in tree.body:
+        if isinstance(statement, ast.Expr):
+            if isinstance(statement.value, ast.Constant):
+                continue  # A bare string or number does nothing
+            step = _tool_call(statement.value, tools)
+            if step is None:
+                return None
+        elif isinstance(statement, ast.Assign):
+            targets = []
+            for target in statement.targets:
+                if not isinstance(target, ast.Name) or target.id in tools:
+                    return None
+                targets.append(target.id)
+            step = _tool_call(statement.value, tools)
+            if step is None:
+                ok, value = _literal(statement.value)
+                if not ok:
+                    return None
+                step = ToolStep([], None, (value,), {})
+            step = step._replace(targets=targets)
+        else:
+            return None
+        steps.append(step)
+    return steps
@@ -0,0 +1,148 @@
+import hashlib
+import importlib.util
+import io
+import logging
+import marshal
+import os
+import threading
+import types
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from agent.settings import (
+    SANDBOX_CODE_CACHE_SIZE,
+    SANDBOX_CODE_CACHE_DIR,
+    SANDBOX_CODE_CACHE_DISK_ENTRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+# Marshalled code objects are only valid for the interpreter version that produced them
+_MAGIC = importlib.util.MAGIC_NUMBER.hex()
+
+# Bound at import: the sandbox replaces builtins.open and os.remove with
+# versions confined to the memory directory before running a snippet, and the
+# cache directory lives outside of it
+_open = io.open
+_remove = os.remove
+_replace = os.replace
+
+
+class CodeCache:
+    """
+    A content-hash keyed cache of compiled sandbox snippets.
+
+    Compiled code objects are kept in memory with LRU eviction and, when
+    `cache_dir` is set, marshalled to disk so short-lived sandbox processes
+    (spawned or forked from the zygote) can reuse them too.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SANDBOX_CODE_CACHE_SIZE,
+        cache_dir: Optional[str] = SANDBOX_CODE_CACHE_DIR,
+        max_disk_entries: int = SANDBOX_CODE_CACHE_DISK_ENTRIES,
+    ):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self._entries: "OrderedDict[str, types.CodeType]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{_MAGIC}.bin")
+
+    def _load_from_disk(self, key: str) -> Optional[types.CodeType]:
+        path = self._disk_path(key)
+        try:
+            with _open(path, "rb") as f:
+                code = marshal.load(f)
+            os.utime(path)  # Mark as recently used for pruning
+            return code
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+    def _save_to_disk(self, key: str, code: types.CodeType) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = os.path.join(self.cache_dir, f".{uuid.uuid4().hex}.tmp")
+            with _open(tmp_path, "wb") as f:
+                marshal.dump(code, f)
+            _replace(tmp_path, self._disk_path(key))
+        except OSError as e:
+            logger.warning("Could not write code cache entry %s: %s", key, e)
+            return
+        self._disk_writes += 1
+        if self._disk_writes % 64 == 0:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """Delete the least recently used disk entries beyond max_disk_entries."""
+        try:
+            entries = [
+                entry
+                for entry in os.scandir(self.cache_dir)
+                if entry.name.endswith(".bin")
+            ]
+            if len(entries) <= self.max_disk_entries:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[: len(entries) - self.max_disk_entries]:
+                _remove(entry.path)
+        except OSError as e:
+            logger.warning("Could not prune code cache: %s", e)
+
+    def compile(self, source: str) -> types.CodeType:
+        """
+        Return the compiled code object for `source`, compiling it on a miss.
+        Compiled exactly like exec(source) would, so tracebacks are unchanged.
+
+        Raises:
+            SyntaxError: If the source does not compile.
+        """
+        key = hashlib.sha256(source.encode("utf-8", "surrogatepass")).hexdigest()
+        with self._lock:
+            code = self._entries.get(key)
+            if code is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return code
+
+        code = self._load_from_disk(key) if self.cache_dir else None
+        if code is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            code = compile(source, "<string>", "exec")
+            if self.cache_dir:
+                self._save_to_disk(key, code)
+
+        with self._lock:
+            self._entries[key] = code
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return code
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+
+_CODE_CACHE: Optional[CodeCache] = None
+
+
+def get_code_cache() -> CodeCache:
+    """Return the code cache of this process."""
+    global _CODE_CACHE
+    if _CODE_CACHE is None:
+        _CODE_CACHE = CodeCache()
+    return _CODE_CACHE
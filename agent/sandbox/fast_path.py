@@ -0,0 +1,204 @@
+import asyncio
+import inspect
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from agent.memory_meta import MEMORY_ROOT
+from agent.registry import get_tool_registry
+from agent.sandbox.analysis import ToolStep, is_local_path, tool_only_steps
+from agent.sandbox.serializer import encode_locals
+from agent.settings import (
+    SANDBOX_FAST_PATH,
+    SANDBOX_FAST_PATH_WORKERS,
+    SANDBOX_MAX_VALUE_BYTES,
+    SANDBOX_MAX_LOCALS_BYTES,
+)
+
+logger = logging.getLogger(__name__)
+
+# Blocks that only assign variables and call tools with literal arguments are
+# interpreted step by step in this process instead of being shipped to a
+# sandbox. The verifier (analysis.tool_only_steps) guarantees no user code
+# runs, and every path argument is checked to stay inside the memory root.
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+_STATS_LOCK = threading.Lock()
+_STATS = {"fast_path": 0, "sandbox": 0}
+
+
+def _is_local(value) -> bool:
+    """Whether a path argument, or each path of a collection, stays in the memory."""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        # Links are checked with and without their brackets
+        link = value.removeprefix("[[").removesuffix("]]")
+        return is_local_path(value) and is_local_path(link)
+    if isinstance(value, (dict, list, tuple)):
+        # {path: content} dicts, such as create_files(files), or lists of paths
+        return all(isinstance(path, str) and _is_local(path) for path in value)
+    return False
+
+
+def _paths_are_local(
+    signature: inspect.Signature, path_parameters: frozenset, step: ToolStep
+) -> bool:
+    """Check that the step binds to the tool's signature and its paths stay in the memory."""
+    try:
+        bound = signature.bind(*step.args, **step.kwargs)
+    except TypeError:
+        return False  # Let the sandbox report the bad call
+    return all(
+        _is_local(value)
+        for name, value in bound.arguments.items()
+        if name in path_parameters
+    )
+
+
+def plan_fast_path(
+    code: str,
+    allow_installs: bool = False,
+    requirements_path: str = None,
+    allowed_path: str = None,
+    blacklist: list = None,
+    available_functions: dict = None,
+    import_module: str = None,
+    fast_path: bool = None,
+) -> Optional[list[ToolStep]]:
+    """
+    Return the steps of a block that may run in-process, or None if it must
+    go to the sandbox. Takes the arguments of execute_sandboxed_code: only
+    plain tool calls on a memory path qualify, while installs, blacklists and
+    extra functions always go through the sandbox, and so do calls to tools
+    that do not declare their path parameters (TOOL_PATH_PARAMETERS).
+
+    Returns:
+        The verified steps, or None.
+    """
+    if fast_path is None:
+        fast_path = SANDBOX_FAST_PATH
+    if not fast_path or allow_installs or requirements_path:
+        return None
+    if blacklist or available_functions or not allowed_path or not import_module:
+        return None
+    try:
+        registry = get_tool_registry(import_module)
+    except ImportError:
+        return None
+    steps = tool_only_steps(code, frozenset(registry.tools))
+    if steps is None:
+        return None
+    for step in steps:
+        if step.tool is None:
+            continue
+        # Tools that do not declare their path parameters are never trusted
+        path_parameters = registry.path_parameters.get(step.tool)
+        if path_parameters is None:
+            return None
+        if not _paths_are_local(registry.signatures[step.tool], path_parameters, step):
+            return None
+    return steps
+
+
+def _run_steps(
+    steps: list[ToolStep],
+    allowed_path: str,
+    tool_module: str,
+    timeout: Optional[int] = None,
+) -> tuple[dict, str, str, str]:
+    functions = get_tool_registry(tool_module).functions()
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    token = MEMORY_ROOT.set(allowed_path)
+    values = {}
+    error_msg = None
+    try:
+        for step in steps:
+            if deadline is not None and time.monotonic() > deadline:
+                return _timed_out(timeout)
+            if step.tool is None:
+                value = step.args[0]
+            else:
+                value = functions[step.tool](*step.args, **step.kwargs)
+            for target in step.targets:
+                values[target] = value
+        if deadline is not None and time.monotonic() > deadline:
+            return _timed_out(timeout)
+    except Exception:
+        error_msg = f"Exception in sandboxed code:\n{traceback.format_exc()}"
+    finally:
+        MEMORY_ROOT.reset(token)
+    encoded = encode_locals(
+        values,
+        max_value_bytes=SANDBOX_MAX_VALUE_BYTES,
+        max_total_bytes=SANDBOX_MAX_LOCALS_BYTES,
+    )
+    return encoded, error_msg, "", ""
+
+
+def _timed_out(timeout: int) -> tuple[dict, str, str, str]:
+    logger.error("Fast-path tool calls exceeded time limit of %d seconds.", timeout)
+    return None, f"TimeoutError: Code execution exceeded {timeout} seconds.", "", ""
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=SANDBOX_FAST_PATH_WORKERS, thread_name_prefix="fast-path"
+            )
+        return _EXECUTOR
+
+
+def run_fast_path(
+    steps: list[ToolStep], allowed_path: str, tool_module: str, timeout: int
+) -> tuple[dict, str, str, str]:
+    """
+    Run verified steps on the calling thread, without a thread handoff: it
+    cost more than the tool calls themselves.
+
+    The timeout is checked before every step and after the last one. A
+    block that runs past it returns the sandbox backends' TimeoutError and
+    none of its values. A tool call that has started is not interrupted,
+    but tools only touch files inside the memory, whose size is capped.
+
+    Returns:
+        (dict, str, str, str): The encoded locals, error message, stdout and
+        stderr, in the same shape as a sandbox backend's result.
+    """
+    record_run(fast_path=True)
+    return _run_steps(steps, allowed_path, tool_module, timeout)
+
+
+async def run_fast_path_async(
+    steps: list[ToolStep], allowed_path: str, tool_module: str, timeout: int
+) -> tuple[dict, str, str, str]:
+    """
+    Asyncio version of run_fast_path. The steps run on the fast-path thread
+    pool, so file I/O never blocks the event loop, and the caller stops
+    waiting at the timeout even while a tool call is still running.
+    """
+    record_run(fast_path=True)
+    future = asyncio.get_running_loop().run_in_executor(
+        _get_executor(), _run_steps, steps, allowed_path, tool_module, timeout
+    )
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        return _timed_out(timeout)
+
+
+def record_run(fast_path: bool) -> None:
+    """Count a python block as taking the fast path or going to the sandbox."""
+    with _STATS_LOCK:
+        _STATS["fast_path" if fast_path else "sandbox"] += 1
+
+
+def get_fast_path_stats() -> dict:
+    """Return how many blocks took the in-process fast path and how many the sandbox."""
+    with _STATS_LOCK:
+        return dict(_STATS)
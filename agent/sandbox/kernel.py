@@ -0,0 +1,173 @@
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from agent.sandbox.pool import SandboxWorker
+from agent.sandbox.protocol import FrameTooLarge
+from agent.settings import (
+    SANDBOX_TIMEOUT,
+    SESSION_KERNEL_IDLE_TIMEOUT,
+    SESSION_KERNEL_MAX_LIVE,
+)
+
+logger = logging.getLogger(__name__)
+
+# Kernels with a running process, least recently used first
+_LIVE: "OrderedDict[int, SessionKernel]" = OrderedDict()
+_LIVE_LOCK = threading.Lock()
+
+
+class SessionKernel:
+    """
+    A long-lived sandbox process that keeps one namespace for a whole
+    conversation, so variables defined in one python block are still there in
+    the next. Each block runs under the same restrictions as any other
+    sandbox job and only the variables it assigned are returned.
+
+    The process exits on its own after `idle_timeout` seconds without a
+    block, and at most SESSION_KERNEL_MAX_LIVE kernels run at once: starting
+    one more stops the least recently used idle kernel. A stopped kernel is
+    restarted on the next block with an empty namespace.
+    """
+
+    def __init__(self, idle_timeout: float = SESSION_KERNEL_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._worker: Optional[SandboxWorker] = None
+        self._lock = threading.Lock()
+        self.busy = False
+        self.restarts = 0
+
+    @property
+    def alive(self) -> bool:
+        return self._worker is not None and self._worker.alive
+
+    def _start(self) -> None:
+        with _LIVE_LOCK:
+            for key, kernel in list(_LIVE.items()):
+                if not kernel.alive:
+                    del _LIVE[key]
+            while len(_LIVE) >= SESSION_KERNEL_MAX_LIVE:
+                victim = next((k for k in _LIVE.values() if not k.busy), None)
+                if victim is None:
+                    raise RuntimeError(
+                        f"All {SESSION_KERNEL_MAX_LIVE} session kernels are busy"
+                    )
+                del _LIVE[id(victim)]
+                victim._stop()
+            if self._worker is not None:
+                self.restarts += 1
+                logger.info("Restarting session kernel; its namespace was lost")
+            self._worker = SandboxWorker(("--kernel", str(self.idle_timeout)))
+            _LIVE[id(self)] = self
+
+    def _stop(self) -> None:
+        if self._worker is not None:
+            self._worker.kill()
+
+    def run(self, params: dict, timeout: int) -> tuple[dict, str, str, str]:
+        """
+        Run one job in the kernel's namespace, starting the kernel if needed.
+
+        Args:
+            params: The job parameters, as built by agent.engine.build_sandbox_params.
+            timeout: Maximum execution time in seconds. A job that times out
+                takes the kernel (and its namespace) down with it.
+
+        Returns:
+            (dict, str, str, str): The locals, error message, stdout and stderr of the job.
+        """
+        with self._lock:
+            self.busy = True
+            try:
+                if not self.alive:
+                    self._start()
+                with _LIVE_LOCK:
+                    if id(self) in _LIVE:
+                        _LIVE.move_to_end(id(self))
+                return self._worker.run(params, timeout)
+            except TimeoutError:
+                logger.error(
+                    "Sandboxed code exceeded time limit of %d seconds; terminating.",
+                    timeout,
+                )
+                self._stop()
+                return None, f"TimeoutError: Code execution exceeded {timeout} seconds.", "", ""
+            except (ConnectionError, FrameTooLarge, RuntimeError) as e:
+                self._stop()
+                return None, str(e), "", ""
+            finally:
+                self.busy = False
+
+    def execute(
+        self,
+        code: str,
+        allowed_path: str = None,
+        import_module: str = None,
+        timeout: int = SANDBOX_TIMEOUT,
+    ) -> tuple[dict, str]:
+        """
+        Run a python block in the kernel.
+
+        Args:
+            code: The Python code to execute.
+            allowed_path: Directory path that the code is allowed to access for file I/O.
+            import_module: Name of a module whose tools are made available.
+            timeout: Maximum execution time in seconds.
+
+        Returns:
+            (dict, str): The variables the block assigned and an error message.
+        """
+        from agent.engine import build_sandbox_params, unpack_sandbox_result
+
+        params, error_msg = build_sandbox_params(
+            code,
+            allowed_path=allowed_path,
+            import_module=import_module,
+            assigned_only=True,
+        )
+        if params is None:
+            return unpack_sandbox_result((None, error_msg, "", ""))
+        return unpack_sandbox_result(self.run(params, timeout))
+
+    async def execute_async(
+        self,
+        code: str,
+        allowed_path: str = None,
+        import_module: str = None,
+        timeout: int = SANDBOX_TIMEOUT,
+    ) -> tuple[dict, str]:
+        """
+        Asyncio version of execute, run on a helper thread. Cancelling the
+        awaiting task stops the kernel.
+        """
+        future = asyncio.get_running_loop().run_in_executor(
+            None, self.execute, code, allowed_path, import_module, timeout
+        )
+        try:
+            return await future
+        except asyncio.CancelledError:
+            self._stop()
+            raise
+
+    def shutdown(self) -> None:
+        """Stop the kernel process and forget its namespace."""
+        with _LIVE_LOCK:
+            _LIVE.pop(id(self), None)
+        self._stop()
+        self._worker = None
+
+
+def shutdown_all_kernels() -> None:
+    """Stop every live session kernel of this process."""
+    with _LIVE_LOCK:
+        kernels = list(_LIVE.values())
+        _LIVE.clear()
+    for kernel in kernels:
+        kernel._stop()
+
+
+atexit.register(shutdown_all_kernels)
@@ -0,0 +1,279 @@
+import atexit
+import logging
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
+from typing import Optional
+
+from agent.sandbox.protocol import FrameTooLarge, read_frame, write_frame
+from agent.settings import (
+    SANDBOX_POOL_SIZE,
+    SANDBOX_WORKER_MAX_JOBS,
+    SANDBOX_MAX_RESULT_BYTES,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SandboxWorker:
+    """A long-lived `python -m agent.engine --worker` process."""
+
+    def __init__(self, args: tuple = ("--worker",)):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "agent.engine", *args],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self.jobs = 0
+        # The memory root of the jobs this worker runs, fixed by its first job
+        self.allowed_path: Optional[str] = None
+        # Code cache counters reported with the last result, see code_cache_delta
+        self.code_cache_stats: dict = {}
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, params: dict, timeout: int) -> tuple[dict, str, str, str]:
+        """
+        Run one job on this worker.
+
+        Raises:
+            TimeoutError: If the job did not finish within `timeout` seconds.
+            ConnectionError: If the worker died before returning a result.
+            FrameTooLarge: If the result exceeds SANDBOX_MAX_RESULT_BYTES.
+        """
+        self.jobs += 1
+        try:
+            write_frame(self.process.stdin.fileno(), pickle.dumps(params))
+        except (BrokenPipeError, OSError) as e:
+            raise ConnectionError(f"Sandbox worker is not accepting jobs: {e}")
+        payload = read_frame(
+            self.process.stdout.fileno(),
+            time.monotonic() + timeout,
+            SANDBOX_MAX_RESULT_BYTES,
+        )
+        if payload is None:
+            raise ConnectionError(
+                f"Sandbox worker exited unexpectedly (code {self.process.wait()})"
+            )
+        return pickle.loads(payload)
+
+    def code_cache_delta(self, stats: dict) -> dict:
+        """Record the worker's latest code cache counters and return the change since the last job."""
+        delta = {
+            key: stats.get(key, 0) - self.code_cache_stats.get(key, 0)
+            for key in ("hits", "disk_hits", "misses")
+        }
+        self.code_cache_stats = stats
+        return delta
+
+    def kill(self) -> None:
+        """Terminate the worker process and release its pipes."""
+        if self.alive:
+            self.process.kill()
+        self.process.wait()
+        self.process.stdin.close()
+        self.process.stdout.close()
+
+
+class SandboxJob:
+    """A handle that lets another thread cancel a pooled job, killing its worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._worker: Optional[SandboxWorker] = None
+        self.cancelled = False
+
+    def attach(self, worker: SandboxWorker) -> bool:
+        """Bind the job to the worker running it; False if it was already cancelled."""
+        with self._lock:
+            if self.cancelled:
+                return False
+            self._worker = worker
+            return True
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            if self._worker is not None and self._worker.alive:
+                self._worker.process.kill()
+
+
+class SandboxWorkerPool:
+    """
+    A fixed-size pool of pre-warmed sandbox workers.
+
+    Each job runs in a fresh exec namespace on an idle worker. Workers are
+    replaced after `max_jobs` jobs, after a timeout and after a crash, so a
+    misbehaving snippet can only ever affect the worker that ran it. A worker
+    only runs jobs for the `allowed_path` of its first job, so state one
+    agent's code leaves behind never reaches another agent's memory.
+    """
+
+    def __init__(
+        self, size: int = SANDBOX_POOL_SIZE, max_jobs: int = SANDBOX_WORKER_MAX_JOBS
+    ):
+        self.size = max(1, size)
+        self.max_jobs = max_jobs
+        self._pid = os.getpid()
+        self._idle: list[SandboxWorker] = []
+        self._live = 0
+        self._closed = False
+        self._code_cache = {"hits": 0, "disk_hits": 0, "misses": 0}
+        self._cond = threading.Condition()
+        with self._cond:
+            for _ in range(self.size):
+                self._idle.append(SandboxWorker())
+                self._live += 1
+
+    def _acquire(self, allowed_path: Optional[str]) -> SandboxWorker:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Sandbox worker pool is shut down")
+                worker = self._take_idle(allowed_path)
+                if worker is not None:
+                    return worker
+                if self._live < self.size:
+                    self._live += 1
+                    break
+                if self._idle:
+                    # Every idle worker belongs to another memory, replace one
+                    self._idle.pop(0).kill()
+                    self._live -= 1
+                    continue
+                self._cond.wait()
+        try:
+            worker = SandboxWorker()
+        except Exception:
+            with self._cond:
+                self._live -= 1
+                self._cond.notify()
+            raise
+        worker.allowed_path = allowed_path
+        return worker
+
+    def _take_idle(self, allowed_path: Optional[str]) -> Optional[SandboxWorker]:
+        """Pop an idle worker bound to `allowed_path`, or else an unused one. Caller holds the lock."""
+        for bound in (True, False):
+            for i in range(len(self._idle) - 1, -1, -1):
+                worker = self._idle[i]
+                if not worker.alive:
+                    del self._idle[i]
+                    worker.kill()
+                    self._live -= 1
+                    continue
+                if bound:
+                    match = worker.jobs and worker.allowed_path == allowed_path
+                else:
+                    match = not worker.jobs
+                if match:
+                    del self._idle[i]
+                    worker.allowed_path = allowed_path
+                    return worker
+        return None
+
+    def _release(self, worker: SandboxWorker, healthy: bool) -> None:
+        if not healthy or worker.jobs >= self.max_jobs or not worker.alive:
+            worker.kill()
+            with self._cond:
+                self._live -= 1
+                # Start the replacement now so it warms up while the pool is idle
+                if not self._closed:
+                    try:
+                        self._idle.append(SandboxWorker())
+                        self._live += 1
+                    except Exception as e:
+                        logger.error("Could not start sandbox worker: %s", e)
+                self._cond.notify()
+            return
+        with self._cond:
+            if self._closed:
+                worker.kill()
+                self._live -= 1
+            else:
+                self._idle.append(worker)
+            self._cond.notify()
+
+    def run(
+        self, params: dict, timeout: int, job: Optional[SandboxJob] = None
+    ) -> tuple[dict, str, str, str]:
+        """
+        Run one sandbox job on a pooled worker.
+
+        Args:
+            params: The job parameters, as built by agent.engine.build_sandbox_params.
+            timeout: Maximum execution time in seconds.
+            job: Optional handle through which another thread can cancel the job.
+
+        Returns:
+            (dict, str, str, str): The locals, error message, stdout and stderr of the job.
+        """
+        allowed_path = params.get("allowed_path")
+        if allowed_path:
+            allowed_path = os.path.abspath(allowed_path)
+        worker = self._acquire(allowed_path)
+        healthy = False
+        try:
+            if job is not None and not job.attach(worker):
+                healthy = True
+                return None, "Sandbox job was cancelled", "", ""
+            result = worker.run(params, timeout)
+            healthy = True
+            if len(result) > 4:
+                delta = worker.code_cache_delta(result[4].get("code_cache", {}))
+                with self._cond:
+                    for key, count in delta.items():
+                        self._code_cache[key] += count
+            return result
+        except TimeoutError:
+            logger.error(
+                "Sandboxed code exceeded time limit of %d seconds; terminating.",
+                timeout,
+            )
+            return None, f"TimeoutError: Code execution exceeded {timeout} seconds.", "", ""
+        except (ConnectionError, FrameTooLarge) as e:
+            if job is not None and job.cancelled:
+                return None, "Sandbox job was cancelled", "", ""
+            return None, str(e), "", ""
+        finally:
+            self._release(worker, healthy)
+
+    def code_cache_stats(self) -> dict:
+        """Return the compiled-snippet cache hits and misses summed over all jobs run by the pool."""
+        with self._cond:
+            return dict(self._code_cache)
+
+    def shutdown(self) -> None:
+        """Kill all idle workers; busy workers are killed when their job returns."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._live -= len(idle)
+            self._cond.notify_all()
+        for worker in idle:
+            worker.kill()
+
+
+_POOL: Optional[SandboxWorkerPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxWorkerPool:
+    """
+    Return the process-wide sandbox worker pool, starting it on first use.
+
+    A pool inherited through fork() is never reused, since its pipes are
+    shared with the parent process.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None or _POOL._pid != os.getpid():
+            _POOL = SandboxWorkerPool()
+            atexit.register(_POOL.shutdown)
+        return _POOL
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import select
+import struct
+import time
+from typing import Optional
+
+# Every message between the parent and a sandbox process is an 8-byte big-endian
+# length followed by that many bytes of pickled payload. Frames travel over
+# dedicated pipes or sockets, never over the sandbox's stdout.
+_HEADER = struct.Struct(">Q")
+
+
+class FrameTooLarge(ValueError):
+    """Raised when a frame header announces more bytes than the reader accepts."""
+
+
+def write_frame(fd: int, payload: bytes) -> None:
+    """Write one length-prefixed frame to a file descriptor."""
+    os.write(fd, _HEADER.pack(len(payload)))
+    data = memoryview(payload)
+    while data:
+        written = os.write(fd, data)
+        data = data[written:]
+
+
+def _read_exact(fd: int, size: int, deadline: Optional[float]) -> Optional[bytes]:
+    """Read exactly `size` bytes, returning None on EOF and raising TimeoutError past `deadline`."""
+    chunks = []
+    remaining = size
+    while remaining:
+        if deadline is not None:
+            wait = deadline - time.monotonic()
+            if wait <= 0 or not select.select([fd], [], [], wait)[0]:
+                raise TimeoutError
+        chunk = os.read(fd, min(remaining, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def read_frame(
+    fd: int, deadline: Optional[float] = None, max_size: Optional[int] = None
+) -> Optional[bytes]:
+    """
+    Read one length-prefixed frame from a file descriptor.
+
+    Args:
+        fd: The file descriptor to read from.
+        deadline: Optional time.monotonic() value after which TimeoutError is raised.
+        max_size: Optional upper bound on the payload size.
+
+    Returns:
+        The frame payload, or None if the other side closed the pipe.
+
+    Raises:
+        TimeoutError: If the frame did not arrive before `deadline`.
+        FrameTooLarge: If the payload is larger than `max_size`.
+    """
+    header = _read_exact(fd, _HEADER.size, deadline)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if max_size is not None and size > max_size:
+        raise FrameTooLarge(f"Sandbox result of {size} bytes exceeds {max_size} bytes")
+    return _read_exact(fd, size, deadline) if size else b""
+
+
+async def write_frame_async(writer: asyncio.StreamWriter, payload: bytes) -> None:
+    """Write one length-prefixed frame to an asyncio stream."""
+    writer.write(_HEADER.pack(len(payload)))
+    writer.write(payload)
+    await writer.drain()
+
+
+async def read_frame_async(
+    reader: asyncio.StreamReader, max_size: Optional[int] = None
+) -> Optional[bytes]:
+    """
+    Read one length-prefixed frame from an asyncio stream.
+
+    Returns:
+        The frame payload, or None if the other side closed the stream.
+
+    Raises:
+        FrameTooLarge: If the payload is larger than `max_size`.
+    """
+    try:
+        (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+        if max_size is not None and size > max_size:
+            raise FrameTooLarge(
+                f"Sandbox result of {size} bytes exceeds {max_size} bytes"
+            )
+        return await reader.readexactly(size)
+    except asyncio.IncompleteReadError:
+        return None
@@ -0,0 +1,81 @@
+import pickle
+
+from agent.settings import SANDBOX_MAX_VALUE_BYTES, SANDBOX_MAX_LOCALS_BYTES
+
+TRUNCATION_MARKER = "... [truncated {dropped} bytes]"
+OMITTED_MARKER = "[omitted: sandbox result budget of {budget} bytes exhausted]"
+
+
+def _truncate_text(text: str, limit: int) -> str:
+    """Cut `text` to at most `limit` UTF-8 bytes and say how much was dropped."""
+    data = text.encode("utf-8", errors="replace")
+    if len(data) <= limit:
+        return text
+    return data[:limit].decode("utf-8", errors="ignore") + TRUNCATION_MARKER.format(
+        dropped=len(data) - limit
+    )
+
+
+def encode_value(value, limit: int = SANDBOX_MAX_VALUE_BYTES) -> bytes:
+    """
+    Pickle a single value, keeping it within roughly `limit` bytes.
+
+    Strings that are too large are cut and marked. Values that cannot be
+    pickled, or whose pickle is too large, are replaced by their (possibly
+    truncated) repr.
+
+    Args:
+        value: The value to encode.
+        limit: The byte budget for this value.
+
+    Returns:
+        The pickled value.
+    """
+    if isinstance(value, str):
+        return pickle.dumps(_truncate_text(value, limit))
+    try:
+        data = pickle.dumps(value)
+    except Exception:
+        return pickle.dumps(_truncate_text(repr(value), limit))
+    if len(data) <= limit:
+        return data
+    return pickle.dumps(_truncate_text(repr(value), limit))
+
+
+def encode_locals(
+    values: dict,
+    names: set = None,
+    max_value_bytes: int = SANDBOX_MAX_VALUE_BYTES,
+    max_total_bytes: int = SANDBOX_MAX_LOCALS_BYTES,
+) -> dict[str, bytes]:
+    """
+    Encode sandbox locals in a single pass, with a per-value and a total byte budget.
+
+    Args:
+        values: The locals left behind by the executed code.
+        names: If given, only these variable names are returned.
+        max_value_bytes: The budget for any single value.
+        max_total_bytes: The budget for all values together. Values that no
+                         longer fit are replaced by an explicit marker.
+
+    Returns:
+        A dict mapping each variable name to its pickled value.
+    """
+    encoded = {}
+    total = 0
+    for name, value in values.items():
+        if names is not None and name not in names:
+            continue
+        budget = min(max_value_bytes, max_total_bytes - total)
+        if budget <= 0:
+            data = pickle.dumps(OMITTED_MARKER.format(budget=max_total_bytes))
+        else:
+            data = encode_value(value, budget)
+        encoded[name] = data
+        total += len(data)
+    return encoded
+
+
+def decode_locals(encoded: dict[str, bytes]) -> dict:
+    """Inverse of encode_locals."""
+    return {name: pickle.loads(data) for name, data in encoded.items()}
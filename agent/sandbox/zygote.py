@@ -0,0 +1,266 @@
+import asyncio
+import atexit
+import importlib
+import logging
+import os
+import pickle
+import random
+import select
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from agent.sandbox.protocol import (
+    FrameTooLarge,
+    read_frame,
+    read_frame_async,
+    write_frame,
+    write_frame_async,
+)
+from agent.settings import SANDBOX_MAX_RESULT_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Modules imported once by the zygote; every forked child shares them copy-on-write
+ZYGOTE_PRELOAD = ["agent.engine", "agent.tools", "agent.utils"]
+
+# How long the first job waits for a freshly started zygote to finish its imports
+ZYGOTE_STARTUP_TIMEOUT = 60
+
+
+def _reap_children() -> None:
+    """Collect exit statuses of finished children without blocking."""
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+
+
+def _serve_job(conn: socket.socket) -> None:
+    """Handle one connection inside a freshly forked child."""
+    from agent.engine import _run_job
+
+    fd = conn.fileno()
+    # The client needs our pid to kill us if the job times out
+    write_frame(fd, str(os.getpid()).encode())
+    payload = read_frame(fd)
+    if payload is None:
+        return
+    write_frame(fd, _run_job(pickle.loads(payload)))
+
+
+def serve_zygote(socket_path: str, control_fd: int) -> None:
+    """
+    Run the fork-server loop: pre-import the sandbox modules once, then fork a
+    child for every connection on `socket_path`. The loop exits when the parent
+    closes `control_fd`.
+    """
+    for module_name in ZYGOTE_PRELOAD:
+        importlib.import_module(module_name)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(128)
+    try:
+        while True:
+            ready, _, _ = select.select([listener, control_fd], [], [], 1.0)
+            _reap_children()
+            if control_fd in ready and not os.read(control_fd, 1):
+                break
+            if listener not in ready:
+                continue
+            conn, _ = listener.accept()
+            pid = os.fork()
+            if pid == 0:
+                exit_code = 0
+                try:
+                    listener.close()
+                    os.close(control_fd)
+                    random.seed()
+                    _serve_job(conn)
+                except BaseException:
+                    exit_code = 1
+                finally:
+                    os._exit(exit_code)
+            conn.close()
+    finally:
+        listener.close()
+
+
+class Zygote:
+    """Client handle for a `python -m agent.engine --zygote` fork-server process."""
+
+    def __init__(self):
+        self._dir = tempfile.mkdtemp(prefix="sandbox-zygote-")
+        self.socket_path = os.path.join(self._dir, "zygote.sock")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "agent.engine", "--zygote", self.socket_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self._pid = os.getpid()
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _connect(self) -> socket.socket:
+        deadline = time.monotonic() + ZYGOTE_STARTUP_TIMEOUT
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+                return sock
+            except (FileNotFoundError, ConnectionRefusedError):
+                sock.close()
+                if not self.alive or time.monotonic() > deadline:
+                    raise ConnectionError("Sandbox zygote is not accepting jobs")
+                time.sleep(0.01)
+
+    def run(self, params: dict, timeout: int) -> tuple[dict, str, str, str]:
+        """
+        Run one sandbox job in a child forked from the zygote.
+
+        Args:
+            params: The job parameters, as built by agent.engine.build_sandbox_params.
+            timeout: Maximum execution time in seconds.
+
+        Returns:
+            (dict, str, str, str): The locals, error message, stdout and stderr of the job.
+        """
+        try:
+            sock = self._connect()
+        except ConnectionError as e:
+            return None, str(e), "", ""
+        child_pid = None
+        try:
+            deadline = time.monotonic() + timeout
+            fd = sock.fileno()
+            pid_frame = read_frame(fd, deadline)
+            if pid_frame is None:
+                return None, "Sandbox zygote closed the connection", "", ""
+            child_pid = int(pid_frame)
+            write_frame(fd, pickle.dumps(params))
+            payload = read_frame(fd, deadline, SANDBOX_MAX_RESULT_BYTES)
+            if payload is None:
+                return None, "Sandbox process exited unexpectedly", "", ""
+            child_pid = None
+            return pickle.loads(payload)
+        except TimeoutError:
+            logger.error(
+                "Sandboxed code exceeded time limit of %d seconds; terminating.",
+                timeout,
+            )
+            return None, f"TimeoutError: Code execution exceeded {timeout} seconds.", "", ""
+        except FrameTooLarge as e:
+            return None, str(e), "", ""
+        except OSError as e:
+            return None, f"Sandbox zygote error: {e}", "", ""
+        finally:
+            sock.close()
+            if child_pid is not None:
+                try:
+                    os.kill(child_pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    async def _connect_async(
+        self,
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        deadline = time.monotonic() + ZYGOTE_STARTUP_TIMEOUT
+        while True:
+            try:
+                return await asyncio.open_unix_connection(self.socket_path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if not self.alive or time.monotonic() > deadline:
+                    raise ConnectionError("Sandbox zygote is not accepting jobs")
+                await asyncio.sleep(0.01)
+
+    async def run_async(self, params: dict, timeout: int) -> tuple[dict, str, str, str]:
+        """
+        Asyncio version of Zygote.run. If the awaiting task is cancelled, the
+        forked child is killed before the cancellation propagates.
+        """
+        try:
+            reader, writer = await self._connect_async()
+        except ConnectionError as e:
+            return None, str(e), "", ""
+        child_pid = None
+
+        async def exchange():
+            nonlocal child_pid
+            pid_frame = await read_frame_async(reader)
+            if pid_frame is None:
+                return None, "Sandbox zygote closed the connection", "", ""
+            child_pid = int(pid_frame)
+            await write_frame_async(writer, pickle.dumps(params))
+            payload = await read_frame_async(reader, SANDBOX_MAX_RESULT_BYTES)
+            if payload is None:
+                return None, "Sandbox process exited unexpectedly", "", ""
+            child_pid = None
+            return pickle.loads(payload)
+
+        try:
+            return await asyncio.wait_for(exchange(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(
+                "Sandboxed code exceeded time limit of %d seconds; terminating.",
+                timeout,
+            )
+            return None, f"TimeoutError: Code execution exceeded {timeout} seconds.", "", ""
+        except FrameTooLarge as e:
+            return None, str(e), "", ""
+        except OSError as e:
+            return None, f"Sandbox zygote error: {e}", "", ""
+        finally:
+            writer.close()
+            if child_pid is not None:
+                try:
+                    os.kill(child_pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def shutdown(self) -> None:
+        """Stop the zygote; children that are still running finish on their own."""
+        if self.alive:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+_ZYGOTE: Optional[Zygote] = None
+_ZYGOTE_LOCK = threading.Lock()
+
+
+def get_zygote() -> Zygote:
+    """Return the process-wide zygote, (re)starting it when needed."""
+    global _ZYGOTE
+    with _ZYGOTE_LOCK:
+        if _ZYGOTE is None or _ZYGOTE._pid != os.getpid() or not _ZYGOTE.alive:
+            _ZYGOTE = Zygote()
+            atexit.register(_ZYGOTE.shutdown)
+        return _ZYGOTE
+
+
+def run_in_zygote(params: dict, timeout: int) -> tuple[dict, str, str, str]:
+    """Run one sandbox job on the process-wide zygote (see Zygote.run)."""
+    return get_zygote().run(params, timeout)
+
+
+async def run_in_zygote_async(params: dict, timeout: int) -> tuple[dict, str, str, str]:
+    """Run one sandbox job on the process-wide zygote (see Zygote.run_async)."""
+    return await get_zygote().run_async(params, timeout)
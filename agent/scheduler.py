@@ -0,0 +1,421 @@
+import asyncio
+import datetime
+import email.utils
+import logging
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, Optional, TypeVar, Union
+
+from agent.settings import (
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_PROVIDER_LIMITS,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_TOKENS_PER_MINUTE,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Errors raised when the request never got an HTTP response (openai, anthropic)
+_CONNECTION_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+# Number of recent latencies kept for the percentiles in stats()
+_LATENCY_WINDOW = 1000
+
+
+@dataclass
+class SchedulerLimits:
+    """Limits of one provider. None or 0 leaves a rate unlimited."""
+
+    requests_per_minute: Optional[float] = LLM_REQUESTS_PER_MINUTE
+    tokens_per_minute: Optional[float] = LLM_TOKENS_PER_MINUTE
+    max_concurrency: int = LLM_MAX_CONCURRENCY
+    min_concurrency: int = 1
+    max_retries: int = LLM_MAX_RETRIES
+    base_delay: float = LLM_RETRY_BASE_DELAY
+    max_delay: float = LLM_RETRY_MAX_DELAY
+
+
+class TokenBucket:
+    """A bucket refilled at `per_minute` units a minute, holding a minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def take(self, amount: float) -> None:
+        """Remove units; a negative balance is paid back before the next request."""
+        self.tokens -= amount
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Return the delay a server asked for in Retry-After(-ms) headers, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        # A malformed header must not turn a retryable error into a crash
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, date.timestamp() - time.time())
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Throttling (429), server errors (5xx), timeouts and dropped connections."""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    names = {cls.__name__ for cls in type(error).__mro__}
+    return bool(names & _CONNECTION_ERRORS) or isinstance(
+        error, (ConnectionError, TimeoutError, asyncio.TimeoutError)
+    )
+
+
+class RequestScheduler:
+    """
+    Admission control and retries for the requests to one provider.
+
+    A request waits for a concurrency slot and for its share of the
+    requests-per-minute and tokens-per-minute buckets. Throttled and failed
+    requests are retried with exponential backoff and full jitter, waiting
+    at least as long as the server's Retry-After. The concurrency limit is
+    adaptive (AIMD): it halves when the provider throttles and grows back by
+    about one slot per window of successful requests.
+
+    The scheduler is thread-safe and does not bind to an event loop, so sync
+    callers and async callers on any loop share the same limits.
+    """
+
+    def __init__(self, name: str, limits: Optional[SchedulerLimits] = None):
+        self.name = name
+        self.limits = limits or SchedulerLimits()
+        self._lock = threading.Lock()
+        self._requests = (
+            TokenBucket(self.limits.requests_per_minute)
+            if self.limits.requests_per_minute
+            else None
+        )
+        self._tokens = (
+            TokenBucket(self.limits.tokens_per_minute)
+            if self.limits.tokens_per_minute
+            else None
+        )
+        self._limit = float(self.limits.max_concurrency)
+        self._last_decrease = 0.0
+        self._running = 0
+        self._waiting = 0
+        self._peak_waiting = 0
+        self._completed = 0
+        self._retries = 0
+        self._throttled = 0
+        self._failures = 0
+        self._latencies: deque = deque(maxlen=_LATENCY_WINDOW)
+        # Wake-up callbacks of requests waiting for a slot, oldest first
+        self._sleepers: deque = deque()
+
+    # Admission
+
+    def _admit(self, tokens: float, wake: Callable[[], None]) -> Optional[float]:
+        """
+        Take a slot and the request's budget. Returns 0 once admitted, the
+        seconds to wait for the rate budget, or None after registering `wake`
+        to be called when a slot is released.
+        """
+        with self._lock:
+            if self._running >= max(1, int(self._limit)):
+                self._sleepers.append(wake)
+                return None
+            now = time.monotonic()
+            wait = 0.0
+            if self._requests is not None:
+                wait = max(wait, self._requests.wait_time(1, now))
+            if self._tokens is not None and tokens:
+                wait = max(wait, self._tokens.wait_time(tokens, now))
+            if wait > 0:
+                return wait
+            if self._requests is not None:
+                self._requests.take(1)
+            if self._tokens is not None and tokens:
+                self._tokens.take(tokens)
+            self._running += 1
+            return 0.0
+
+    def _release(self) -> None:
+        """Free a slot and wake as many sleepers as there are free slots. Caller holds the lock."""
+        self._running -= 1
+        self._wake_sleepers()
+
+    def _wake_sleepers(self) -> None:
+        free = max(1, int(self._limit)) - self._running
+        while free > 0 and self._sleepers:
+            try:
+                self._sleepers.popleft()()
+            except RuntimeError:
+                continue  # The sleeper's event loop is closed
+            free -= 1
+
+    def _forget_sleeper(self, wake: Callable[[], None], woken: bool) -> None:
+        """
+        Drop a sleeper that stops waiting. One that was woken but will not
+        take the slot (e.g. it was cancelled) passes the wake-up on.
+        """
+        with self._lock:
+            if not woken:
+                try:
+                    self._sleepers.remove(wake)
+                except ValueError:
+                    woken = True  # Woken after the wait gave up
+            if woken:
+                self._wake_sleepers()
+
+    def _enter_queue(self) -> None:
+        with self._lock:
+            self._waiting += 1
+            self._peak_waiting = max(self._peak_waiting, self._waiting)
+
+    def _leave_queue(self) -> None:
+        with self._lock:
+            self._waiting -= 1
+
+    async def _acquire_async(self, tokens: float) -> None:
+        loop = asyncio.get_running_loop()
+        self._enter_queue()
+        try:
+            while True:
+                woken = loop.create_future()
+
+                def wake(woken=woken):
+                    loop.call_soon_threadsafe(
+                        lambda: woken.done() or woken.set_result(None)
+                    )
+
+                wait = self._admit(tokens, wake)
+                if wait == 0:
+                    return
+                if wait is not None:
+                    await asyncio.sleep(wait)
+                    continue
+                try:
+                    await woken
+                except BaseException:
+                    self._forget_sleeper(wake, woken.done())
+                    raise
+        finally:
+            self._leave_queue()
+
+    def _acquire_sync(self, tokens: float) -> None:
+        self._enter_queue()
+        try:
+            while True:
+                woken = threading.Event()
+                wait = self._admit(tokens, woken.set)
+                if wait == 0:
+                    return
+                if wait is not None:
+                    time.sleep(wait)
+                    continue
+                try:
+                    woken.wait()
+                except BaseException:
+                    self._forget_sleeper(woken.set, woken.is_set())
+                    raise
+        finally:
+            self._leave_queue()
+
+    # Outcomes
+
+    def _on_success(self, result: Any, started: float, tokens: float) -> None:
+        used = getattr(getattr(result, "usage", None), "total_tokens", None)
+        with self._lock:
+            self._completed += 1
+            self._latencies.append(time.monotonic() - started)
+            self._limit = min(
+                float(self.limits.max_concurrency), self._limit + 1 / self._limit
+            )
+            self._release()
+            if self._tokens is not None and isinstance(used, (int, float)):
+                # Settle the estimate against what the request really used
+                self._tokens.take(used - tokens)
+
+    def _on_error(self, error: BaseException, attempt: int) -> Optional[float]:
+        """Release the slot; return the delay before the next attempt, or None."""
+        if not isinstance(error, Exception):
+            # Cancellation (CancelledError, KeyboardInterrupt) is not a failure
+            with self._lock:
+                self._release()
+            return None
+        retryable = is_retryable(error)
+        throttled = getattr(error, "status_code", None) == 429
+        with self._lock:
+            if throttled:
+                self._throttled += 1
+                now = time.monotonic()
+                # One decrease per backoff window, not one per request of a burst
+                if now - self._last_decrease > self.limits.base_delay:
+                    self._limit = max(
+                        float(self.limits.min_concurrency), self._limit / 2
+                    )
+                    self._last_decrease = now
+            self._release()
+            if not retryable or attempt >= self.limits.max_retries:
+                self._failures += 1
+                return None
+            self._retries += 1
+        delay = random.uniform(
+            0, min(self.limits.max_delay, self.limits.base_delay * 2**attempt)
+        )
+        requested = retry_after(error)
+        if requested is not None:
+            delay = max(delay, requested)
+        logger.warning(
+            "%s request failed (%s), retry %d/%d in %.1fs",
+            self.name,
+            getattr(error, "status_code", None) or type(error).__name__,
+            attempt + 1,
+            self.limits.max_retries,
+            delay,
+        )
+        return delay
+
+    # Entry points
+
+    async def run(self, call: Callable[[], Awaitable[T]], tokens: float = 0) -> T:
+        """
+        Run an async request under the provider's limits, retrying it on
+        throttling and transient errors.
+
+        Args:
+            call: Makes the request; called again for every attempt.
+            tokens: Estimated tokens the request uses (see estimate_tokens).
+
+        Returns:
+            The result of the first successful attempt.
+        """
+        attempt = 0
+        while True:
+            await self._acquire_async(tokens)
+            started = time.monotonic()
+            try:
+                result = await call()
+            except BaseException as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._on_success(result, started, tokens)
+            return result
+
+    def run_sync(self, call: Callable[[], T], tokens: float = 0) -> T:
+        """Blocking version of run, for sync clients."""
+        attempt = 0
+        while True:
+            self._acquire_sync(tokens)
+            started = time.monotonic()
+            try:
+                result = call()
+            except BaseException as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._on_success(result, started, tokens)
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                "concurrency_limit": int(self._limit),
+                "running": self._running,
+                "waiting": self._waiting,
+                "peak_waiting": self._peak_waiting,
+                "completed": self._completed,
+                "retries": self._retries,
+                "throttled": self._throttled,
+                "failures": self._failures,
+                "latency_mean": statistics.fmean(latencies) if latencies else None,
+                "latency_p50": latencies[len(latencies) // 2] if latencies else None,
+                "latency_p95": (
+                    latencies[int(len(latencies) * 0.95)] if latencies else None
+                ),
+            }
+
+
+_SCHEDULERS: dict[str, RequestScheduler] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+def get_scheduler(provider: str) -> RequestScheduler:
+    """Return the process-wide scheduler of a provider (an API host name)."""
+    with _SCHEDULERS_LOCK:
+        if provider not in _SCHEDULERS:
+            overrides = LLM_PROVIDER_LIMITS.get(provider, {})
+            _SCHEDULERS[provider] = RequestScheduler(
+                provider, SchedulerLimits(**overrides)
+            )
+        return _SCHEDULERS[provider]
+
+
+def scheduler_for(client: Any) -> RequestScheduler:
+    """Return the scheduler of the provider an OpenAI or Anthropic client talks to."""
+    base_url = getattr(client, "base_url", None)
+    host = getattr(base_url, "host", None) or str(base_url or "default")
+    port = getattr(base_url, "port", None)
+    return get_scheduler(f"{host}:{port}" if port else host)
+
+
+def scheduler_stats() -> dict[str, dict]:
+    """Return the queue and latency statistics of every provider."""
+    with _SCHEDULERS_LOCK:
+        schedulers = list(_SCHEDULERS.values())
+    return {scheduler.name: scheduler.stats() for scheduler in schedulers}
+
+
+def estimate_tokens(messages: Iterable[Union[dict, Any]], completion: int = 0) -> int:
+    """Roughly estimate a request's tokens: about 4 characters per prompt token."""
+    chars = 0
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else message
+        chars += len(content) if isinstance(content, str) else len(str(content))
+    return chars // 4 + completion
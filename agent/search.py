@@ -0,0 +1,65 @@
+import re
+import sqlite3
+
+from agent.markdown import split_sections
+from agent.memory_index import open_index
+from agent.notes import NoteIndexer, ensure_fresh
+from agent.settings import SEARCH_SNIPPET_TOKENS
+
+# Full-text index of the memory's notes, one row per section in the index's
+# FTS5 "search" table, ranked with BM25. Heading matches weigh more than body
+# matches.
+_HEADING_WEIGHT = 4.0
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _drop(conn: sqlite3.Connection, note: str) -> None:
+    conn.execute("DELETE FROM search WHERE path = ?", (note,))
+
+
+def _index(conn: sqlite3.Connection, note: str, text: str) -> None:
+    _drop(conn, note)
+    conn.executemany(
+        "INSERT INTO search (path, heading, body) VALUES (?, ?, ?)",
+        [
+            (note, section.heading, text[section.start : section.end])
+            for section in split_sections(text)
+        ],
+    )
+
+
+def _clear(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM search")
+
+
+SEARCH_INDEXER = NoteIndexer("search_built", _index, _drop, _clear)
+
+
+def search(memory_path: str, query: str, k: int) -> list[dict]:
+    """
+    Return the `k` sections of a memory that best match `query`, best first.
+
+    Every word of the query is optional; sections matching more (and rarer)
+    words rank higher.
+
+    Returns:
+        A list of {"file", "heading", "snippet"} dicts, with file paths
+        relative to the memory root.
+    """
+    terms = _TOKEN.findall(query.lower())
+    if not terms or k <= 0:
+        return []
+    match = " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+    with open_index(memory_path) as conn:
+        ensure_fresh(conn, memory_path, SEARCH_INDEXER)
+        rows = conn.execute(
+            "SELECT path, heading, snippet(search, 2, '', '', '...', ?) "
+            "FROM search WHERE search MATCH ? "
+            "ORDER BY bm25(search, 0.0, ?, 1.0) LIMIT ?",
+            (SEARCH_SNIPPET_TOKENS, match, _HEADING_WEIGHT, k),
+        ).fetchall()
+    return [
+        {"file": path, "heading": heading, "snippet": " ".join(snippet.split())}
+        for path, heading, snippet in rows
+    ]
@@ -0,0 +1,99 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from agent.markdown import split_sections
+from agent.settings import SECTION_CACHE_SIZE
+
+
+class SectionRange(NamedTuple):
+    """Where a heading's section lies in a file, subsections included."""
+
+    heading: str
+    level: int
+    start: int  # Byte offset of the heading line
+    body: int  # Byte offset of the line after the heading
+    end: int  # Byte offset of the next heading of the same or a higher level
+
+
+# File path -> ((inode, mtime, size), its sections). Write tools replace files
+# with a new inode and also drop their entry (see forget_sections).
+_CACHE: "OrderedDict[str, tuple[tuple, list[SectionRange]]]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+def _index(data: bytes) -> list[SectionRange]:
+    text = data.decode(errors="replace")
+    sections = split_sections(text)
+    # Character offsets of section boundaries -> byte offsets
+    byte_offsets = {}
+    position, byte_position = 0, 0
+    for offset in sorted({s.start for s in sections} | {len(text)}):
+        byte_position += len(text[position:offset].encode(errors="replace"))
+        byte_offsets[offset] = byte_position
+        position = offset
+    ranges = []
+    for i, section in enumerate(sections):
+        end = byte_offsets[len(text)]
+        for following in sections[i + 1 :]:
+            if section.level and following.level <= section.level:
+                end = byte_offsets[following.start]
+                break
+        start = byte_offsets[section.start]
+        body = start
+        if section.level:
+            line_end = data.find(b"\n", start)
+            body = len(data) if line_end == -1 else line_end + 1
+        ranges.append(SectionRange(section.heading, section.level, start, body, end))
+    return ranges
+
+
+def file_sections(path: str) -> list[SectionRange]:
+    """Return the sections of a markdown file, from the cache while it is unchanged."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _CACHE_LOCK:
+        cached = _CACHE.get(path)
+        if cached is not None and cached[0] == key:
+            _CACHE.move_to_end(path)
+            return cached[1]
+    with open(path, "rb") as f:
+        ranges = _index(f.read())
+    with _CACHE_LOCK:
+        _CACHE[path] = (key, ranges)
+        _CACHE.move_to_end(path)
+        while len(_CACHE) > SECTION_CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return ranges
+
+
+def forget_sections(path: str) -> None:
+    """Drop the cached sections of a file after it was written."""
+    with _CACHE_LOCK:
+        _CACHE.pop(os.path.abspath(path), None)
+
+
+def _normalize(heading: str) -> str:
+    return " ".join(heading.strip().lstrip("#").split()).lower()
+
+
+def find_section(path: str, heading: str) -> Optional[SectionRange]:
+    """
+    Return the first section of a file whose heading matches `heading`,
+    ignoring case, extra spaces and leading "#"s. "" names the text before
+    the first heading.
+    """
+    wanted = _normalize(heading)
+    for section in file_sections(path):
+        if _normalize(section.heading) == wanted:
+            return section
+    return None
+
+
+def read_range(path: str, start: int, end: int) -> str:
+    """Read the bytes [start, end) of a file as text."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start).decode(errors="replace")
@@ -6,12 +6,33 @@ load_dotenv()
 
 # Agent settings
 MAX_TOOL_TURNS = 8
+READ_ONLY_CACHE_SIZE = 256  # Memoized results of read-only python blocks, per agent
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "false").lower() == "true"  # Stream model turns
 
 # OpenRouter
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_STRONG_MODEL = "anthropic/claude-sonnet-4"
 
+# LLM clients, shared per endpoint (see agent.clients)
+CLIENT_MAX_CONNECTIONS = int(os.getenv("CLIENT_MAX_CONNECTIONS", "256"))
+CLIENT_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("CLIENT_MAX_KEEPALIVE_CONNECTIONS", "64"))
+CLIENT_KEEPALIVE_EXPIRY = 30  # Seconds an idle connection is kept open
+
+# LLM request scheduling, per provider (see agent.scheduler)
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))  # 0 is unlimited
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))  # 0 is unlimited
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))  # Upper bound of the adaptive limit
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+LLM_RETRY_BASE_DELAY = 1.0  # Seconds; doubles with every retry, with full jitter
+LLM_RETRY_MAX_DELAY = 60.0  # Cap of the backoff, a longer Retry-After is still honoured
+LLM_PROVIDER_LIMITS: dict[str, dict] = {}  # Host -> SchedulerLimits overrides
+
+# LLM response cache (see agent.llm_cache)
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "off")  # "off", "readwrite", "record" or "replay"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "output/llm_cache.sqlite")
+LLM_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1GB of responses, least recently used evicted first
+
 # vLLM
 VLLM_HOST = os.getenv("VLLM_HOST", "0.0.0.0")
 VLLM_PORT = int(os.getenv("VLLM_PORT", "8000"))
@@ -21,9 +42,33 @@ MEMORY_PATH = "memory_dir"
 FILE_SIZE_LIMIT = 1024 * 1024  # 1MB
 DIR_SIZE_LIMIT = 1024 * 1024 * 10  # 10MB
 MEMORY_SIZE_LIMIT = 1024 * 1024 * 100  # 100MB
+MEMORY_META_DIR = ".meta"  # Hidden bookkeeping directory inside the memory root
+READ_MMAP_THRESHOLD = 1024 * 64  # read_files maps files of this size or more
+SECTION_CACHE_SIZE = 256  # Files whose heading offsets are kept in memory per process
+LISTING_CACHE_SIZE = 32  # Memories whose file listing is kept in memory per process
+SEARCH_RESULTS = 5  # Default number of sections returned by search_memory
+SEARCH_SNIPPET_TOKENS = 24  # Length of each search_memory snippet, in tokens
+FOLLOW_LINKS_MAX_NOTES = 25  # Default cap on the notes returned by follow_links
+PATCH_FUZZ = 2  # Context lines per hunk end write_to_file may ignore when a diff does not apply
 
 # Engine
 SANDBOX_TIMEOUT = 20
+SANDBOX_BACKEND = os.getenv("SANDBOX_BACKEND", "spawn")  # "spawn", "pool" or "zygote"
+SANDBOX_POOL_SIZE = int(os.getenv("SANDBOX_POOL_SIZE", "8"))
+SANDBOX_WORKER_MAX_JOBS = 100  # Recycle a pool worker after this many jobs
+SANDBOX_MAX_RESULT_BYTES = 1024 * 1024 * 32  # 32MB, pickled result per job
+SANDBOX_MAX_OUTPUT_CHARS = 1024 * 64  # Captured stdout/stderr per stream
+SANDBOX_MAX_VALUE_BYTES = 1024 * 64  # Per returned variable, larger values are truncated
+SANDBOX_MAX_LOCALS_BYTES = 1024 * 256  # All returned variables together
+SANDBOX_MAX_CONCURRENCY = int(os.getenv("SANDBOX_MAX_CONCURRENCY", "32"))  # Per event loop, async only
+SANDBOX_CODE_CACHE_SIZE = 1024  # Compiled snippets kept in memory per sandbox process
+SANDBOX_CODE_CACHE_DIR = os.getenv("SANDBOX_CODE_CACHE_DIR")  # Unset keeps the cache in memory only
+SANDBOX_CODE_CACHE_DISK_ENTRIES = 10000
+SANDBOX_FAST_PATH = os.getenv("SANDBOX_FAST_PATH", "false").lower() == "true"  # Run tool-only blocks in-process
+SANDBOX_FAST_PATH_WORKERS = 8  # Threads running fast-path blocks for async callers
+SESSION_KERNEL = os.getenv("SESSION_KERNEL", "false").lower() == "true"  # Keep variables across turns
+SESSION_KERNEL_IDLE_TIMEOUT = 600  # Seconds before an unused session kernel exits
+SESSION_KERNEL_MAX_LIVE = int(os.getenv("SESSION_KERNEL_MAX_LIVE", "16"))
 
 # Path settings
 SYSTEM_PROMPT_PATH = "agent/system_prompt_alt.txt"
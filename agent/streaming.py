@@ -0,0 +1,86 @@
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from agent.utils import extract_python_code
+
+PYTHON_OPEN, PYTHON_CLOSE = "<python>", "</python>"
+REPLY_OPEN, REPLY_CLOSE = "<reply>", "</reply>"
+
+# The server stops generating at the end of a reply. Python blocks cannot be a
+# stop sequence, since a reply turn starts with an empty "<python></python>";
+# the client closes the stream instead, once a non-empty block is complete.
+STREAM_STOP_SEQUENCES = [REPLY_CLOSE]
+
+
+@dataclass
+class TurnMetrics:
+    """Timings of one model turn, in seconds from sending the request."""
+
+    ttft: Optional[float] = None  # Time to the first content token
+    dispatch: Optional[float] = None  # Time until the turn could be acted on
+    early_stop: bool = False  # The stream was closed after a python block
+    chars: int = 0  # Characters of response received
+    started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_dict(self) -> dict:
+        return {
+            "ttft": self.ttft,
+            "dispatch": self.dispatch,
+            "early_stop": self.early_stop,
+            "chars": self.chars,
+        }
+
+
+class TurnStreamParser:
+    """
+    Incrementally watch a streamed response for the end of a non-empty
+    python block, the point at which the rest of the generation can be
+    dropped and the block dispatched to the sandbox.
+    """
+
+    def __init__(self):
+        self._parts: list[str] = []
+        self._text = ""
+        self._scanned = 0  # Offset up to which "</python>" was searched
+        self.python_closed = False
+
+    @property
+    def text(self) -> str:
+        if self._parts:
+            self._text += "".join(self._parts)
+            self._parts.clear()
+        return self._text
+
+    def feed(self, chunk: str) -> bool:
+        """Add a chunk of the response; returns True once a python block is complete."""
+        if self.python_closed or not chunk:
+            return self.python_closed
+        self._parts.append(chunk)
+        text = self.text
+        # A tag may straddle two chunks, so rescan the tail of the last search
+        start = max(0, self._scanned - len(PYTHON_CLOSE))
+        self._scanned = len(text)
+        while True:
+            end = text.find(PYTHON_CLOSE, start)
+            if end == -1:
+                return False
+            block = text[: end + len(PYTHON_CLOSE)]
+            if PYTHON_OPEN in block and extract_python_code(block).strip():
+                self._text = block
+                self.python_closed = True
+                return True
+            start = end + len(PYTHON_CLOSE)
+
+    def result(self) -> str:
+        """
+        Return the response, cut after the python block that ended the stream,
+        or with the "</reply>" the server stopped at restored.
+        """
+        text = self.text
+        if not self.python_closed and text.rfind(REPLY_OPEN) > text.rfind(REPLY_CLOSE):
+            text += REPLY_CLOSE
+        return text
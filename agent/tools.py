@@ -1,32 +1,186 @@
+import mmap
 import os
-import tempfile
+import sqlite3
 import uuid
-import subprocess
-from pathlib import Path
-
-from agent.settings import MEMORY_PATH
-from agent.utils import check_size_limits, create_memory_if_not_exists
-
-
-def get_size(file_or_dir_path: str) -> int:
+from typing import Union
+
+from agent.attributes import ATTRIBUTE_INDEXER, query
+from agent.ledger import dir_usage, rebuild_usage, record_size_change
+from agent.links import LINK_INDEXER, backlinks, neighbourhood, resolve_note_link
+from agent.listing import list_dir
+from agent.markdown import with_attribute, without_attribute
+from agent.memory_meta import (
+    bump_generation,
+    memory_root,
+    meta_path,
+    relative_path,
+    resolve_path,
+)
+from agent.notes import rebuild_note_indexes, record_note_change
+from agent.patch import PatchError, PatchFailure, apply_patch, parse_unified_diff
+from agent.search import SEARCH_INDEXER, search
+from agent.sections import file_sections, find_section, forget_sections, read_range
+from agent.settings import (
+    FOLLOW_LINKS_MAX_NOTES,
+    READ_MMAP_THRESHOLD,
+    MEMORY_PATH,
+    SEARCH_RESULTS,
+)
+from agent.utils import (
+    check_content_size_limits,
+    check_memory_size_limit,
+    create_memory_if_not_exists,
+)
+
+# The tools exposed to sandboxed code (see agent.registry). The system prompts
+# list them by hand; tests/test_registry.py checks the two agree.
+__all__ = [
+    "get_size",
+    "create_file",
+    "create_files",
+    "create_dir",
+    "write_to_file",
+    "replace_section",
+    "set_attribute",
+    "remove_attribute",
+    "read_file",
+    "read_files",
+    "read_section",
+    "list_files",
+    "delete_file",
+    "go_to_link",
+    "check_if_file_exists",
+    "check_if_dir_exists",
+    "search_memory",
+    "resolve_link",
+    "get_backlinks",
+    "follow_links",
+    "query_attributes",
+]
+
+# Tools that never modify the memory; python blocks that only call these can be
+# memoized until the memory's generation changes (see agent.memo).
+READ_ONLY_TOOLS = [
+    "get_size",
+    "read_file",
+    "read_files",
+    "read_section",
+    "list_files",
+    "go_to_link",
+    "check_if_file_exists",
+    "check_if_dir_exists",
+    "search_memory",
+    "resolve_link",
+    "get_backlinks",
+    "follow_links",
+    "query_attributes",
+]
+
+# The parameters of each tool that name files, directories or notes of the
+# memory. A python block only runs in-process (see agent.sandbox.fast_path) if
+# every path it passes stays inside the memory, and tools missing here always
+# go to the sandbox, so a new tool must be declared to take the fast path.
+TOOL_PATH_PARAMETERS = {
+    "get_size": ("file_or_dir_path",),
+    "create_file": ("file_path",),
+    "create_files": ("files",),
+    "create_dir": ("dir_path",),
+    "write_to_file": ("file_path",),
+    "replace_section": ("file_path",),
+    "set_attribute": ("file_path",),
+    "remove_attribute": ("file_path",),
+    "read_file": ("file_path",),
+    "read_files": ("paths",),
+    "read_section": ("file_path",),
+    "list_files": ("dir_path",),
+    "delete_file": ("file_path",),
+    "go_to_link": ("link_string",),
+    "check_if_file_exists": ("file_path",),
+    "check_if_dir_exists": ("dir_path",),
+    "search_memory": (),
+    "resolve_link": ("link_string", "from_file"),
+    "get_backlinks": ("note",),
+    "follow_links": ("note",),
+    "query_attributes": ("entity",),
+}
+
+# Indexes of note contents that every write keeps up to date
+NOTE_INDEXERS = (SEARCH_INDEXER, LINK_INDEXER, ATTRIBUTE_INDEXER)
+
+
+def _record_write(file_path: str = None) -> None:
     """
-    Get the size of a file or directory.
+    Bookkeeping after a write to the current memory: bump its generation,
+    update the usage ledger with the new size of `file_path` (if given) and
+    reindex the file's content (search, links, attributes).
+    """
+    root = memory_root()
+    bump_generation(root)
+    if file_path is not None:
+        forget_sections(file_path)
+        # The write itself succeeded; a broken index is rebuilt from the files
+        try:
+            record_size_change(root, file_path)
+        except sqlite3.Error:
+            rebuild_usage(root)
+        try:
+            record_note_change(root, file_path, NOTE_INDEXERS)
+        except sqlite3.Error:
+            rebuild_note_indexes(root, NOTE_INDEXERS)
+
+
+def _file_size(path: str) -> int:
+    return os.path.getsize(path) if os.path.isfile(path) else 0
+
+
+def get_size(file_or_dir_path: str) -> Union[int, str]:
+    """
+    Get the size of a file or directory. Directory sizes include everything
+    below them and come from the memory's usage ledger.
 
     Args:
-        file_or_dir_path: The path to the file or directory.
+        file_or_dir_path: The path to the file or directory, "" for the whole memory.
 
     Returns:
-        The size of the file or directory in bytes.
+        The size of the file or directory in bytes, or an error message if the
+        directory is outside of the memory.
     """
-    return os.path.getsize(file_or_dir_path)
+    path = resolve_path(file_or_dir_path) or memory_root()
+    if os.path.isdir(path):
+        try:
+            return dir_usage(memory_root(), path)
+        except ValueError as e:
+            return f"Error: {e}"
+    return os.path.getsize(path)
+
+
+def _write_atomic(file_path: str, data: bytes) -> None:
+    """
+    Write `data` to `file_path` with a single write: the bytes go to a hidden
+    temp file in the memory's metadata directory, which is then renamed over
+    the target, so readers never see a partial file and a crash leaves no
+    stray files in the memory.
+    """
+    temp_dir = meta_path(memory_root(), "tmp")
+    os.makedirs(temp_dir, exist_ok=True)
+    temp_file_path = os.path.join(temp_dir, uuid.uuid4().hex)
+    try:
+        with open(temp_file_path, "wb") as f:
+            f.write(data)
+        os.rename(temp_file_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_file_path)
+        except OSError:
+            pass
+        raise
 
 
 def create_file(file_path: str, content: str = "") -> bool:
     """
     Create a new file in the memory with the given content (if any).
-    First create a temporary file with the given content, check if
-    the size limits are respected, if so, move the temporary file to
-    the final destination.
+    The size limits are checked before anything is written, then the
+    file is written atomically.
 
     Args:
         file_path: The path to the file.
@@ -36,25 +190,58 @@ def create_file(file_path: str, content: str = "") -> bool:
         True if the file was created successfully, False otherwise.
     """
     try:
-        # Create a unique temporary file name to avoid conflicts
-        temp_file_path = f"temp_{uuid.uuid4().hex[:8]}.txt"
-
-        with open(temp_file_path, "w") as f:
-            f.write(content)
-
-        if check_size_limits(temp_file_path):
-            # Move the temporary file to the final destination
-            with open(file_path, "w") as f:
-                f.write(content)
-            os.remove(temp_file_path)
-            return True
-        else:
-            os.remove(temp_file_path)
+        path = resolve_path(file_path)
+        data = content.encode()
+        if not check_content_size_limits(path, len(data)):
             return False
+        _write_atomic(path, data)
+        _record_write(path)
+        return True
     except Exception:
         return False
 
 
+def create_files(files: dict[str, str]) -> dict[str, bool]:
+    """
+    Create several files in the memory in one call, creating parent
+    directories as needed. The size limits of all files are checked first;
+    if any file would break them, nothing is written.
+
+    Args:
+        files: A dict mapping each file path to its content.
+
+    Returns:
+        A dict mapping each file path to True if it was created, False otherwise.
+    """
+    results = {file_path: False for file_path in files}
+    try:
+        encoded = {
+            file_path: (resolve_path(file_path), content.encode())
+            for file_path, content in files.items()
+        }
+        for path, data in encoded.values():
+            if not check_content_size_limits(path, len(data)):
+                return results
+        total_change = sum(
+            len(data) - _file_size(path) for path, data in encoded.values()
+        )
+        if not check_memory_size_limit(total_change):
+            return results
+        for file_path, (path, data) in encoded.items():
+            try:
+                parent_dir = os.path.dirname(path)
+                if parent_dir:
+                    os.makedirs(parent_dir, exist_ok=True)
+                _write_atomic(path, data)
+                _record_write(path)
+                results[file_path] = True
+            except Exception:
+                pass
+    except Exception:
+        return results
+    return results
+
+
 def create_dir(dir_path: str) -> bool:
     """
     Create a new directory in the memory.
@@ -66,12 +253,13 @@ def create_dir(dir_path: str) -> bool:
         True if the directory was created successfully, False otherwise.
     """
     try:
-        os.makedirs(dir_path, exist_ok=True)
+        os.makedirs(resolve_path(dir_path), exist_ok=True)
+        _record_write()
         return True
     except Exception:
         return False
 
-def write_to_file(file_path: str, diff: str) -> bool:
+def write_to_file(file_path: str, diff: str) -> Union[bool, str]:
     """
     Try to apply a unified git-style diff to `file_path`.
 
@@ -81,44 +269,158 @@ def write_to_file(file_path: str, diff: str) -> bool:
         Absolute or relative path to the file being patched.
     diff : str
         Text in standard unified-diff format (what you get from `git diff`).
+        Context lines that drifted slightly are tolerated (see agent.patch).
 
     Returns
     -------
-    bool
+    bool or str
         True  – diff applied cleanly.
-        False – any problem (syntax errors, context mismatch, no git in PATH …).
+        str   – an "Error: ..." report of what went wrong: the failing hunk,
+                the lines it expected and the closest lines found.
     """
-    # Guarantee we run in the directory that contains the target file.
-    workdir = Path(file_path).expanduser().resolve().parent
+    path = resolve_path(file_path)
+    try:
+        parsed = parse_unified_diff(diff)
+    except PatchError as e:
+        return f"Error: {PatchFailure(reason=f'malformed diff: {e}')}"
+
+    try:
+        if os.path.exists(path):
+            # newline="" keeps the file's own line endings
+            with open(path, "r", newline="") as f:
+                text = f.read()
+        elif parsed.creates_file:
+            text = ""
+        else:
+            return f"Error: File {file_path} does not exist"
+
+        patched = apply_patch(text, parsed)
+        if isinstance(patched, PatchFailure):
+            return f"Error: {patched}"
+
+        if parsed.deletes_file and not patched:
+            os.remove(path)
+            _record_write(path)
+        else:
+            data = patched.encode()
+            if not check_content_size_limits(path, len(data)):
+                return "Error: The patched file would exceed the size limits"
+            _write_atomic(path, data)
+            _record_write(path)
+        return True
+    except PermissionError:
+        return f"Error: Permission denied accessing {file_path}"
+    except Exception as e:
+        return f"Error: {e}"
 
-    # Stash the diff text in a temp file; Git only reads from disk.
-    with tempfile.NamedTemporaryFile("w+", delete=False, dir=workdir) as tmp:
-        tmp.write(diff)
-        patch_file = tmp.name
 
+def replace_section(file_path: str, heading: str, content: str) -> bool:
+    """
+    Replace the text under a markdown heading, subsections included, and
+    keep the heading line itself. The rest of the file is left untouched.
+
+    Args:
+        file_path: The path to the file.
+        heading: The heading text, e.g. "Basic Information" or
+            "## Basic Information" (case-insensitive).
+        content: The new text of the section, without its heading line.
+
+    Returns:
+        True if the section was replaced, False if it was not found or the
+        file could not be written.
+    """
     try:
-        # 1. Dry-run check ─ will fail (non-zero return-code) on any conflict.
-        check = subprocess.run(
-            ["git", "apply", "--check", "--unsafe-paths", patch_file],
-            cwd=workdir,
-            capture_output=True,
-            text=True,
-        )
-        if check.returncode != 0:
-            # Optional: log or surface check.stderr for callers.
+        path = resolve_path(file_path)
+        section = find_section(path, heading)
+        if section is None:
             return False
+        with open(path, "rb") as f:
+            data = f.read()
+        body = content.encode()
+        if body and not body.endswith(b"\n"):
+            body += b"\n"
+        if section.level and not data[: section.body].endswith(b"\n"):
+            body = b"\n" + body  # The heading was the file's unterminated last line
+        old_body = data[section.body : section.end]
+        if section.end < len(data) and old_body.endswith(b"\n\n"):
+            # Keep the blank line before the next heading
+            body = body.rstrip(b"\n") + b"\n\n" if body.strip() else body
+        patched = data[: section.body] + body + data[section.end :]
+        if not check_content_size_limits(path, len(patched)):
+            return False
+        _write_atomic(path, patched)
+        _record_write(path)
+        return True
+    except Exception:
+        return False
+
+
+def _rewrite_note(path: str, edit) -> bool:
+    """Apply `edit` (text -> new text, or None to give up) to a note atomically."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        text = f.read()
+    edited = edit(text)
+    if edited is None:
+        return False
+    if edited == text:
+        return True
+    data = edited.encode()
+    if not check_content_size_limits(path, len(data)):
+        return False
+    _write_atomic(path, data)
+    _record_write(path)
+    return True
+
+
+def set_attribute(file_path: str, key: str, value: str, section: str = None) -> bool:
+    """
+    Set a "- **Key**: value" attribute of a note. An existing bullet for the
+    key (case-insensitive) is rewritten in place; otherwise a new bullet is
+    added to `section` ("Basic Information" by default), which is created
+    if missing.
 
-        # 2. Real apply (no --check).
-        apply = subprocess.run(
-            ["git", "apply", "--unsafe-paths", patch_file],
-            cwd=workdir,
-            capture_output=True,
-            text=True,
+    Args:
+        file_path: The path to the note.
+        key: The attribute name, e.g. "Age".
+        value: The new value, e.g. "24" or "[[entities/maria_garcia.md]]".
+        section: The heading to add a new attribute under.
+
+    Returns:
+        True if the attribute was set, False otherwise.
+    """
+    try:
+        path = resolve_path(file_path)
+        if not os.path.isfile(path):
+            return False
+        return _rewrite_note(
+            path, lambda text: with_attribute(text, key, value, section)
         )
-        return apply.returncode == 0
-    finally:
-        os.remove(patch_file)
-        
+    except Exception:
+        return False
+
+
+def remove_attribute(file_path: str, key: str) -> bool:
+    """
+    Remove a "- **Key**: value" attribute, and any lines nested below it,
+    from a note.
+
+    Args:
+        file_path: The path to the note.
+        key: The attribute name (case-insensitive).
+
+    Returns:
+        True if the attribute was removed, False if it was not found or the
+        file could not be written.
+    """
+    try:
+        path = resolve_path(file_path)
+        if not os.path.isfile(path):
+            return False
+        return _rewrite_note(path, lambda text: without_attribute(text, key))
+    except Exception:
+        return False
+
+
 def read_file(file_path: str) -> str:
     """
     Read a file in the memory.
@@ -131,13 +433,14 @@ def read_file(file_path: str) -> str:
     """
     try:
         # Ensure the file path is properly resolved
-        if not os.path.exists(file_path):
+        path = resolve_path(file_path)
+        if not os.path.exists(path):
             return f"Error: File {file_path} does not exist"
 
-        if not os.path.isfile(file_path):
+        if not os.path.isfile(path):
             return f"Error: {file_path} is not a file"
 
-        with open(file_path, "r") as f:
+        with open(path, "r") as f:
             return f.read()
     except PermissionError:
         return f"Error: Permission denied accessing {file_path}"
@@ -145,43 +448,165 @@ def read_file(file_path: str) -> str:
         return f"Error: {e}"
 
 
-def list_files(dir_path: str = None) -> list[str]:
+def read_section(file_path: str, heading: str) -> str:
+    """
+    Read the part of a markdown file under one heading, subsections included,
+    without reading the rest of the file.
+
+    Args:
+        file_path: The path to the file.
+        heading: The heading text, e.g. "Relationships" or "## Relationships"
+            (case-insensitive).
+
+    Returns:
+        The section, heading line included, or an error message listing the
+        file's headings if there is no such section.
+    """
+    try:
+        path = resolve_path(file_path)
+        if not os.path.isfile(path):
+            return f"Error: File {file_path} does not exist"
+        section = find_section(path, heading)
+        if section is None:
+            headings = ", ".join(
+                repr(s.heading) for s in file_sections(path) if s.level
+            )
+            return f"Error: No section {heading!r} in {file_path}; headings: {headings}"
+        return read_range(path, section.start, section.end)
+    except PermissionError:
+        return f"Error: Permission denied accessing {file_path}"
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def _line_offset(data, line: int) -> int:
+    """Return the offset where 1-based `line` starts in `data` (bytes or mmap)."""
+    offset = 0
+    for _ in range(line - 1):
+        offset = data.find(b"\n", offset) + 1
+        if offset == 0:
+            return len(data)
+    return offset
+
+
+def _slice(data, max_bytes: int, start_line: int, end_line: int) -> bytes:
+    """Copy the requested lines of `data`, at most `max_bytes` of them, as bytes."""
+    start = _line_offset(data, start_line) if start_line else 0
+    end = len(data)
+    if end_line:
+        end = max(start, _line_offset(data, end_line + 1))
+    if max_bytes is not None and end - start > max_bytes:
+        end = start + max(0, max_bytes)
+        # Do not cut a UTF-8 character in half
+        while end > start and data[end] & 0xC0 == 0x80:
+            end -= 1
+    return data[start:end]
+
+
+def _read_slice(
+    path: str, max_bytes: int = None, start_line: int = None, end_line: int = None
+) -> str:
+    size = os.path.getsize(path)
+    sliced = max_bytes is not None or start_line or end_line
+    if size < READ_MMAP_THRESHOLD:
+        if not sliced:
+            with open(path, "r") as f:
+                return f.read()
+        with open(path, "rb") as f:
+            data = f.read()
+        return _slice(data, max_bytes, start_line, end_line).decode(errors="replace")
+    # Map large files so only the requested part is ever copied
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        data = _slice(m, max_bytes, start_line, end_line)
+    return data.decode(errors="replace")
+
+
+def read_files(
+    paths: list[str],
+    max_bytes: int = None,
+    start_line: int = None,
+    end_line: int = None,
+) -> dict[str, str]:
+    """
+    Read several files of the memory in one call, optionally only part of
+    each: the lines from `start_line` to `end_line` (1-based, inclusive),
+    cut to at most `max_bytes` bytes.
+
+    Args:
+        paths: The paths to the files.
+        max_bytes: The maximum number of bytes to return per file.
+        start_line: The first line to return per file.
+        end_line: The last line to return per file.
+
+    Returns:
+        A dict mapping each path to the file's content, or to an error
+        message if that file cannot be read.
+    """
+    results = {}
+    for file_path in paths:
+        try:
+            path = resolve_path(file_path)
+            if not os.path.exists(path):
+                results[file_path] = f"Error: File {file_path} does not exist"
+            elif not os.path.isfile(path):
+                results[file_path] = f"Error: {file_path} is not a file"
+            else:
+                results[file_path] = _read_slice(path, max_bytes, start_line, end_line)
+        except PermissionError:
+            results[file_path] = f"Error: Permission denied accessing {file_path}"
+        except Exception as e:
+            results[file_path] = f"Error: {e}"
+    return results
+
+
+def list_files(
+    dir_path: str = None,
+    pattern: str = None,
+    max_depth: int = None,
+    offset: int = 0,
+    limit: int = None,
+) -> list[str]:
     """
-    List all files and directories in the memory. Full paths
+    List all files in the memory. Paths relative to `dir_path`
     are returned and directories are searched recursively. An
     example of the output is:
-    ["dir/a.txt", "dir/b.txt", "dir/subdir/c.txt", "d.txt"]
+    ["d.txt", "dir/a.txt", "dir/b.txt", "dir/subdir/c.txt"]
+    With a `limit`, if more files match, the last entry says how
+    to get the next page.
 
     Args:
-        dir_path: The path to the directory. If None, uses the current working directory.
+        dir_path: The path to the directory. If None, uses the memory root.
+        pattern: Optional glob such as "*.md", or "entities/*.md" to match whole paths.
+        max_depth: Optional number of subdirectory levels to descend
+            (0 = no subdirectories).
+        offset: How many matching files to skip.
+        limit: Optional maximum number of files to return (None = all).
 
     Returns:
-        A list of files and directories in the memory.
+        A list of files in the memory.
     """
     try:
-        # Use current directory if dir_path is None
+        # Use the memory root if dir_path is None
         if dir_path is None:
-            dir_path = os.getcwd()
+            dir_path = memory_root()
 
         # Ensure dir_path is absolute for consistent path handling
-        dir_path = os.path.abspath(dir_path)
+        dir_path = os.path.abspath(resolve_path(dir_path))
 
         # Check if the directory exists
         if not os.path.exists(dir_path) or not os.path.isdir(dir_path):
             return [f"Error: Directory {dir_path} does not exist or is not a directory"]
 
-        result_files = []
-        for root, _, files_list in os.walk(dir_path):
-            for file in files_list:
-                full_path = os.path.join(root, file)
-                # Make the path relative to the memory directory (dir_path)
-                try:
-                    rel_path = os.path.relpath(full_path, dir_path)
-                    result_files.append(rel_path)
-                except ValueError:
-                    # If paths are on different drives on Windows, use absolute path
-                    result_files.append(full_path)
-        return result_files
+        files = list_dir(memory_root(), dir_path, pattern, max_depth)
+        offset = max(0, offset)
+        page = files[offset : offset + limit] if limit is not None else files[offset:]
+        remaining = len(files) - offset - len(page)
+        if remaining > 0:
+            page.append(
+                f"... {remaining} more files, call list_files with "
+                f"offset={offset + len(page)} for the next page"
+            )
+        return page
     except Exception as e:
         return [f"Error: {e}"]
 
@@ -197,7 +622,9 @@ def delete_file(file_path: str) -> bool:
         True if the file was deleted successfully, False otherwise.
     """
     try:
-        os.remove(file_path)
+        path = resolve_path(file_path)
+        os.remove(path)
+        _record_write(path)
         return True
     except Exception:
         return False
@@ -223,15 +650,18 @@ def go_to_link(link_string: str) -> str:
                 file_path += ".md"
         else:
             file_path = link_string
+        # Links by bare note name resolve through the memory's link index
+        file_path = resolve_note_link(memory_root(), link_string) or file_path
 
         # Ensure the file path is properly resolved
-        if not os.path.exists(file_path):
+        path = resolve_path(file_path)
+        if not os.path.exists(path):
             return f"Error: File {file_path} not found"
 
-        if not os.path.isfile(file_path):
+        if not os.path.isfile(path):
             return f"Error: {file_path} is not a file"
 
-        with open(file_path, "r") as f:
+        with open(path, "r") as f:
             return f.read()
     except PermissionError:
         return f"Error: Permission denied accessing {link_string}"
@@ -250,7 +680,8 @@ def check_if_file_exists(file_path: str) -> bool:
         True if the file exists and is a file, False otherwise.
     """
     try:
-        return os.path.exists(file_path) and os.path.isfile(file_path)
+        path = resolve_path(file_path)
+        return os.path.exists(path) and os.path.isfile(path)
     except (OSError, TypeError, ValueError):
         return False
 
@@ -266,6 +697,134 @@ def check_if_dir_exists(dir_path: str) -> bool:
         True if the directory exists and is a directory, False otherwise.
     """
     try:
-        return os.path.exists(dir_path) and os.path.isdir(dir_path)
+        path = resolve_path(dir_path)
+        return os.path.exists(path) and os.path.isdir(path)
     except (OSError, TypeError, ValueError):
         return False
+
+
+def search_memory(query: str, k: int = SEARCH_RESULTS) -> list[dict]:
+    """
+    Search the markdown files of the memory for a query, ranking their
+    sections by relevance (BM25). A section is a heading and the text below it.
+
+    Args:
+        query: Words to look for, e.g. "sister birthday".
+        k: The maximum number of sections to return.
+
+    Returns:
+        A list of dicts with the "file" (relative to the memory root),
+        "heading" and a "snippet" of each matching section, best match first.
+        On failure, a list with a single error message string.
+    """
+    try:
+        return search(memory_root(), query, k)
+    except Exception as e:
+        return [f"Error: {e}"]
+
+
+def _note_path(note: str, from_file: str = None) -> str:
+    """Return the note a path or link refers to, relative to the memory root."""
+    source = None
+    if from_file is not None:
+        source = relative_path(memory_root(), resolve_path(from_file))
+    return resolve_note_link(memory_root(), note, source)
+
+
+def resolve_link(link_string: str, from_file: str = None) -> str:
+    """
+    Find the note a link points to. Links may name a path from the memory
+    root, a path relative to the note containing the link, or just a note
+    name, e.g. "[[entities/maria_garcia]]", "[[maria_garcia.md]]".
+
+    Args:
+        link_string: The link, with or without the surrounding [[ ]].
+        from_file: The note containing the link, if any.
+
+    Returns:
+        The path of the note relative to the memory root, or an error message
+        if no note matches.
+    """
+    try:
+        path = _note_path(link_string, from_file)
+        if path is None:
+            return f"Error: No note matches {link_string}"
+        return path
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def get_backlinks(note: str) -> list[dict]:
+    """
+    List the notes that link to a note.
+
+    Args:
+        note: The path of the note, or a link to it.
+
+    Returns:
+        A list of dicts with the linking "file" and the "relation" the link
+        appears under (e.g. "Wife" for "- **Wife**: [[...]]", "" otherwise).
+        On failure, a list with a single error message string.
+    """
+    try:
+        path = _note_path(note)
+        if path is None:
+            return [f"Error: No note matches {note}"]
+        return backlinks(memory_root(), path)
+    except Exception as e:
+        return [f"Error: {e}"]
+
+
+def follow_links(
+    note: str,
+    depth: int = 1,
+    include_backlinks: bool = False,
+    max_notes: int = FOLLOW_LINKS_MAX_NOTES,
+) -> list[dict]:
+    """
+    Read a note and the notes reachable from it through [[...]] links, up to
+    `depth` links away, in one call.
+
+    Args:
+        note: The path of the starting note, or a link to it.
+        depth: How many links to follow out from the note (2 reaches the
+            notes linked from the notes it links to).
+        include_backlinks: Also follow links pointing into each note.
+        max_notes: The maximum number of notes to return.
+
+    Returns:
+        A list of dicts, nearest first, starting with the note itself, with
+        the "file", its "depth" (number of links away), the note it was
+        reached "from", the "relation" of that link and the note's "content".
+        On failure, a list with a single error message string.
+    """
+    try:
+        path = _note_path(note)
+        if path is None:
+            return [f"Error: No note matches {note}"]
+        return neighbourhood(memory_root(), path, depth, include_backlinks, max_notes)
+    except Exception as e:
+        return [f"Error: {e}"]
+
+
+def query_attributes(entity: str = None, key: str = None) -> list[dict]:
+    """
+    Look up "- **Key**: value" attributes across the memory's notes, e.g.
+    query_attributes("user.md", "wife") or query_attributes("Maria Garcia",
+    "occupation"). Keys match whole names first, then names containing them.
+
+    Args:
+        entity: A note path or link, or the entity's name (its "# " title).
+            None searches every note.
+        key: The attribute name, case-insensitive. None returns all
+            attributes of the entity.
+
+    Returns:
+        A list of dicts with the "file", "entity", "section", "key" and
+        "value" of each attribute. On failure, a list with a single error
+        message string.
+    """
+    try:
+        return query(memory_root(), entity, key)
+    except Exception as e:
+        return [f"Error: {e}"]
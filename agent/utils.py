@@ -1,6 +1,8 @@
 import os
 import shutil
 
+from agent.ledger import ancestor_usage, dir_usage
+from agent.memory_meta import memory_root
 from agent.settings import (
     SYSTEM_PROMPT_PATH,
     FILE_SIZE_LIMIT,
@@ -9,7 +11,6 @@ from agent.settings import (
     MEMORY_PATH,
 )
 
-
 def load_system_prompt() -> str:
     """
     Load the system prompt from the file.
@@ -33,17 +34,22 @@ def check_file_size_limit(file_path: str) -> bool:
 
 def check_dir_size_limit(dir_path: str) -> bool:
     """
-    Check if the directory size limit is respected.
+    Check if the directory size limit is respected, using the memory's
+    usage ledger (see agent.ledger).
     """
-    return os.path.getsize(dir_path) <= DIR_SIZE_LIMIT
+    try:
+        return dir_usage(memory_root(), dir_path) <= DIR_SIZE_LIMIT
+    except ValueError:
+        return False
 
 
-def check_memory_size_limit() -> bool:
+def check_memory_size_limit(extra_bytes: int = 0) -> bool:
     """
-    Check if the memory size limit is respected.
+    Check if the memory size limit is respected, optionally after adding
+    `extra_bytes`.
     """
-    current_working_dir = os.getcwd()
-    return os.path.getsize(current_working_dir) <= MEMORY_SIZE_LIMIT
+    root = memory_root()
+    return dir_usage(root, root) + extra_bytes <= MEMORY_SIZE_LIMIT
 
 
 def check_size_limits(file_or_dir_path: str) -> bool:
@@ -68,6 +74,26 @@ def check_size_limits(file_or_dir_path: str) -> bool:
         return False
 
 
+def check_content_size_limits(file_path: str, size: int) -> bool:
+    """
+    Check the size limits for writing `size` bytes to `file_path`, before
+    anything touches disk: the file limit, the directory limit of every
+    enclosing directory and the memory limit, all after the write.
+    """
+    if size > FILE_SIZE_LIMIT:
+        return False
+    delta = size - (os.path.getsize(file_path) if os.path.isfile(file_path) else 0)
+    try:
+        usage = ancestor_usage(memory_root(), file_path)
+    except ValueError:
+        return False
+    for rel_dir, used in usage:
+        limit = MEMORY_SIZE_LIMIT if rel_dir == "" else DIR_SIZE_LIMIT
+        if used + delta > limit:
+            return False
+    return True
+
+
 def create_memory_if_not_exists(path: str = MEMORY_PATH):
     """
     Create the memory if it doesn't exist.
@@ -0,0 +1,88 @@
+import argparse
+import difflib
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+
+from agent.patch import apply_patch
+
+
+def make_case(lines: int) -> tuple[str, str]:
+    """Build a note of `lines` lines and a diff that edits a few of its sections."""
+    original = [f"- fact {i}: value {i}\n" for i in range(lines)]
+    edited = list(original)
+    for i in range(0, lines, max(1, lines // 5)):
+        edited[i] = f"- fact {i}: updated value {i}\n"
+    edited.append("- fact new: appended\n")
+    diff = "".join(difflib.unified_diff(original, edited, "a/note.md", "b/note.md"))
+    return "".join(original), diff
+
+
+def apply_with_git(workdir: str, diff: str) -> bool:
+    """The former write_to_file: `git apply --check`, then `git apply`."""
+    patch_file = os.path.join(workdir, "change.patch")
+    with open(patch_file, "w") as f:
+        f.write(diff)
+    try:
+        for args in (["--check"], []):
+            result = subprocess.run(
+                ["git", "apply", *args, "--unsafe-paths", patch_file],
+                cwd=workdir,
+                capture_output=True,
+            )
+            if result.returncode != 0:
+                return False
+        return True
+    finally:
+        os.remove(patch_file)
+
+
+def summarize(name: str, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{name:<10}{statistics.mean(latencies):>10.3f}"
+        f"{statistics.median(latencies):>10.3f}{p95:>10.3f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the in-process diff engine against git apply."
+    )
+    parser.add_argument("--calls", type=int, default=50, help="Timed calls per engine")
+    parser.add_argument("--lines", type=int, default=200, help="Lines in the patched note")
+    args = parser.parse_args()
+
+    original, diff = make_case(args.lines)
+    with tempfile.TemporaryDirectory() as workdir:
+        note_path = os.path.join(workdir, "note.md")
+
+        git_latencies = []
+        for _ in range(args.calls):
+            with open(note_path, "w") as f:
+                f.write(original)
+            start = time.perf_counter()
+            if not apply_with_git(workdir, diff):
+                raise RuntimeError("git apply failed")
+            git_latencies.append((time.perf_counter() - start) * 1000)
+        with open(note_path) as f:
+            expected = f.read()
+
+    python_latencies = []
+    for _ in range(args.calls):
+        start = time.perf_counter()
+        patched = apply_patch(original, diff)
+        python_latencies.append((time.perf_counter() - start) * 1000)
+        if patched != expected:
+            raise RuntimeError("agent.patch result differs from git apply")
+
+    print(f"{'engine':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    summarize("git", git_latencies)
+    summarize("python", python_latencies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from agent.engine import execute_sandboxed_code
+
+SNIPPET = 'content = read_file("user.md")\nfiles = list_files()'
+
+
+def benchmark_backend(backend: str, memory_path: str, calls: int) -> list[float]:
+    """
+    Time `calls` sandbox executions of SNIPPET on the given backend. The
+    "fast_path" backend runs SNIPPET in-process (agent.sandbox.fast_path).
+
+    Returns:
+        The per-call latencies in milliseconds.
+    """
+    fast_path = backend == "fast_path"
+    backend = None if fast_path else backend
+    # One untimed call so a backend's startup cost is not counted as per-call latency
+    execute_sandboxed_code(
+        SNIPPET,
+        allowed_path=memory_path,
+        import_module="agent.tools",
+        backend=backend,
+        fast_path=fast_path,
+    )
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        result, error = execute_sandboxed_code(
+            SNIPPET,
+            allowed_path=memory_path,
+            import_module="agent.tools",
+            backend=backend,
+            fast_path=fast_path,
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        if error:
+            raise RuntimeError(f"{backend or 'fast_path'} backend failed: {error}")
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sandbox per-call latency.")
+    parser.add_argument("--calls", type=int, default=50, help="Timed calls per backend")
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=["spawn", "pool", "zygote", "fast_path"],
+        help="Sandbox backends to compare",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as memory_path:
+        with open(os.path.join(memory_path, "user.md"), "w") as f:
+            f.write("# User Information\n- user_name: Jane Doe\n- user_age: 23\n")
+
+        print(f"{'backend':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for backend in args.backends:
+            latencies = sorted(benchmark_backend(backend, memory_path, args.calls))
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(
+                f"{backend:<10}{statistics.mean(latencies):>10.2f}"
+                f"{statistics.median(latencies):>10.2f}{p95:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,24 +5,23 @@ from typing import Optional, Union
 from abc import ABC
 
 from data.settings import OPENROUTER_BASE_URL, OPENROUTER_API_KEY
+from agent.clients import get_async_openai_client, get_openai_client
+from agent.llm_cache import cached_response, forget_response
 from agent.model import get_model_response as get_agent_response
+from agent.scheduler import estimate_tokens, scheduler_for
 from agent.async_agent import get_model_response as async_get_agent_response
 from agent.schemas import ChatMessage, Role
 
 
 def create_openai_client() -> OpenAI:
-    """Create a new OpenAI client instance."""
-    return OpenAI(
-        api_key=OPENROUTER_API_KEY,
-        base_url=OPENROUTER_BASE_URL,
-    )
+    """Return the shared OpenRouter client (see agent.clients)."""
+    return get_openai_client(base_url=OPENROUTER_BASE_URL, api_key=OPENROUTER_API_KEY)
 
 
 def create_async_openai_client() -> AsyncOpenAI:
-    """Create a new AsyncOpenAI client instance."""
-    return AsyncOpenAI(
-        api_key=OPENROUTER_API_KEY,
-        base_url=OPENROUTER_BASE_URL,
+    """Return the shared async OpenRouter client of the running event loop."""
+    return get_async_openai_client(
+        base_url=OPENROUTER_BASE_URL, api_key=OPENROUTER_API_KEY
     )
 
 
@@ -35,6 +34,7 @@ def get_model_response(
     model: str,
     schema: Optional[BaseModel] = None,
     client: Optional[OpenAI] = None,
+    max_retries: int = 3,
 ) -> BaseModel:
     """
     Get a response from a model using OpenRouter, with schema for structured output.
@@ -44,9 +44,14 @@ def get_model_response(
         schema: A Pydantic BaseModel for structured output.
         model: The model to use.
         client: Optional OpenAI client to use. If None, uses the global client.
+        max_retries: How many times to ask again for a response that does not
+            match the schema.
 
     Returns:
         A BaseModel object.
+
+    Raises:
+        Exception: The last validation error, if no response matched the schema.
     """
     if client is None:
         client = CLIENT
@@ -57,23 +62,33 @@ def get_model_response(
         prompt = prompt + addition
 
     # Get the raw response from model
-    completion = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-    )
-    response = completion.choices[0].message.content
+    messages = [{"role": "user", "content": prompt}]
+    endpoint = str(client.base_url)
 
-    if "```json" in response and "```" in response:
-        response = response.split("```json")[1].split("```")[0]
+    def complete() -> str:
+        completion = scheduler_for(client).run_sync(
+            lambda: client.chat.completions.create(model=model, messages=messages),
+            tokens=estimate_tokens(messages),
+        )
+        return completion.choices[0].message.content
 
-    if schema is not None:
+    for attempt in range(max_retries + 1):
+        response = cached_response(
+            complete, "chat", model, messages, endpoint=endpoint
+        )
+
+        if "```json" in response and "```" in response:
+            response = response.split("```json")[1].split("```")[0]
+
+        if schema is None:
+            return response
         try:
             return schema.model_validate_json(response)
-        except Exception as e:
-            # If the response is not valid, try again
-            return get_model_response(prompt, model, schema, client)
-    else:
-        return response
+        except Exception:
+            if attempt == max_retries:
+                raise
+            # If the response is not valid, try again (a readwrite cache drops it)
+            forget_response("chat", model, messages, endpoint=endpoint)
 
 
 class SFTModel(ABC):
@@ -84,9 +99,8 @@ class SFTModel(ABC):
     def __init__(self, num_turns: int):
         self.num_turns = num_turns
         self.messages: list[ChatMessage] = []
-        # Each SFTModel instance gets its own clients to avoid bottlenecks
+        # SFTModel instances share the pooled OpenRouter clients
         self._client = create_openai_client()
-        self._async_client = create_async_openai_client()
 
     def _add_message(self, message: Union[ChatMessage, dict]):
         """Add a message to the conversation history."""
@@ -116,7 +130,7 @@ class SFTModel(ABC):
 
         response = await async_get_agent_response(
             messages=self.messages,
-            client=self._async_client,
+            client=create_async_openai_client(),
             use_vllm=False,  # Data generation never uses vLLM, only OpenRouter
         )
         self._add_message(ChatMessage(role=Role.ASSISTANT, content=response))
@@ -10,6 +10,7 @@ from typing import Literal
 from tqdm import tqdm
 from agent.agent import Agent
 from agent.async_agent.async_model import get_model_response
+from agent.llm_cache import LLM_CACHE_MODES, configure_llm_cache
 from judge import JUDGE_PROMPT
 import re
 from agent.utils import extract_reply
@@ -137,7 +138,15 @@ if __name__ == "__main__":
     parser.add_argument(
         "--add-think", action="store_true", help="Add ' /think' suffix to all agent prompts"
     )
+    parser.add_argument(
+        "--llm-cache",
+        choices=LLM_CACHE_MODES,
+        default=None,
+        help="LLM response cache mode, e.g. 'replay' to re-judge a recorded run offline",
+    )
     args = parser.parse_args()
+    if args.llm_cache:
+        configure_llm_cache(args.llm_cache)
 
     asyncio.run(
         evaluate_agents(
@@ -1,14 +1,15 @@
 import json
-from typing import List
-from openai import OpenAI
-from anthropic import Anthropic
+from typing import List, Optional
+from agent.clients import get_anthropic_client, get_openai_client
+from agent.llm_cache import cached_response
+from agent.scheduler import estimate_tokens, scheduler_for
 from jinja2 import Template
 import json_repair
 
 
 class QuestionReformat:
     def __init__(self):
-        self.client = Anthropic()
+        self.client = get_anthropic_client()
         self.model = "claude-sonnet-4-20250514"
         with open("restructure_0_hop.md", "r") as f:
             template_str = f.read()
@@ -32,73 +33,107 @@ class QuestionReformat:
                 user=user, personal_info=personal_info, questions=questions
             )
 
-        message = self.client.messages.create(
-            model=self.model,
-            max_tokens=1500,
-            temperature=1,
-            system=sys,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [{"type": "text", "text": json.dumps(questions)}],
-                }
-            ],
-        )
+        messages = [
+            {
+                "role": "user",
+                "content": [{"type": "text", "text": json.dumps(questions)}],
+            }
+        ]
+        text = self._complete(messages, system=sys)
         try:
-            return json_repair.loads(message.content[0].text)
+            return json_repair.loads(text)
         except:
-            raise RuntimeError(
-                f"✖ LLM returned invalid JSON: {message.content}"
-            ) from None
+            raise RuntimeError(f"✖ LLM returned invalid JSON: {text}") from None
 
     def reformat_update(self, user, path) -> List[str]:
         sys = self.update_template.render(user=user, path=json.dumps(path, indent=2))
 
-        message = self.client.messages.create(
-            model=self.model,
-            max_tokens=1500,
-            temperature=1,
-            messages=[{"role": "user", "content": [{"type": "text", "text": sys}]}],
+        text = self._complete(
+            [{"role": "user", "content": [{"type": "text", "text": sys}]}]
         )
         # format as list
         try:
-            return json_repair.loads(message.content[0].text)
+            return json_repair.loads(text)
         except:
-            raise RuntimeError(
-                f"✖ LLM returned invalid JSON: {message.content}"
-            ) from None
+            raise RuntimeError(f"✖ LLM returned invalid JSON: {text}") from None
+
+    def _complete(self, messages: list, system: Optional[str] = None) -> str:
+        """Return the text of a scheduled, cached completion."""
+        params = {"max_tokens": 1500, "temperature": 1}
+        if system is not None:
+            params["system"] = system
+
+        def create() -> str:
+            message = scheduler_for(self.client).run_sync(
+                lambda: self.client.messages.create(
+                    model=self.model, messages=messages, **params
+                ),
+                tokens=estimate_tokens(
+                    [system or "", json.dumps(messages)], completion=1500
+                ),
+            )
+            return message.content[0].text
+
+        return cached_response(
+            create, "anthropic.messages", self.model, messages, **params
+        )
 
 
 class LLM:
     def __init__(self, model="gpt-4o"):
-        self.client = OpenAI()
+        self.client = get_openai_client()
         self.model = model
 
     def create_text(self, system: str, prompt: str) -> str:
-        return (
-            self.client.chat.completions.create(
-                model="o3",
-                messages=[
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=1.0,
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt},
+        ]
+
+        def create() -> str:
+            return (
+                scheduler_for(self.client)
+                .run_sync(
+                    lambda: self.client.chat.completions.create(
+                        model="o3", messages=messages, temperature=1.0
+                    ),
+                    tokens=estimate_tokens(messages),
+                )
+                .choices[0]
+                .message.content
             )
-            .choices[0]
-            .message.content
-        )
+
+        return cached_response(create, "chat", "o3", messages, temperature=1.0)
 
     def create_json(self, system: str, user: str, format) -> str:
-        return (
-            self.client.chat.completions.parse(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user},
-                ],
-                temperature=1.0,
-                response_format=format,
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ]
+
+        def create() -> Optional[str]:
+            parsed = (
+                scheduler_for(self.client)
+                .run_sync(
+                    lambda: self.client.chat.completions.parse(
+                        model=self.model,
+                        messages=messages,
+                        temperature=1.0,
+                        response_format=format,
+                    ),
+                    tokens=estimate_tokens(messages),
+                )
+                .choices[0]
+                .message.parsed
             )
-            .choices[0]
-            .message.parsed
+            return parsed.model_dump_json() if parsed is not None else None
+
+        output = cached_response(
+            create,
+            "chat.parse",
+            self.model,
+            messages,
+            temperature=1.0,
+            schema=format.model_json_schema(),
         )
+        return format.model_validate_json(output) if output is not None else None
@@ -0,0 +1,14 @@
+import pytest
+
+from agent.memory_meta import MEMORY_ROOT, init_generation
+
+
+@pytest.fixture
+def memory(tmp_path):
+    """An empty memory that the tools of agent.tools resolve paths against."""
+    root = tmp_path / "memory"
+    root.mkdir()
+    init_generation(str(root))
+    token = MEMORY_ROOT.set(str(root))
+    yield root
+    MEMORY_ROOT.reset(token)
@@ -0,0 +1,74 @@
+import pytest
+
+from agent.sandbox.analysis import ToolStep, is_read_only, tool_only_steps
+
+READ_ONLY = frozenset({"read_file", "list_files", "search_memory"})
+TOOLS = READ_ONLY | frozenset({"create_file", "write_to_file"})
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        'content = read_file("user.md")',
+        'lines = read_file("user.md").splitlines()\nfirst = lines[0].strip()',
+        'hits = search_memory("alice")\npaths = [hit["path"] for hit in hits]',
+        'files = list_files("entities")\ncount = len(files)',
+        'for line in read_file("user.md").splitlines():\n    print(line)',
+        "x = 1",
+    ],
+)
+def test_is_read_only_accepts_pure_reads(code):
+    assert is_read_only(code, READ_ONLY)
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        'create_file("user.md", "# User")',
+        'content = open("user.md").read()',
+        "import os",
+        'content = read_file("/etc/passwd")',
+        'content = read_file("../other/user.md")',
+        "read_file = print\nread_file('user.md')",
+        "x = undefined_name",
+        "x = ().__class__",
+        'while True:\n    read_file("user.md")',
+        "f = lambda: 1",
+        "x = (",
+    ],
+)
+def test_is_read_only_rejects_writes_escapes_and_unknown_names(code):
+    assert not is_read_only(code, READ_ONLY)
+
+
+def test_tool_only_steps_parses_literal_tool_calls():
+    code = (
+        '"""Save the user."""\n'
+        'content = read_file("user.md")\n'
+        'create_file("notes/a.md", content="# A")\n'
+        "a = b = 3\n"
+    )
+    assert tool_only_steps(code, TOOLS) == [
+        ToolStep(["content"], "read_file", ("user.md",), {}),
+        ToolStep([], "create_file", ("notes/a.md",), {"content": "# A"}),
+        ToolStep(["a", "b"], None, (3,), {}),
+    ]
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "content = read_file(path)",
+        'content = read_file("a.md" + ".md")',
+        'create_file(**{"file_path": "a.md"})',
+        'content = open("user.md").read()',
+        'x = read_file("user.md").strip()',
+        'if True:\n    read_file("user.md")',
+        "read_file = 1",
+        'obj.attr = read_file("user.md")',
+        "print('hi')",
+        "x = (",
+    ],
+)
+def test_tool_only_steps_rejects_anything_but_literal_calls(code):
+    assert tool_only_steps(code, TOOLS) is None
@@ -0,0 +1,55 @@
+import os
+
+from agent import tools
+
+MARIA = (
+    "# Maria Garcia\n\n"
+    "- **Occupation**: marine biologist\n"
+    "- **Birthday**: 1990-05-02\n"
+)
+
+
+def values(results):
+    return [(result["file"], result["key"], result["value"]) for result in results]
+
+
+def test_query_by_entity_name_path_and_key(memory):
+    assert tools.create_file("maria.md", MARIA) is True
+    assert tools.create_file("user.md", "# User\n\n## Family\n- **Wife**: [[maria]]\n")
+
+    occupation = [("maria.md", "Occupation", "marine biologist")]
+    assert values(tools.query_attributes("Maria Garcia", "occupation")) == occupation
+    assert values(tools.query_attributes("maria.md", "occupation")) == occupation
+    assert values(tools.query_attributes("[[maria]]", "occupation")) == occupation
+    [wife] = tools.query_attributes(key="wife")
+    assert (wife["entity"], wife["section"]) == ("User", "Family")
+    assert len(tools.query_attributes("maria.md")) == 2
+    assert tools.query_attributes("maria.md", "salary") == []
+
+
+def test_query_follows_tool_writes(memory):
+    assert tools.create_file("maria.md", MARIA) is True
+    assert tools.set_attribute("maria.md", "Occupation", "diver") is True
+    assert values(tools.query_attributes("maria.md", "occupation")) == [
+        ("maria.md", "Occupation", "diver")
+    ]
+    assert tools.remove_attribute("maria.md", "Birthday") is True
+    assert tools.query_attributes("maria.md", "birthday") == []
+
+
+def test_query_follows_edits_outside_the_tools(memory):
+    assert tools.create_file("maria.md", MARIA) is True
+    assert len(tools.query_attributes(key="occupation")) == 1
+
+    (memory / "maria.md").write_text(MARIA.replace("marine biologist", "teacher"))
+    (memory / "bob.md").write_text("# Bob\n\n- **Occupation**: chef\n")
+    assert sorted(values(tools.query_attributes(key="occupation"))) == [
+        ("bob.md", "Occupation", "chef"),
+        ("maria.md", "Occupation", "teacher"),
+    ]
+
+    os.remove(memory / "maria.md")
+    assert values(tools.query_attributes(key="occupation")) == [
+        ("bob.md", "Occupation", "chef")
+    ]
+    assert tools.query_attributes("Maria Garcia") == []
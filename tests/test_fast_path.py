@@ -0,0 +1,114 @@
+import types
+
+import pytest
+
+from agent import tools
+from agent.registry import get_tool_registry
+from agent.sandbox import fast_path
+from agent.sandbox.analysis import ToolStep
+from agent.sandbox.fast_path import plan_fast_path, run_fast_path
+from agent.sandbox.serializer import decode_locals
+
+TOOL_MODULE = "agent.tools"
+
+
+def plan(code, memory, **kwargs):
+    kwargs = {
+        "allowed_path": str(memory),
+        "import_module": TOOL_MODULE,
+        "fast_path": True,
+        **kwargs,
+    }
+    return plan_fast_path(code, **kwargs)
+
+
+def test_plain_tool_calls_take_the_fast_path(memory):
+    assert tools.create_file("user.md", "# User") is True
+    steps = plan('content = read_file("user.md")', memory)
+    assert steps == [ToolStep(["content"], "read_file", ("user.md",), {})]
+
+    locals_dict, error, _, _ = run_fast_path(steps, str(memory), TOOL_MODULE, 5)
+    assert error is None
+    assert decode_locals(locals_dict) == {"content": "# User"}
+
+
+def test_fast_path_is_opt_in(memory, monkeypatch):
+    monkeypatch.setattr(fast_path, "SANDBOX_FAST_PATH", False)
+    code = 'content = read_file("user.md")'
+    assert plan_fast_path(
+        code, allowed_path=str(memory), import_module=TOOL_MODULE
+    ) is None
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        'content = read_file("../secrets.md")',
+        'content = read_file("/etc/passwd")',
+        'create_files({"../escape.md": "x"})',
+        'notes = get_backlinks("[[../outside]]")',
+    ],
+)
+def test_paths_outside_the_memory_go_to_the_sandbox(memory, code):
+    assert plan(code, memory) is None
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"allow_installs": True},
+        {"blacklist": ["os"]},
+        {"available_functions": {"helper": print}},
+        {"allowed_path": None},
+    ],
+)
+def test_sandbox_options_disable_the_fast_path(memory, kwargs):
+    assert plan('content = read_file("user.md")', memory, **kwargs) is None
+
+
+def test_tools_without_declared_path_parameters_go_to_the_sandbox(
+    memory, monkeypatch
+):
+    registry = get_tool_registry(TOOL_MODULE)
+    monkeypatch.delitem(registry.path_parameters, "read_file")
+    assert plan('content = read_file("user.md")', memory) is None
+
+
+def test_bad_calls_go_to_the_sandbox(memory):
+    assert plan('content = read_file("a.md", "b.md", "c.md")', memory) is None
+
+
+def test_tool_exceptions_are_reported_like_the_sandbox(memory, monkeypatch):
+    def broken_read(file_path):
+        raise OSError("disk on fire")
+
+    registry = get_tool_registry(TOOL_MODULE)
+    monkeypatch.setitem(registry._functions, "read_file", broken_read)
+
+    steps = plan('x = 1\ncontent = read_file("user.md")', memory)
+    locals_dict, error, _, _ = run_fast_path(steps, str(memory), TOOL_MODULE, 5)
+    assert error.startswith("Exception in sandboxed code:\n")
+    assert "OSError: disk on fire" in error
+    # Values assigned before the failing call are still returned
+    assert decode_locals(locals_dict) == {"x": 1}
+
+
+def test_blocks_past_the_timeout_return_a_timeout_error(memory, monkeypatch):
+    clock = [0.0]
+
+    def slow_read(file_path):
+        clock[0] += 10
+        return "content"
+
+    monkeypatch.setattr(
+        fast_path, "time", types.SimpleNamespace(monotonic=lambda: clock[0])
+    )
+    registry = get_tool_registry(TOOL_MODULE)
+    monkeypatch.setitem(registry._functions, "read_file", slow_read)
+
+    steps = plan('a = read_file("a.md")\nb = read_file("b.md")', memory)
+    locals_dict, error, _, _ = run_fast_path(steps, str(memory), TOOL_MODULE, 5)
+    assert locals_dict is None
+    assert error == "TimeoutError: Code execution exceeded 5 seconds."
+    # The deadline is checked before each step, so the second read never ran
+    assert clock[0] == 10
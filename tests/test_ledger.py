@@ -0,0 +1,70 @@
+import os
+
+from agent import tools
+from agent.ledger import ancestor_usage, dir_usage, rebuild_usage, sync_usage
+
+
+def totals(memory, *dirs):
+    return [dir_usage(str(memory), str(memory / d)) for d in dirs]
+
+
+def test_create_and_delete_update_every_ancestor(memory):
+    assert tools.create_dir("people/alice") is True
+    assert tools.create_file("a.md", "12345") is True
+    assert tools.create_file("people/alice/bio.md", "123") is True
+    assert tools.create_file("people/bob.md", "12") is True
+    assert totals(memory, "", "people", "people/alice") == [10, 5, 3]
+
+    assert tools.create_file("people/alice/bio.md", "1") is True  # Overwrite
+    assert totals(memory, "", "people", "people/alice") == [8, 3, 1]
+
+    assert tools.delete_file("people/alice/bio.md") is True
+    assert totals(memory, "", "people", "people/alice") == [7, 2, 0]
+    assert tools.get_size("") == 7
+    assert tools.get_size("people") == 2
+
+
+def test_moving_a_file_moves_its_bytes(memory):
+    assert tools.create_dir("inbox") and tools.create_dir("archive")
+    assert tools.create_file("inbox/note.md", "1234") is True
+    assert tools.create_file("archive/keep.md", "1") is True
+
+    assert tools.create_file("archive/note.md", tools.read_file("inbox/note.md"))
+    assert tools.delete_file("inbox/note.md") is True
+    assert totals(memory, "", "inbox", "archive") == [5, 0, 5]
+
+
+def test_sync_picks_up_edits_outside_the_tools(memory):
+    assert tools.create_dir("notes") is True
+    assert tools.create_file("notes/a.md", "1234") is True
+    assert tools.create_file("notes/b.md", "12") is True
+
+    (memory / "notes" / "a.md").write_text("1")
+    os.makedirs(memory / "archive")
+    os.rename(memory / "notes" / "b.md", memory / "archive" / "b.md")
+    (memory / "notes" / "c.md").write_text("123456")
+    # Limit checks only consult the ledger, it is reconciled explicitly
+    assert totals(memory, "") == [6]
+
+    sync_usage(str(memory))
+    assert totals(memory, "", "notes", "archive") == [9, 7, 2]
+    rebuild_usage(str(memory))
+    assert totals(memory, "", "notes", "archive") == [9, 7, 2]
+
+
+def test_ancestor_usage_lists_innermost_first(memory):
+    assert tools.create_dir("a/b") is True
+    assert tools.create_file("a/b/c.md", "123") is True
+    assert tools.create_file("a/d.md", "1") is True
+    file_path = str(memory / "a" / "b" / "new.md")
+    assert ancestor_usage(str(memory), file_path) == [("a/b", 3), ("a", 4), ("", 4)]
+
+
+def test_metadata_is_not_counted(memory):
+    assert tools.create_file("a.md", "123") is True
+    sync_usage(str(memory))
+    assert totals(memory, "") == [3]
+
+
+def test_directories_outside_the_memory_are_rejected(memory, tmp_path):
+    assert tools.get_size(str(tmp_path)).startswith("Error: ")
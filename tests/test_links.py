@@ -0,0 +1,59 @@
+import os
+
+from agent import tools
+
+USER = "# User\n\n## Family\n- **Wife**: [[entities/maria_garcia]]\n"
+
+
+def setup_notes():
+    assert tools.create_dir("entities") is True
+    assert tools.create_file("entities/maria_garcia.md", "# Maria Garcia\n") is True
+    assert tools.create_file("user.md", USER) is True
+
+
+def test_backlinks_name_the_relation(memory):
+    setup_notes()
+    expected = [{"file": "user.md", "relation": "Wife"}]
+    assert tools.get_backlinks("entities/maria_garcia.md") == expected
+    assert tools.get_backlinks("[[maria_garcia]]") == expected
+    assert tools.get_backlinks("user.md") == []
+    assert tools.get_backlinks("nobody.md") == ["Error: No note matches nobody.md"]
+
+
+def test_backlinks_follow_tool_writes(memory):
+    setup_notes()
+    assert tools.create_file("notes.md", "Dinner with [[maria_garcia]].") is True
+    assert sorted(
+        link["file"] for link in tools.get_backlinks("entities/maria_garcia.md")
+    ) == ["notes.md", "user.md"]
+    assert tools.delete_file("user.md") is True
+    assert tools.get_backlinks("entities/maria_garcia.md") == [
+        {"file": "notes.md", "relation": ""}
+    ]
+
+
+def test_backlinks_follow_edits_outside_the_tools(memory):
+    setup_notes()
+    assert len(tools.get_backlinks("entities/maria_garcia.md")) == 1
+
+    (memory / "user.md").write_text("# User\n\nNo family listed.\n")
+    (memory / "diary.md").write_text("- **Met**: [[entities/maria_garcia]]\n")
+    assert tools.get_backlinks("entities/maria_garcia.md") == [
+        {"file": "diary.md", "relation": "Met"}
+    ]
+
+    os.rename(memory / "diary.md", memory / "entities" / "diary.md")
+    assert tools.get_backlinks("entities/maria_garcia.md") == [
+        {"file": "entities/diary.md", "relation": "Met"}
+    ]
+
+
+def test_follow_links_reads_the_neighbourhood(memory):
+    setup_notes()
+    notes = tools.follow_links("user.md")
+    assert [(note["file"], note["depth"]) for note in notes] == [
+        ("user.md", 0),
+        ("entities/maria_garcia.md", 1),
+    ]
+    assert notes[1]["relation"] == "Wife"
+    assert notes[1]["content"] == "# Maria Garcia\n"
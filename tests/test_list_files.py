@@ -0,0 +1,76 @@
+import os
+
+from agent import tools
+
+
+def make_files(*paths):
+    for path in paths:
+        if "/" in path:
+            assert tools.create_dir(os.path.dirname(path)) is True
+        assert tools.create_file(path, "x") is True
+
+
+def test_lists_every_file_by_default(memory):
+    paths = [f"notes/{i:03}.md" for i in range(250)]
+    make_files(*paths)
+    assert sorted(tools.list_files("notes")) == [p[len("notes/") :] for p in paths]
+
+
+def test_pages_end_with_a_marker_for_the_next_page(memory):
+    make_files("a.md", "b.md", "c.md", "d.md", "e.md")
+    everything = tools.list_files()
+
+    first = tools.list_files(limit=2)
+    assert first[:2] == everything[:2]
+    assert first[2] == (
+        "... 3 more files, call list_files with offset=2 for the next page"
+    )
+    second = tools.list_files(offset=2, limit=2)
+    assert second[:2] == everything[2:4]
+    assert second[2].startswith("... 1 more files, call list_files with offset=4")
+    # The last page has no marker
+    assert tools.list_files(offset=4, limit=2) == everything[4:]
+    assert tools.list_files(offset=10, limit=2) == []
+
+
+def test_filters_apply_before_paging(memory):
+    make_files("a.md", "b.txt", "dir/c.md", "dir/sub/d.md")
+    assert sorted(tools.list_files(pattern="*.md")) == [
+        "a.md", "dir/c.md", "dir/sub/d.md"
+    ]
+    assert sorted(tools.list_files(pattern="*.md", max_depth=1)) == [
+        "a.md", "dir/c.md"
+    ]
+    page = tools.list_files(pattern="*.md", limit=1)
+    assert len(page) == 2
+    assert page[1].startswith("... 2 more files")
+
+
+def test_listing_follows_tool_writes(memory):
+    make_files("a.md")
+    assert tools.list_files() == ["a.md"]
+    make_files("b.md")
+    assert sorted(tools.list_files()) == ["a.md", "b.md"]
+    assert tools.delete_file("a.md") is True
+    assert tools.list_files() == ["b.md"]
+
+
+def test_listing_follows_edits_outside_the_tools(memory):
+    make_files("dir/a.md")
+    assert tools.list_files() == ["dir/a.md"]
+
+    (memory / "dir" / "b.md").write_text("x")
+    assert sorted(tools.list_files()) == ["dir/a.md", "dir/b.md"]
+    os.rename(memory / "dir" / "a.md", memory / "c.md")
+    assert sorted(tools.list_files()) == ["c.md", "dir/b.md"]
+
+
+def test_metadata_is_never_listed(memory):
+    make_files("a.md")
+    assert tools.list_files() == ["a.md"]
+    assert tools.list_files(pattern="*") == ["a.md"]
+
+
+def test_missing_directories_are_reported(memory):
+    [error] = tools.list_files("missing")
+    assert error.startswith("Error: Directory ")
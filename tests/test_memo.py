@@ -0,0 +1,52 @@
+from agent import tools
+from agent.memo import ReadOnlyMemo
+from agent.memory_meta import bump_generation
+
+READ = 'content = read_file("user.md")'
+WRITE = 'create_file("user.md", "# User")'
+
+
+def test_read_only_blocks_are_served_until_the_generation_changes(memory):
+    memo = ReadOnlyMemo()
+    key = memo.key(READ, str(memory))
+    assert key is not None
+    assert memo.get(key) is None
+    memo.put(key, ({"content": "a"}, ""))
+    assert memo.get(memo.key(READ, str(memory))) == ({"content": "a"}, "")
+
+    bump_generation(str(memory))
+    assert memo.key(READ, str(memory)) != key
+    assert memo.get(memo.key(READ, str(memory))) is None
+    assert memo.stats()["hits"] == 1
+
+
+def test_write_tools_invalidate_cached_reads(memory):
+    memo = ReadOnlyMemo()
+    key = memo.key(READ, str(memory))
+    memo.put(key, ({"content": "a"}, ""))
+    assert tools.create_file("user.md", "# User") is True
+    assert memo.get(memo.key(READ, str(memory))) is None
+
+
+def test_blocks_that_may_write_are_never_cached(memory):
+    memo = ReadOnlyMemo()
+    memo.put(memo.key(READ, str(memory)), ({"content": "a"}, ""))
+    assert memo.key(WRITE, str(memory)) is None
+    raw_write = 'with open("user.md", "w") as f:\n    f.write("x")'
+    assert memo.key(raw_write, str(memory)) is None
+    # Running such a block drops everything cached so far
+    memo.put(None, (None, ""))
+    assert memo.stats()["entries"] == 0
+
+
+def test_untracked_memories_are_not_cached(tmp_path):
+    assert ReadOnlyMemo().key(READ, str(tmp_path)) is None
+
+
+def test_transient_sandbox_errors_are_not_cached(memory):
+    memo = ReadOnlyMemo()
+    key = memo.key(READ, str(memory))
+    memo.put(key, (None, "TimeoutError: Code execution exceeded 20 seconds."))
+    assert memo.get(key) is None
+    memo.put(key, (None, "Exception in sandboxed code:\nKeyError"))
+    assert memo.get(key) == (None, "Exception in sandboxed code:\nKeyError")
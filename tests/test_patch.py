@@ -0,0 +1,82 @@
+from agent import tools
+from agent.patch import PatchFailure, apply_patch, parse_unified_diff
+
+TEXT = "".join(f"line {i}\n" for i in range(1, 11))
+
+
+def test_applies_a_hunk_with_wrong_line_numbers():
+    diff = "@@ -1,3 +1,3 @@\n line 6\n-line 7\n+line seven\n line 8\n"
+    assert apply_patch(TEXT, diff) == TEXT.replace("line 7\n", "line seven\n")
+
+
+def test_later_hunks_follow_the_offset_of_earlier_ones():
+    text = "header\n" * 3 + TEXT
+    diff = (
+        "@@ -2,1 +2,1 @@\n-line 2\n+line two\n"
+        "@@ -9,1 +9,1 @@\n-line 9\n+line nine\n"
+    )
+    patched = apply_patch(text, diff)
+    assert "line two\n" in patched and "line nine\n" in patched
+    assert "line 2\n" not in patched and "line 9\n" not in patched
+
+
+def test_tolerates_whitespace_differences_in_context():
+    diff = "@@ -4,3 +4,3 @@\n  line   4\n-line 5\n+line five\n line 6 \n"
+    assert apply_patch(TEXT, diff) == TEXT.replace("line 5\n", "line five\n")
+
+
+def test_fuzz_drops_context_lines_that_do_not_match():
+    diff = "@@ -2,3 +2,3 @@\n stale context\n-line 3\n+line three\n line 4\n"
+    assert apply_patch(TEXT, diff) == TEXT.replace("line 3\n", "line three\n")
+    assert isinstance(apply_patch(TEXT, diff, fuzz=0), PatchFailure)
+
+
+def test_failure_reports_the_hunk_and_the_closest_lines():
+    diff = "@@ -1,2 +1,2 @@\n line 1\n-line two\n+line 2\n"
+    failure = apply_patch(TEXT, diff, fuzz=0)
+    assert isinstance(failure, PatchFailure)
+    assert failure.hunk == 1
+    assert failure.expected == ["line 1", "line two"]
+    assert failure.nearest_line == 1
+    report = str(failure)
+    assert report.startswith("Patch failed at hunk 1 (@@ -1,2 +1,2 @@)")
+    assert "Closest lines in the file, from line 1:" in report
+
+
+def test_failure_notices_an_already_applied_diff():
+    diff = "@@ -1,2 +1,2 @@\n line 1\n-line zwei\n+line 2\n"
+    failure = apply_patch(TEXT, diff, fuzz=0)
+    assert "already there" in failure.reason
+
+
+def test_header_like_lines_inside_a_hunk_are_content():
+    text = "-- x\nkeep\n"
+    diff = "--- a/note.md\n+++ b/note.md\n@@ -1,2 +1,2 @@\n--- x\n+++ y\n keep\n"
+    parsed = parse_unified_diff(diff)
+    assert parsed.hunks[0].lines == [("-", "-- x\n"), ("+", "++ y\n"), (" ", "keep\n")]
+    assert apply_patch(text, parsed) == "++ y\nkeep\n"
+
+
+def test_write_to_file_creates_a_new_file(memory):
+    diff = "--- /dev/null\n+++ b/new.md\n@@ -0,0 +1,2 @@\n+# New\n+body\n"
+    assert tools.write_to_file("new.md", diff) is True
+    assert (memory / "new.md").read_text() == "# New\nbody\n"
+
+
+def test_write_to_file_returns_an_error_report(memory):
+    (memory / "note.md").write_text(TEXT)
+    result = tools.write_to_file("note.md", "@@ -1,1 +1,1 @@\n-nothing\n+like\n")
+    assert isinstance(result, str)
+    assert result.startswith("Error: Patch failed at hunk 1")
+    assert (memory / "note.md").read_text() == TEXT
+
+
+def test_write_to_file_rejects_a_malformed_diff(memory):
+    (memory / "note.md").write_text(TEXT)
+    result = tools.write_to_file("note.md", "not a diff")
+    assert result.startswith("Error: Patch failed: malformed diff")
+
+
+def test_write_to_file_on_a_missing_file(memory):
+    result = tools.write_to_file("missing.md", "@@ -1 +1 @@\n-a\n+b\n")
+    assert result == "Error: File missing.md does not exist"
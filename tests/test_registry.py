@@ -0,0 +1,40 @@
+import re
+from pathlib import Path
+
+import pytest
+
+from agent.registry import get_tool_registry
+
+AGENT_DIR = Path(__file__).resolve().parents[1] / "agent"
+PROMPTS = ["system_prompt.txt", "system_prompt_alt.txt"]
+_TOOL_LINE = re.compile(r"^(\w+)\((.*?)\) ->", re.MULTILINE)
+
+
+def _prompt_tools(name: str) -> dict[str, list[str]]:
+    """The tools a system prompt lists, with their parameter names."""
+    text = (AGENT_DIR / name).read_text()
+    api = text.split("## Memory API", 1)[1].split("```", 2)[1]
+    tools = {}
+    for name, params in _TOOL_LINE.findall(api):
+        tools[name] = [
+            p.split(":")[0].split("=")[0].strip()
+            for p in re.split(r",\s*(?![^\[]*\])", params)
+            if p.strip()
+        ]
+    return tools
+
+
+@pytest.mark.parametrize("prompt", PROMPTS)
+def test_prompt_lists_every_tool_with_its_parameters(prompt):
+    registry = get_tool_registry("agent.tools")
+    listed = _prompt_tools(prompt)
+    assert set(listed) == set(registry.tools)
+    for name, params in listed.items():
+        assert params == list(registry.signatures[name].parameters), name
+
+
+def test_registry_exports_only_declared_tools():
+    registry = get_tool_registry("agent.tools")
+    assert "Path" not in registry and "uuid" not in registry
+    assert registry.read_only <= set(registry.tools)
+    assert set(registry.path_parameters) == set(registry.tools)
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agent.scheduler import RequestScheduler, SchedulerLimits
+
+RETRY_AFTER = 0.3
+
+
+class StubError(Exception):
+    """Shaped like the openai/anthropic status errors the scheduler inspects."""
+
+    def __init__(self, error: urllib.error.HTTPError):
+        super().__init__(f"HTTP {error.code}")
+        self.status_code = error.code
+        self.response = error
+
+
+class StubServer(ThreadingHTTPServer):
+    """Answers the first `throttle` requests with 429 and Retry-After, then 200."""
+
+    def __init__(self, throttle: int):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.throttle = throttle
+        self.arrivals: list[float] = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/chat/completions"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        with self.server.lock:
+            self.server.arrivals.append(time.monotonic())
+            throttled = len(self.server.arrivals) <= self.server.throttle
+        if throttled:
+            self.send_response(429)
+            self.send_header("retry-after", str(RETRY_AFTER))
+            self.end_headers()
+            return
+        body = json.dumps({"usage": {"total_tokens": 10}}).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    stub = StubServer(throttle=2)
+    thread = threading.Thread(target=stub.serve_forever, daemon=True)
+    thread.start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+
+def _post(url: str) -> dict:
+    request = urllib.request.Request(url, data=b"{}", method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        raise StubError(e) from None
+
+
+def _scheduler() -> RequestScheduler:
+    limits = SchedulerLimits(
+        requests_per_minute=None,
+        tokens_per_minute=None,
+        max_concurrency=8,
+        max_retries=3,
+        base_delay=0.01,
+        max_delay=0.05,
+    )
+    return RequestScheduler("stub", limits)
+
+
+def _check(scheduler: RequestScheduler, server: StubServer, result: dict) -> None:
+    assert result == {"usage": {"total_tokens": 10}}
+    stats = scheduler.stats()
+    assert stats["retries"] == 2
+    assert stats["throttled"] == 2
+    assert stats["completed"] == 1
+    assert stats["failures"] == 0
+    # Halved by each 429 (they are further apart than the base_delay window),
+    # and one success is not enough to grow it back by a whole slot
+    assert stats["concurrency_limit"] == 8 // 2 // 2
+    assert len(server.arrivals) == 3
+    gaps = [b - a for a, b in zip(server.arrivals, server.arrivals[1:])]
+    assert all(gap >= RETRY_AFTER for gap in gaps)
+
+
+def test_run_sync_retries_after_retry_after(server):
+    scheduler = _scheduler()
+    result = scheduler.run_sync(lambda: _post(server.url))
+    _check(scheduler, server, result)
+
+
+@pytest.mark.asyncio
+async def test_run_retries_after_retry_after(server):
+    scheduler = _scheduler()
+    result = await scheduler.run(lambda: asyncio.to_thread(_post, server.url))
+    _check(scheduler, server, result)
+
+
+def test_gives_up_after_max_retries(server):
+    server.throttle = 10
+    scheduler = _scheduler()
+    with pytest.raises(StubError):
+        scheduler.run_sync(lambda: _post(server.url))
+    stats = scheduler.stats()
+    assert stats["retries"] == 3
+    assert stats["failures"] == 1
+    assert stats["concurrency_limit"] >= 1
+
+
+def test_client_errors_are_not_retried(server):
+    scheduler = _scheduler()
+
+    def bad_request():
+        raise StubError(urllib.error.HTTPError(server.url, 400, "bad", {}, None))
+
+    with pytest.raises(StubError):
+        scheduler.run_sync(bad_request)
+    assert scheduler.stats()["retries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_woken_when_a_slot_is_released():
+    scheduler = RequestScheduler(
+        "stub", SchedulerLimits(requests_per_minute=None, max_concurrency=1)
+    )
+    release = asyncio.Event()
+
+    async def hold():
+        await release.wait()
+        return "first"
+
+    async def quick():
+        return "second"
+
+    first = asyncio.create_task(scheduler.run(hold))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(scheduler.run(quick))
+    await asyncio.sleep(0.01)
+    assert scheduler.stats()["waiting"] == 1
+    assert not second.done()
+    release.set()
+    assert await asyncio.wait_for(second, 1) == "second"
+    assert await first == "first"
+    assert scheduler.stats()["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_requests_are_not_failures():
+    scheduler = RequestScheduler(
+        "stub", SchedulerLimits(requests_per_minute=None, max_concurrency=1)
+    )
+    running = asyncio.create_task(scheduler.run(lambda: asyncio.sleep(10)))
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(scheduler.run(lambda: asyncio.sleep(0, "done")))
+    await asyncio.sleep(0.01)
+    running.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await running
+    assert await asyncio.wait_for(queued, 1) == "done"
+    stats = scheduler.stats()
+    assert stats["failures"] == 0
+    assert stats["retries"] == 0
+    assert stats["running"] == 0
+    assert stats["waiting"] == 0
+
+
+def test_sync_waiter_is_woken_by_another_thread():
+    scheduler = RequestScheduler(
+        "stub", SchedulerLimits(requests_per_minute=None, max_concurrency=1)
+    )
+    release = threading.Event()
+    holder = threading.Thread(target=scheduler.run_sync, args=(release.wait,))
+    holder.start()
+    while scheduler.stats()["running"] == 0:
+        time.sleep(0.001)
+    threading.Timer(0.05, release.set).start()
+    started = time.monotonic()
+    assert scheduler.run_sync(lambda: "done") == "done"
+    assert time.monotonic() - started < 1
+    holder.join()
+    assert scheduler.stats()["completed"] == 2
@@ -0,0 +1,50 @@
+import os
+
+from agent import tools
+
+MARIA = "# Maria Garcia\n\n## Hobbies\nShe enjoys scuba diving.\n"
+
+
+def files(results):
+    return [result["file"] for result in results]
+
+
+def test_search_ranks_matching_sections(memory):
+    assert tools.create_file("maria.md", MARIA) is True
+    assert tools.create_file("user.md", "# User\n\n## Work\nI write software.\n")
+    [hit] = tools.search_memory("scuba")
+    assert hit["file"] == "maria.md"
+    assert hit["heading"] == "Hobbies"
+    assert "scuba diving" in hit["snippet"]
+    assert tools.search_memory("unrelated words") == []
+
+
+def test_search_follows_tool_writes(memory):
+    assert tools.create_file("maria.md", MARIA) is True
+    assert tools.replace_section("maria.md", "Hobbies", "She plays chess.") is True
+    assert tools.search_memory("scuba") == []
+    assert files(tools.search_memory("chess")) == ["maria.md"]
+    assert tools.delete_file("maria.md") is True
+    assert tools.search_memory("chess") == []
+
+
+def test_search_follows_edits_outside_the_tools(memory):
+    assert tools.create_file("maria.md", MARIA) is True
+    assert files(tools.search_memory("scuba")) == ["maria.md"]
+
+    # Edited, created and deleted by an editor or another process
+    (memory / "maria.md").write_text("# Maria Garcia\n\n## Hobbies\nChess.\n")
+    (memory / "notes.md").write_text("# Notes\n\nScuba trip in June.\n")
+    assert files(tools.search_memory("scuba")) == ["notes.md"]
+    assert files(tools.search_memory("chess")) == ["maria.md"]
+
+    os.rename(memory / "notes.md", memory / "trips.md")
+    assert files(tools.search_memory("scuba")) == ["trips.md"]
+    os.remove(memory / "trips.md")
+    assert tools.search_memory("scuba") == []
+
+
+def test_only_markdown_notes_are_searched(memory):
+    assert tools.create_file("data.txt", "scuba") is True
+    (memory / "raw.json").write_text('{"hobby": "scuba"}')
+    assert tools.search_memory("scuba") == []
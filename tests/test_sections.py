@@ -0,0 +1,80 @@
+from agent import tools
+
+NOTE = (
+    "# Maria\n"
+    "Intro.\n"
+    "\n"
+    "## Work\n"
+    "Biologist.\n"
+    "\n"
+    "### Projects\n"
+    "Reefs.\n"
+    "\n"
+    "#### 2024\n"
+    "Coral survey.\n"
+    "\n"
+    "## Hobbies\n"
+    "Diving.\n"
+)
+
+
+def note(memory):
+    return (memory / "maria.md").read_text()
+
+
+def test_replacing_a_section_replaces_its_subsections(memory):
+    assert tools.create_file("maria.md", NOTE) is True
+    assert tools.replace_section("maria.md", "## Work", "Teacher.") is True
+    assert note(memory) == (
+        "# Maria\nIntro.\n\n## Work\nTeacher.\n\n## Hobbies\nDiving.\n"
+    )
+
+
+def test_replacing_a_nested_section_keeps_its_siblings_and_parents(memory):
+    assert tools.create_file("maria.md", NOTE) is True
+    assert tools.replace_section("maria.md", "projects", "Kelp forests.") is True
+    assert note(memory) == NOTE.replace(
+        "Reefs.\n\n#### 2024\nCoral survey.\n", "Kelp forests.\n"
+    )
+    assert tools.read_section("maria.md", "Work") == (
+        "## Work\nBiologist.\n\n### Projects\nKelp forests.\n\n"
+    )
+
+
+def test_replacing_the_deepest_section(memory):
+    assert tools.create_file("maria.md", NOTE) is True
+    assert tools.replace_section("maria.md", "#### 2024", "Kelp survey.\n") is True
+    assert note(memory) == NOTE.replace("Coral survey.", "Kelp survey.")
+
+
+def test_replacing_the_last_section_and_unterminated_headings(memory):
+    assert tools.create_file("maria.md", NOTE) is True
+    assert tools.replace_section("maria.md", "Hobbies", "Chess.") is True
+    assert note(memory) == NOTE.replace("Diving.", "Chess.")
+
+    assert tools.create_file("empty.md", "# Empty\n## Todo") is True
+    assert tools.replace_section("empty.md", "Todo", "- Call Maria") is True
+    assert (memory / "empty.md").read_text() == "# Empty\n## Todo\n- Call Maria\n"
+
+
+def test_duplicate_headings_replace_the_first(memory):
+    text = "# A\n## Notes\nfirst\n# B\n## Notes\nsecond\n"
+    assert tools.create_file("dup.md", text) is True
+    assert tools.replace_section("dup.md", "Notes", "changed") is True
+    assert (memory / "dup.md").read_text() == text.replace("first", "changed")
+
+
+def test_missing_sections_are_not_created(memory):
+    assert tools.create_file("maria.md", NOTE) is True
+    assert tools.replace_section("maria.md", "Family", "Sister.") is False
+    assert tools.replace_section("missing.md", "Work", "Sister.") is False
+    assert note(memory) == NOTE
+
+
+def test_edits_outside_the_tools_are_seen(memory):
+    assert tools.create_file("maria.md", NOTE) is True
+    assert tools.read_section("maria.md", "Hobbies") == "## Hobbies\nDiving.\n"
+
+    (memory / "maria.md").write_text("# Maria\n\n## Hobbies\nChess.\n\n## Work\nX\n")
+    assert tools.replace_section("maria.md", "Hobbies", "Go.") is True
+    assert note(memory) == "# Maria\n\n## Hobbies\nGo.\n\n## Work\nX\n"
@@ -0,0 +1,55 @@
+import pickle
+
+from agent.sandbox.serializer import (
+    OMITTED_MARKER,
+    decode_locals,
+    encode_locals,
+    encode_value,
+)
+
+
+def test_small_values_round_trip():
+    values = {"n": 3, "text": "hello", "items": [1, {"a": "b"}]}
+    assert decode_locals(encode_locals(values)) == values
+
+
+def test_long_strings_are_cut_to_the_value_budget():
+    encoded = encode_locals({"text": "x" * 1000}, max_value_bytes=100)
+    text = decode_locals(encoded)["text"]
+    assert text.startswith("x" * 100)
+    assert text.endswith("... [truncated 900 bytes]")
+
+
+def test_truncation_never_splits_a_character():
+    text = decode_locals(encode_locals({"t": "é" * 100}, max_value_bytes=51))["t"]
+    assert text.startswith("é" * 25)
+    assert "�" not in text
+
+
+def test_large_values_fall_back_to_their_repr():
+    value = list(range(1000))
+    data = encode_value(value, limit=200)
+    decoded = pickle.loads(data)
+    assert isinstance(decoded, str)
+    assert decoded.startswith("[0, 1, 2")
+    assert "truncated" in decoded
+
+
+def test_unpicklable_values_become_their_repr():
+    decoded = decode_locals(encode_locals({"f": lambda: None}))
+    assert decoded["f"].startswith("<function")
+
+
+def test_values_past_the_total_budget_are_omitted():
+    values = {f"v{i}": "y" * 300 for i in range(5)}
+    encoded = encode_locals(values, max_value_bytes=400, max_total_bytes=1000)
+    decoded = decode_locals(encoded)
+    assert [decoded[f"v{i}"] for i in range(3)] == ["y" * 300] * 3
+    # The value that straddles the budget is cut to what is left of it
+    assert decoded["v3"].startswith("y") and "truncated" in decoded["v3"]
+    assert decoded["v4"] == OMITTED_MARKER.format(budget=1000)
+
+
+def test_only_requested_names_are_encoded():
+    encoded = encode_locals({"a": 1, "b": 2, "os": "module"}, names={"a", "b"})
+    assert decode_locals(encoded) == {"a": 1, "b": 2}
@@ -0,0 +1,69 @@
+from agent import tools
+
+NOTE = (
+    "# Maria\n"
+    "\n"
+    "## Basic Information\n"
+    "- **Age**: 30\n"
+    "- **age**: 31\n"
+    "\n"
+    "## Work\n"
+    "- **Employer**: Aquarium\n"
+    "  - since 2019\n"
+    "\n"
+    "### Projects\n"
+    "- **Lead**: reefs\n"
+    "\n"
+    "## Hobbies\n"
+    "Diving.\n"
+)
+
+
+def note(memory):
+    return (memory / "maria.md").read_text()
+
+
+def test_duplicate_keys_rewrite_the_first_bullet(memory):
+    assert tools.create_file("maria.md", NOTE) is True
+    assert tools.set_attribute("maria.md", "AGE", "32") is True
+    assert note(memory) == NOTE.replace("**Age**: 30", "**Age**: 32")
+
+    assert tools.remove_attribute("maria.md", "age") is True
+    assert tools.remove_attribute("maria.md", "age") is True
+    assert tools.remove_attribute("maria.md", "age") is False
+    assert "**Age**" not in note(memory) and "**age**" not in note(memory)
+
+
+def test_existing_keys_are_rewritten_in_their_own_section(memory):
+    assert tools.create_file("maria.md", NOTE) is True
+    assert tools.set_attribute("maria.md", "Lead", "kelp", section="Work") is True
+    assert note(memory) == NOTE.replace("reefs", "kelp")
+
+
+def test_nested_lines_are_replaced_with_the_value(memory):
+    assert tools.create_file("maria.md", NOTE) is True
+    assert tools.set_attribute("maria.md", "employer", "School") is True
+    assert note(memory) == NOTE.replace("Aquarium\n  - since 2019", "School")
+
+
+def test_new_keys_go_after_the_attributes_of_their_heading(memory):
+    assert tools.create_file("maria.md", NOTE) is True
+    # The parent section ends where its subsection starts
+    assert tools.set_attribute("maria.md", "Role", "Diver", section="Work") is True
+    assert tools.set_attribute("maria.md", "Budget", "5k", section="Projects")
+    assert note(memory) == NOTE.replace(
+        "  - since 2019\n", "  - since 2019\n- **Role**: Diver\n"
+    ).replace("- **Lead**: reefs\n", "- **Lead**: reefs\n- **Budget**: 5k\n")
+
+
+def test_missing_sections_are_appended(memory):
+    assert tools.create_file("maria.md", NOTE) is True
+    assert tools.set_attribute("maria.md", "Pet", "Cat", section="Family") is True
+    assert note(memory) == NOTE + "\n## Family\n- **Pet**: Cat\n"
+    [pet] = tools.query_attributes("maria.md", "pet")
+    assert (pet["section"], pet["value"]) == ("Family", "Cat")
+
+
+def test_missing_notes_are_not_created(memory):
+    assert tools.set_attribute("missing.md", "Age", "30") is False
+    assert not (memory / "missing.md").exists()
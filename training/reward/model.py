@@ -1,8 +1,10 @@
-from openai import OpenAI
+from typing import Optional
+
 from pydantic import BaseModel
 
-# Initialize the client
-CLIENT = OpenAI()
+from agent.clients import get_openai_client
+from agent.llm_cache import cached_response
+from agent.scheduler import estimate_tokens, scheduler_for
 
 
 def get_model_response(schema: BaseModel, prompt: str, model: str) -> BaseModel:
@@ -17,8 +19,21 @@ def get_model_response(schema: BaseModel, prompt: str, model: str) -> BaseModel:
     Returns:
         The structured response
     """
-    response = CLIENT.responses.parse(
-        model=model, input=[{"role": "user", "content": prompt}], text_format=schema
-    )
+    client = get_openai_client()
+    messages = [{"role": "user", "content": prompt}]
 
-    return response.output_parsed
+    def parse() -> Optional[str]:
+        response = scheduler_for(client).run_sync(
+            lambda: client.responses.parse(
+                model=model, input=messages, text_format=schema
+            ),
+            tokens=estimate_tokens(messages),
+        )
+        parsed = response.output_parsed
+        return parsed.model_dump_json() if parsed is not None else None
+
+    # Cached as JSON, so a replayed response is validated like a fresh one
+    output = cached_response(
+        parse, "responses.parse", model, messages, schema=schema.model_json_schema()
+    )
+    return schema.model_validate_json(output) if output is not None else None